@@ -0,0 +1,330 @@
+# backends.py
+"""
+Backends de ejecución del análisis
+
+- thread:  ThreadPoolExecutor (el parseo en Python compite por el GIL)
+- process: ProcessPoolExecutor (parseo en paralelo real)
+- asyncio: asyncio.create_subprocess_exec limitado por un semáforo
+
+Todos producen (chunk, results, error, elapsed) a medida que terminan los lotes,
+para que el bucle consumidor de analyze_mode los reúna con un único
+AnalysisAggregator. elapsed es el tiempo de ejecución del lote (sin la espera
+en cola), 0 para los aciertos de caché.
+
+Tras una cancelación (shutdown.cancel, SIGINT/SIGTERM) se dejan de enviar
+lotes; los que estaban en vuelo terminan con error Cancelled y, si al
+agotarse shutdown.SHUTDOWN_TIMEOUT siguen vivos, se matan sus procesos.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from engine import analyze_batch, apply_fixes, get_classifier, make_result, set_classifier
+from shutdown import POLL_INTERVAL, Cancelled, cancelled, check_exit, enforce_deadline, init_worker_process, \
+    register, unregister
+from utils import (
+    CHECKPATCH_ARGS,
+    CHECKPATCH_RETRY_FACTOR,
+    checkpatch_target,
+    checkpatch_timeout,
+    parse_checkpatch_output,
+    split_checkpatch_output,
+)
+
+BACKENDS = ("thread", "process", "asyncio")
+IN_FLIGHT_PER_WORKER = 4  # lotes en vuelo por worker (ventana de envío)
+
+
+def run_analysis(chunks, checkpatch_script, kernel_dir=None, backend="thread", workers=4, runner=None, cache=None,
+                 max_in_flight=None, checkpatch_args=None):
+    """
+    Analiza los lotes con el backend indicado.
+    Generador de (chunk, results, error, elapsed): results es la lista de FileResult
+    del lote, o [] con error != None si el lote falló; elapsed en segundos.
+
+    chunks puede ser un iterador perezoso: solo se consumen lotes mientras haya
+    menos de max_in_flight en vuelo (default: workers * IN_FLIGHT_PER_WORKER),
+    así la memoria no crece con el tamaño del árbol y el descubrimiento de
+    ficheros se solapa con el análisis.
+    """
+    max_in_flight = max_in_flight or workers * IN_FLIGHT_PER_WORKER
+    if backend == "thread":
+        tasks = ((chunk, None) for chunk in chunks)
+        yield from _run_executor(ThreadPoolExecutor(max_workers=workers), tasks, max_in_flight,
+                                 checkpatch_script, kernel_dir, checkpatch_args, runner, cache)
+    elif backend == "process":
+        # La caché se consulta y actualiza en el proceso principal: sus contadores
+        # y su lock no se comparten con los procesos hijos
+        yield from _with_parent_cache(
+            lambda tasks: _run_executor(ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker,
+                                                            initargs=(get_classifier(),)),
+                                        tasks, max_in_flight,
+                                        checkpatch_script, kernel_dir, checkpatch_args),
+            chunks, cache)
+    elif backend == "asyncio":
+        yield from _with_parent_cache(
+            lambda tasks: _run_asyncio(tasks, max_in_flight, checkpatch_script, kernel_dir, checkpatch_args, workers),
+            chunks, cache)
+    else:
+        raise ValueError(f"Backend desconocido: {backend}")
+
+
+def _init_process_worker(classifier):
+    """Initializer de los procesos del backend process: señales y el clasificador del proceso principal."""
+    init_worker_process()
+    set_classifier(classifier)
+
+
+def _timed_analyze_batch(chunk, checkpatch_script, kernel_dir, checkpatch_args, runner=None, cache=None):
+    """analyze_batch midiendo su duración dentro del worker (a nivel de módulo para poder enviarse a procesos)."""
+    start = time.perf_counter()
+    results = analyze_batch(chunk, checkpatch_script, kernel_dir, runner, cache, checkpatch_args)
+    return results, time.perf_counter() - start
+
+
+def _run_executor(executor, tasks, max_in_flight, checkpatch_script, kernel_dir, checkpatch_args, runner=None, cache=None):
+    """
+    tasks: iterador de (chunk, precomputed). Los lotes con resultados ya calculados
+    (aciertos de caché) se entregan como futures resueltos, sin pasar por el executor.
+    """
+    tasks = iter(tasks)
+    futures = {}
+
+    def submit_next():
+        if cancelled():
+            return False
+        for chunk, precomputed in tasks:
+            if precomputed is not None:
+                future = Future()
+                future.set_result((precomputed, 0.0))
+            else:
+                future = executor.submit(_timed_analyze_batch, chunk, checkpatch_script, kernel_dir, checkpatch_args,
+                                         runner, cache)
+            futures[future] = chunk
+            return True
+        return False
+
+    with executor:
+        while len(futures) < max_in_flight and submit_next():
+            pass
+        while futures:
+            # Esperas por tramos: tras una cancelación hay que matar a tiempo los procesos colgados
+            done, _ = wait(futures, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            enforce_deadline()
+            for future in done:
+                chunk = futures.pop(future)
+                try:
+                    results, elapsed = future.result()
+                except Exception as e:
+                    yield chunk, [], e, 0.0
+                else:
+                    yield chunk, results, None, elapsed
+                submit_next()
+
+
+def _with_parent_cache(run, chunks, cache):
+    """
+    Consulta la caché en este proceso y ejecuta `run` con tareas (chunk, precomputed):
+    los aciertos van como precomputed y solo los fallos se analizan.
+    """
+    if not cache:
+        yield from run((chunk, None) for chunk in chunks)
+        return
+
+    keys = {}
+
+    def tasks():
+        for chunk in chunks:
+            hits = []
+            misses = []
+            for file_path in chunk:
+                key, cached = cache.get(file_path)
+                if cached:
+                    hits.append(make_result(file_path, *cached))
+                else:
+                    keys[str(file_path)] = key
+                    misses.append(file_path)
+            if hits:
+                yield [r.file for r in hits], hits
+            if misses:
+                yield misses, None
+
+    for chunk, results, error, elapsed in run(tasks()):
+        for r in results:
+            key = keys.pop(r.file, None)
+            if key and not r.timed_out:
+                cache.put(key, list(r.errors), list(r.warnings), r.output)
+        for file_path in chunk:
+            keys.pop(str(file_path), None)
+        yield chunk, results, error, elapsed
+
+
+# ============================
+# Backend asyncio
+# ============================
+
+async def _checkpatch_async(targets, checkpatch_script, kernel_dir, checkpatch_args, timeout):
+    """Una invocación de checkpatch.pl; retorna su salida o None si excede el timeout."""
+    proc = await asyncio.create_subprocess_exec(
+        "perl", str(checkpatch_script), *(checkpatch_args or CHECKPATCH_ARGS), *targets,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        cwd=str(kernel_dir) if kernel_dir else None
+    )
+    register(proc)
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+        check_exit(proc.returncode)
+        return stdout.decode("utf-8", errors="replace")
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return None
+    finally:
+        unregister(proc)
+
+
+async def _checkpatch_chunk_async(chunk, checkpatch_script, kernel_dir, checkpatch_args, semaphore):
+    """Ejecuta un checkpatch.pl para el lote y retorna (lista de FileResult, duración)."""
+    targets = [checkpatch_target(f, kernel_dir) for f in chunk]
+    async with semaphore:
+        if cancelled():
+            raise Cancelled("ejecución cancelada")
+        start = time.perf_counter()
+        output = await _checkpatch_async(targets, checkpatch_script, kernel_dir, checkpatch_args,
+                                         checkpatch_timeout(chunk))
+        if output is not None:
+            outputs = split_checkpatch_output(output, targets) if len(chunk) > 1 else {targets[0]: output}
+        else:
+            # Igual que run_checkpatch_batch/run_checkpatch: fichero a fichero y un reintento con más tiempo
+            outputs = {}
+            for file_path, target in zip(chunk, targets):
+                timeout = checkpatch_timeout([file_path])
+                single = None
+                if len(chunk) > 1:
+                    single = await _checkpatch_async([target], checkpatch_script, kernel_dir, checkpatch_args, timeout)
+                if single is None:
+                    single = await _checkpatch_async([target], checkpatch_script, kernel_dir, checkpatch_args,
+                                                     timeout * CHECKPATCH_RETRY_FACTOR)
+                outputs[target] = single
+        elapsed = time.perf_counter() - start
+
+    # Igual que run_checkpatch/run_checkpatch_batch: sin salida no hay issues, None es un timeout
+    results = []
+    for file_path, target in zip(chunk, targets):
+        output = outputs[target]
+        errors, warnings = parse_checkpatch_output(output) if output is not None else ([], [])
+        results.append(make_result(file_path, errors, warnings, output))
+    return results, elapsed
+
+
+def _run_asyncio(tasks, max_in_flight, checkpatch_script, kernel_dir, checkpatch_args, workers):
+    """
+    Corre el bucle de eventos en un hilo auxiliar y entrega los resultados
+    por una cola al generador, que se consume desde el hilo principal.
+    Un lote ocupa su hueco de la ventana hasta que el consumidor recoge su resultado.
+    """
+    results_queue = queue.Queue()
+    window = threading.Semaphore(max_in_flight)
+    stop = threading.Event()  # el consumidor dejó de pedir resultados
+    done = object()
+
+    async def run_all():
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(workers)
+
+        async def one(chunk, precomputed):
+            try:
+                if precomputed is None:
+                    results, elapsed = await _checkpatch_chunk_async(chunk, checkpatch_script, kernel_dir,
+                                                                   checkpatch_args, semaphore)
+                    results_queue.put((chunk, results, None, elapsed))
+                else:
+                    results_queue.put((chunk, precomputed, None, 0.0))
+            except Exception as e:
+                results_queue.put((chunk, [], e, 0.0))
+
+        pending = set()
+        task_iter = iter(tasks)
+        while True:
+            # Reservar hueco antes de pedir el siguiente lote al iterador
+            # (la espera se hace fuera del bucle para no bloquear los subprocesos en curso)
+            await loop.run_in_executor(None, window.acquire)
+            if stop.is_set() or cancelled():
+                break
+            try:
+                chunk, precomputed = next(task_iter)
+            except StopIteration:
+                break
+            task = asyncio.create_task(one(chunk, precomputed))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+
+    failure = []
+
+    def loop_thread():
+        try:
+            asyncio.run(run_all())
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            results_queue.put(done)
+
+    thread = threading.Thread(target=loop_thread, daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                item = results_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                enforce_deadline()
+                continue
+            if item is done:
+                break
+            yield item
+            window.release()
+    finally:
+        # Si el consumidor para antes (break o excepción) el hilo puede estar esperando
+        # hueco en la ventana: se le avisa y se le da uno para que run_all termine
+        stop.set()
+        window.release()
+        thread.join()
+    if failure:
+        raise failure[0]
+
+
+def run_fixes(tasks, workers=1, max_in_flight=None):
+    """
+    Aplica apply_fixes a cada (file_path, issues) de tasks con `workers` procesos.
+    Generador de (file_path, issues, results) en el orden de tasks, sea cual sea el
+    orden en que terminen, para que report_data salga igual que en secuencial.
+
+    tasks puede ser un iterador perezoso (p.ej. un NDJSON): solo hay max_in_flight
+    ficheros en vuelo (default: workers * IN_FLIGHT_PER_WORKER) y un mismo fichero
+    nunca se corrige en dos procesos a la vez.
+    """
+    if workers <= 1:
+        for file_path, issues in tasks:
+            yield file_path, issues, apply_fixes(file_path, issues)
+        return
+
+    max_in_flight = max_in_flight or workers * IN_FLIGHT_PER_WORKER
+    pending = deque()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker_process)
+    try:
+        for file_path, issues in tasks:
+            while pending and (len(pending) >= max_in_flight or any(p[0] == file_path for p in pending)):
+                done_path, done_issues, future = pending.popleft()
+                yield done_path, done_issues, future.result()
+            pending.append((file_path, issues, executor.submit(apply_fixes, file_path, issues)))
+        while pending:
+            done_path, done_issues, future = pending.popleft()
+            yield done_path, done_issues, future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
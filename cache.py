@@ -0,0 +1,136 @@
+# cache.py
+"""
+Caché en disco de resultados de checkpatch
+
+Cada entrada se guarda como JSON en <cache_dir>/<ab>/<clave>.json, donde la clave
+es el hash de (contenido del fichero, ruta pasada a checkpatch, hash de checkpatch.pl,
+flags de checkpatch). La ruta forma parte de la clave porque el resultado depende
+de ella (reglas por extensión, mensajes que incluyen el nombre del fichero).
+
+La caché tiene un tamaño máximo; al superarlo se eliminan las entradas menos
+usadas recientemente (LRU por mtime, que se actualiza en cada acierto).
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from utils import CHECKPATCH_ARGS, checkpatch_target
+
+DEFAULT_CACHE_DIR = ".cache/checkpatch"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(file_path):
+    """sha256 del contenido de un fichero."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class AnalysisCache:
+    """Caché content-addressed de (errors, warnings, output) por fichero."""
+
+    def __init__(self, cache_dir, checkpatch_script, kernel_dir=None, flags=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.kernel_dir = kernel_dir
+        self.max_bytes = max_bytes
+        flags = CHECKPATCH_ARGS if flags is None else flags
+        self._prefix = f"{file_digest(checkpatch_script)}\0{' '.join(flags)}\0"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._bytes = sum(p.stat().st_size for p in self.cache_dir.glob("*/*.json"))
+        if self._bytes > self.max_bytes:
+            self._evict()
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def key(self, file_path):
+        target = checkpatch_target(file_path, self.kernel_dir)
+        return hashlib.sha256(f"{self._prefix}{target}\0{file_digest(file_path)}".encode("utf-8")).hexdigest()
+
+    def get(self, file_path):
+        """
+        Busca el resultado de un fichero.
+        Retorna (key, resultado) donde resultado es (errors, warnings, output) o None si no está.
+        """
+        try:
+            key = self.key(file_path)
+        except OSError:
+            # Fichero ilegible: se analiza igualmente (y fallará allí), cuenta como fallo
+            with self._lock:
+                self.misses += 1
+            return None, None
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return key, None
+        with self._lock:
+            self.hits += 1
+        return key, (entry["errors"], entry["warnings"], entry["output"])
+
+    def put(self, key, errors, warnings, output):
+        """Guarda un resultado. Los resultados vacíos (timeout/fallo de checkpatch) no se cachean."""
+        if key is None or not output:
+            return
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(exist_ok=True)
+        data = json.dumps({"errors": errors, "warnings": warnings, "output": output})
+        tmp_path = entry_path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        with self._lock:
+            # Al sobrescribir una entrada existente solo cuenta la diferencia de tamaño
+            try:
+                replaced = entry_path.stat().st_size
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, entry_path)
+            self._bytes += len(data) - replaced
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Elimina las entradas más antiguas hasta bajar al 90% del tamaño máximo."""
+        entries = []
+        for p in self.cache_dir.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, p in entries:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._bytes = total
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups * 100) if lookups else 0,
+        }
@@ -0,0 +1,108 @@
+# checkpoint.py
+"""
+Directorio de ejecución con checkpoints para reanudar un análisis
+
+Un --analyze de todo el árbol que se interrumpe (OOM, timeout de CI, Ctrl-C)
+perdía todo el trabajo, porque los resultados solo existen en memoria hasta
+el final. Con --run-dir cada resultado se añade a <run_dir>/checkpoint.ndjson
+(volcado a disco cada CHECKPOINT_FLUSH_EVERY ficheros) y <run_dir>/run.json
+guarda los parámetros de la ejecución.
+
+Con --resume se releen los resultados ya completados (para reconstruir los
+agregados e informes), esos ficheros se omiten en el análisis y los nuevos
+resultados se añaden al mismo checkpoint. Solo se reanuda si los parámetros
+coinciden: con otro checkpatch o con otros filtros los resultados no serían
+comparables.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from engine import STATUS_TIMEOUT, make_result
+from utils import NdjsonWriter, iter_ndjson
+
+CHECKPOINT_FILE = "checkpoint.ndjson"
+RUN_META_FILE = "run.json"
+CHECKPOINT_FLUSH_EVERY = 20
+
+
+def _drop_partial_line(path):
+    """Recorta una última línea incompleta (escritura interrumpida) antes de seguir añadiendo."""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            step = min(64 * 1024, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                f.truncate(pos + newline + 1)
+                return
+        f.truncate(0)
+
+
+class RunCheckpoint:
+    """
+    Checkpoint de una ejecución de análisis.
+    meta: parámetros de la ejecución (dict serializable) que deben coincidir al reanudar.
+    """
+
+    def __init__(self, run_dir, meta, resume=False):
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.run_dir / CHECKPOINT_FILE
+        self.meta_path = self.run_dir / RUN_META_FILE
+        self.meta = meta
+        self.resumed = resume and self.path.exists() and self.meta_path.exists()
+        if self.resumed:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            mismatched = sorted(k for k in meta if previous.get(k) != meta[k])
+            if mismatched:
+                raise ValueError(f"parámetros distintos a los de la ejecución guardada: {', '.join(mismatched)}")
+            _drop_partial_line(self.path)
+        else:
+            # Ejecución nueva: se vacía el checkpoint anterior antes de escribir los
+            # parámetros nuevos, para que un --resume nunca combine unos con los otros
+            self.path.write_text("", encoding="utf-8")
+        self._write_meta(finished=False)
+        self.completed = set()
+        self._writer = None
+
+    def _write_meta(self, finished):
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**self.meta, "finished": finished}, f, indent=2)
+        os.replace(tmp_path, self.meta_path)
+
+    def replay(self):
+        """Resultados ya completados en la ejecución anterior (vacío si no se reanuda)."""
+        if not self.resumed:
+            return
+        for record in iter_ndjson(self.path):
+            self.completed.add(record["file"])
+            output = None if record.get("status") == STATUS_TIMEOUT else record["output"]
+            yield make_result(record["file"], record["error"], record["warning"], output)
+
+    def record(self, result):
+        """Añade un resultado al checkpoint."""
+        if self._writer is None:
+            self._writer = NdjsonWriter(self.path, flush_every=CHECKPOINT_FLUSH_EVERY, append=self.resumed)
+        record = {
+            "file": result.file,
+            "error": list(result.errors),
+            "warning": list(result.warnings),
+            "output": result.output,
+        }
+        if result.timed_out:
+            record["status"] = result.status
+        self._writer.write(record)
+
+    def close(self, finished=False):
+        if self._writer is not None:
+            self._writer.close()
+        if finished:
+            self._write_meta(finished=True)
@@ -17,6 +17,7 @@ from typing import List, Dict, Tuple, Optional
 import json
 import time
 import logger
+from shutdown import Cancelled, cancelled, run_child
 
 
 class CompilationResult:
@@ -154,43 +155,43 @@ def compile_single_file(file_path: Path, kernel_root: Path) -> CompilationResult
         
         # Usar make con el target específico del archivo .o
         # Esto compila solo ese archivo sin compilar todo el kernel
-        result = subprocess.run(
+        returncode, stdout, stderr = run_child(
             ['make', str(obj_path)],
-            cwd=str(kernel_root),
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minutos timeout
+            timeout=300,  # 5 minutos timeout
+            cwd=str(kernel_root)
         )
         
         duration = time.time() - start_time
         
-        success = result.returncode == 0
+        success = returncode == 0
         error_msg = ""
         error_type = ""
         
         if not success:
             # Extraer mensaje de error más relevante
-            error_lines = result.stderr.split('\n')
+            error_lines = stderr.split('\n')
             # Buscar líneas con "error:" 
             error_msgs = [line for line in error_lines if 'error:' in line.lower()]
             if error_msgs:
                 error_msg = '\n'.join(error_msgs[:5])  # Primeros 5 errores
             else:
-                error_msg = result.stderr[:500]  # Primeros 500 chars si no hay errores explícitos
+                error_msg = stderr[:500]  # Primeros 500 chars si no hay errores explícitos
             
             # Clasificar el tipo de error
-            error_type = classify_compilation_error(error_msg, result.stderr)
+            error_type = classify_compilation_error(error_msg, stderr)
         
         return CompilationResult(
             file_path=str(file_path),
             success=success,
             duration=duration,
-            stdout=result.stdout,
-            stderr=result.stderr,
+            stdout=stdout,
+            stderr=stderr,
             error_message=error_msg,
             error_type=error_type
         )
         
+    except Cancelled:
+        raise
     except subprocess.TimeoutExpired:
         return CompilationResult(
             file_path=str(file_path),
@@ -249,7 +250,7 @@ def compile_modified_files(files: List[Path], kernel_root: Path,
         cleanup: Si True, limpia los archivos .o después de compilar
     
     Returns:
-        Lista de CompilationResult con los resultados
+        Lista de CompilationResult con los resultados (solo los terminados si se cancela)
     """
     results = []
     
@@ -261,6 +262,9 @@ def compile_modified_files(files: List[Path], kernel_root: Path,
     print(f"[COMPILE] Compilando {len(files)} archivos...")
     
     for i, file_path in enumerate(files, 1):
+        if cancelled():
+            break
+        
         # Solo compilar archivos .c
         if file_path.suffix != '.c':
             print(f"[COMPILE] [{i}/{len(files)}] Skipped (not .c): {file_path.name}")
@@ -268,7 +272,11 @@ def compile_modified_files(files: List[Path], kernel_root: Path,
         
         print(f"[COMPILE] [{i}/{len(files)}] Compiling: {file_path.relative_to(kernel_root)}")
         
-        result = compile_single_file(file_path, kernel_root)
+        try:
+            result = compile_single_file(file_path, kernel_root)
+        except Cancelled:
+            print(f"[COMPILE]   ✗ Cancelado")
+            break
         results.append(result)
         
         if result.success:
@@ -387,13 +395,14 @@ def print_summary(results: List[CompilationResult]):
                     print(f"    {first_line[:80]}")
 
 
-def save_json_report(results: List[CompilationResult], output_path: Path):
+def save_json_report(results: List[CompilationResult], output_path: Path, partial: bool = False):
     """
     Guarda los resultados de compilación en formato JSON.
     
     Args:
         results: Lista de CompilationResult
         output_path: Ruta donde guardar el archivo JSON
+        partial: True si la compilación se canceló antes de terminar
     """
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
@@ -403,6 +412,8 @@ def save_json_report(results: List[CompilationResult], output_path: Path):
         "summary": summary,
         "results": [r.to_dict() for r in results]
     }
+    if partial:
+        data["partial"] = True
     
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
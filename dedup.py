@@ -0,0 +1,123 @@
+# dedup.py
+"""
+Deduplicación de ficheros con contenido idéntico
+
+Un árbol del kernel tiene muchos ficheros byte a byte iguales (copias
+vendorizadas, duplicados por arquitectura, cabeceras copiadas). Se analiza
+solo el primero de cada contenido y su resultado se replica en el resto,
+sustituyendo la ruta en los mensajes y en la salida de checkpatch.
+
+Algunas reglas de checkpatch dependen de la ruta y no solo del contenido, así
+que forman parte de la clave: extensión y nombre del fichero, directorio de
+primer nivel y los prefijos con reglas propias de PATH_CLASSES (estilo de
+comentarios de net/ y drivers/net/, cabeceras uapi y asm, drivers/staging/).
+Dos ficheros iguales en, p.ej., arch/x86/include/asm/ y arch/arm/include/asm/
+se siguen deduplicando; uno en include/uapi/ y otro en include/linux/ no.
+"""
+
+import re
+from collections import defaultdict
+
+from cache import file_digest
+from engine import make_result
+from utils import checkpatch_target
+
+# Prefijos de ruta con reglas propias en checkpatch.pl (relativos al root del kernel)
+PATH_CLASSES = (
+    ("net", re.compile(r"^(?:drivers/)?net/")),
+    ("uapi", re.compile(r"^(?:arch/[^/]+/)?include/uapi/")),
+    ("asm", re.compile(r"^(?:arch/[^/]+/include/asm/|include/asm-generic/)")),
+    ("staging", re.compile(r"^drivers/staging/")),
+)
+
+
+def dedup_key(file_path, kernel_dir=None):
+    """Clave de deduplicación: contenido + las partes de la ruta que influyen en checkpatch."""
+    target = checkpatch_target(file_path, kernel_dir).replace("\\", "/")
+    parts = target.split("/")
+    top = parts[0] if len(parts) > 1 else ""
+    classes = tuple(label for label, pattern in PATH_CLASSES if pattern.match(target))
+    return file_digest(file_path), top, parts[-1], classes
+
+
+class Deduplicator:
+    """
+    Filtra los ficheros duplicados durante el descubrimiento y genera sus resultados
+    a partir del representante. Solo se usa desde el hilo consumidor.
+    """
+
+    def __init__(self, kernel_dir=None):
+        self.kernel_dir = kernel_dir
+        self.skipped = 0
+        self._first = {}                    # clave -> representante (str)
+        self._keys = {}                     # representante (str) -> clave
+        self._waiting = defaultdict(list)   # clave -> duplicados pendientes del resultado
+        self._done = {}                     # clave -> (representante, errors, warnings, timed_out)
+        self._failed = {}                   # clave -> error del análisis del representante
+
+    def filter(self, files):
+        """Produce solo el primer fichero de cada contenido; los demás quedan a la espera."""
+        for f in files:
+            try:
+                key = dedup_key(f, self.kernel_dir)
+            except OSError:
+                yield f
+                continue
+            if key in self._first:
+                self.skipped += 1
+                self._waiting[key].append(f)
+                continue
+            self._first[key] = str(f)
+            self._keys[str(f)] = key
+            yield f
+
+    def fan_out(self, result):
+        """Resultados de los duplicados del fichero de result descubiertos hasta ahora."""
+        key = self._keys.pop(result.file, None)
+        if key is None:
+            return []
+        self._done[key] = (result.file, result.errors, result.warnings, result.timed_out)
+        output = None if result.timed_out else result.output
+        return [self._copy(result.file, result.errors, result.warnings, output, dup)
+                for dup in self._waiting.pop(key, [])]
+
+    def fail(self, file, error):
+        """
+        El análisis del representante file falló: sus duplicados heredan el error (mismo
+        contenido, fallaría igual). Retorna los duplicados descubiertos hasta ahora; los
+        que se descubran después salen en failed_duplicates().
+        """
+        key = self._keys.pop(str(file), None)
+        if key is None:
+            return []
+        self._failed[key] = error
+        return self._waiting.pop(key, [])
+
+    def drain(self, get_output):
+        """
+        Resultados de los duplicados descubiertos después de que su representante terminara.
+        get_output(file): salida de checkpatch guardada para el representante.
+        """
+        for key in [key for key in self._waiting if key in self._done]:
+            file, errors, warnings, timed_out = self._done[key]
+            output = None if timed_out else get_output(file)
+            for dup in self._waiting.pop(key):
+                yield self._copy(file, errors, warnings, output, dup)
+
+    def failed_duplicates(self):
+        """(duplicado, error) de los duplicados pendientes cuyo representante falló."""
+        for key in [key for key in self._waiting if key in self._failed]:
+            for dup in self._waiting.pop(key):
+                yield dup, self._failed[key]
+
+    def _copy(self, file, errors, warnings, output, dup):
+        """Resultado de dup a partir del de file (output None: timeout, se replica como tal)."""
+        if output is None:
+            return make_result(dup, [], [], None)
+        src = checkpatch_target(file, self.kernel_dir)
+        dst = checkpatch_target(dup, self.kernel_dir)
+
+        def rewrite(issues):
+            return [{**issue, "message": issue["message"].replace(src, dst)} for issue in issues]
+
+        return make_result(dup, rewrite(errors), rewrite(warnings), output.replace(src, dst))
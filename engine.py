@@ -3,6 +3,9 @@
 Módulo principal para aplicar fixes
 """
 
+import re
+from collections import defaultdict
+
 from core import *
 from utils import *
 from report import *
@@ -18,68 +21,120 @@ from constants import (
     SIMPLE_STRTOL,
 )
 
-# Mapeo de reglas a funciones o tuplas (pattern, replacement, use_regex, condition)
-# Para funciones complejas, usar None como valor y definir la función en fixes_core.py
-AUTO_FIX_RULES = {
-    "Missing a blank line after declarations": fix_missing_blank_line,
-    "quoted string split across lines": fix_quoted_string_split,
-    "space required after that ','": SPACE_AFTER_COMMA,
-    "space prohibited before that ','": SPACE_BEFORE_COMMA,
-    "space prohibited before that close parenthesis ')'": SPACE_BEFORE_PAREN,
-    "spaces required around that '='": SPACES_AROUND_EQUALS,
-    "code indent should use tabs where possible": fix_indent_tabs,
-    "trailing whitespace": fix_trailing_whitespace,
+# Reglas de autofix: (clave del mensaje, tipo de checkpatch de --show-types o None, fixer).
+# El fixer es una función de core.py o una tupla (pattern, replacement, use_regex, condition).
+# La clave es un fragmento del mensaje de checkpatch; el tipo acota la búsqueda cuando el
+# issue lo trae (ver find_fix_rule). Es la única lista: AUTO_FIX_RULES y AUTO_FIX_RULE_TYPES
+# se derivan de ella.
+AUTO_FIX_TABLE = (
+    ("Missing a blank line after declarations", "LINE_SPACING", fix_missing_blank_line),
+    ("quoted string split across lines", "SPLIT_STRING", fix_quoted_string_split),
+    ("space required after that ','", "SPACING", SPACE_AFTER_COMMA),
+    ("space prohibited before that ','", "SPACING", SPACE_BEFORE_COMMA),
+    ("space prohibited before that close parenthesis ')'", "SPACING", SPACE_BEFORE_PAREN),
+    ("spaces required around that '='", "SPACING", SPACES_AROUND_EQUALS),
+    ("code indent should use tabs where possible", "CODE_INDENT", fix_indent_tabs),
+    ("trailing whitespace", "TRAILING_WHITESPACE", fix_trailing_whitespace),
     # TODO: PROBLEMATIC - Breaks } else if chains, leaves orphaned else statements
-    # "do not use assignment in if condition": fix_assignment_in_if,
-    "Use of const init definition must use __initconst": fix_initconst,
-    "space prohibited after that open parenthesis '('": SPACE_AFTER_OPEN_PAREN,
-    "space before tabs": SPACE_BEFORE_TABS,
-    "void function return statements are not generally useful": fix_void_return,
-    "braces {} are not necessary for single statement blocks": fix_unnecessary_braces,
-    "Block comments use a trailing */ on a separate line": fix_block_comment_trailing,
+    # ("do not use assignment in if condition", None, fix_assignment_in_if),
+    ("Use of const init definition must use __initconst", "INIT_ATTRIBUTE", fix_initconst),
+    ("space prohibited after that open parenthesis '('", "SPACING", SPACE_AFTER_OPEN_PAREN),
+    ("space before tabs", "SPACE_BEFORE_TAB", SPACE_BEFORE_TABS),
+    ("void function return statements are not generally useful", "RETURN_VOID", fix_void_return),
+    ("braces {} are not necessary for single statement blocks", "BRACES", fix_unnecessary_braces),
+    ("Block comments use a trailing */ on a separate line", "BLOCK_COMMENT_STYLE", fix_block_comment_trailing),
     # TODO: PROBLEMATIC - Generates invalid code (const static const)
-    # "char * array declaration might be better as static const": fix_char_array_static_const,
-    "Prefer 'unsigned int' to bare use of 'unsigned'": BARE_UNSIGNED,
-    "Improper SPDX comment style for '/home/kilynho/src/kernel/linux/init/initramfs_internal.h', please use '/*' instead": fix_spdx_comment,
-    "externs should be avoided in .c files": fix_extern_in_c,
-    "simple_strtoul is obsolete, use kstrtoul instead": SIMPLE_STRTOUL,
-    "simple_strtol is obsolete, use kstrtol instead": SIMPLE_STRTOL,
-    "Symbolic permissions 'S_IRUSR | S_IWUSR' are not preferred. Consider using octal permissions '0600'.": fix_symbolic_permissions,
-    "Prefer [subsystem eg: netdev]_notice([subsystem]dev, ... then dev_notice(dev, ... then pr_notice(...  to printk(KERN_NOTICE ...": fix_prefer_notice,
-    "Prefer [subsystem eg: netdev]_info([subsystem]dev, ... then dev_info(dev, ... then pr_info(...  to printk(KERN_INFO ...": fix_printk_info,
-    "Prefer [subsystem eg: netdev]_err([subsystem]dev, ... then dev_err(dev, ... then pr_err(...  to printk(KERN_ERR ...": fix_printk_err,
-    "Prefer [subsystem eg: netdev]_warn([subsystem]dev, ... then dev_warn(dev, ... then pr_warn(...  to printk(KERN_WARNING ...": fix_printk_warn,
-    "Prefer [subsystem eg: netdev]_dbg([subsystem]dev, ... then dev_dbg(dev, ... then pr_debug(...  to printk(KERN_DEBUG ...": fix_printk_debug,
-    "Prefer [subsystem eg: netdev]_emerg([subsystem]dev, ... then dev_emerg(dev, ... then pr_emerg(...  to printk(KERN_EMERG ...": fix_printk_emerg,
+    # ("char * array declaration might be better as static const", None, fix_char_array_static_const),
+    ("Prefer 'unsigned int' to bare use of 'unsigned'", "UNSPECIFIED_INT", BARE_UNSIGNED),
+    # La ruta del fichero va en el mensaje: la clave es solo el prefijo común
+    ("Improper SPDX comment style for '", "SPDX_LICENSE_TAG", fix_spdx_comment),
+    ("externs should be avoided in .c files", "AVOID_EXTERNS", fix_extern_in_c),
+    ("simple_strtoul is obsolete, use kstrtoul instead", "CONSIDER_KSTRTO", SIMPLE_STRTOUL),
+    ("simple_strtol is obsolete, use kstrtol instead", "CONSIDER_KSTRTO", SIMPLE_STRTOL),
+    ("Symbolic permissions 'S_IRUSR | S_IWUSR' are not preferred. Consider using octal permissions '0600'.", "SYMBOLIC_PERMS", fix_symbolic_permissions),
+    ("Prefer [subsystem eg: netdev]_notice([subsystem]dev, ... then dev_notice(dev, ... then pr_notice(...  to printk(KERN_NOTICE ...", "PREFER_PR_LEVEL", fix_prefer_notice),
+    ("Prefer [subsystem eg: netdev]_info([subsystem]dev, ... then dev_info(dev, ... then pr_info(...  to printk(KERN_INFO ...", "PREFER_PR_LEVEL", fix_printk_info),
+    ("Prefer [subsystem eg: netdev]_err([subsystem]dev, ... then dev_err(dev, ... then pr_err(...  to printk(KERN_ERR ...", "PREFER_PR_LEVEL", fix_printk_err),
+    ("Prefer [subsystem eg: netdev]_warn([subsystem]dev, ... then dev_warn(dev, ... then pr_warn(...  to printk(KERN_WARNING ...", "PREFER_PR_LEVEL", fix_printk_warn),
+    ("Prefer [subsystem eg: netdev]_dbg([subsystem]dev, ... then dev_dbg(dev, ... then pr_debug(...  to printk(KERN_DEBUG ...", "PREFER_PR_LEVEL", fix_printk_debug),
+    ("Prefer [subsystem eg: netdev]_emerg([subsystem]dev, ... then dev_emerg(dev, ... then pr_emerg(...  to printk(KERN_EMERG ...", "PREFER_PR_LEVEL", fix_printk_emerg),
     # TODO: PROBLEMATIC - Adds KERN_CONT instead of correct level (KERN_INFO, KERN_ERR, etc)
-    # "printk() should include KERN_<LEVEL> facility level": fix_printk_kern_level,
-    "Comparing jiffies is almost always wrong; prefer time_after, time_before and friends": fix_jiffies_comparison,
+    # ("printk() should include KERN_<LEVEL> facility level", None, fix_printk_kern_level),
+    ("Comparing jiffies is almost always wrong; prefer time_after, time_before and friends", "JIFFIES_COMPARISON", fix_jiffies_comparison),
     # TODO: PROBLEMATIC - Replaces strings incorrectly, breaks logging messages
-    # "Prefer using": fix_func_name_in_string,  # Matches "Prefer using '\"%%s...\", __func__'"
-    "else is not generally useful after a break or return": fix_else_after_return,
-    "Prefer __weak over __attribute__((weak))": fix_weak_attribute,
-    "Possible unnecessary 'out of memory' message": fix_oom_message,
-    "Use #include <linux/io.h> instead of <asm/io.h>": fix_asm_includes,
-    "Use #include <linux/cacheflush.h> instead of <asm/cacheflush.h>": fix_asm_includes,
-    "__initdata should be placed after": fix_initdata_placement,
-    "Missing or malformed SPDX-License-Identifier tag in line 1": fix_missing_spdx,
-    "msleep < 20ms can sleep for up to 20ms; see function description of msleep().": fix_msleep_too_small,
-    "kmalloc(x) without GFP flag": fix_kmalloc_no_flag,
-    "Prefer strscpy over strcpy - see: https://github.com/KSPP/linux/issues/88": fix_strcpy_to_strscpy,
-    "Prefer using strscpy instead of strncpy": fix_strncpy,
-    "of_property_read without check": fix_of_read_no_check,
-    "switch and case should be at the same indent": fix_switch_case_indent,
-    "Avoid logging continuation uses where feasible": fix_logging_continuation,
-    "It's generally not useful to have the filename in the file": fix_filename_in_file,
-    "please, no spaces at the start of a line": fix_spaces_at_start_of_line,
-    "__FUNCTION__ is gcc specific, use __func__": fix_function_macro,
-    "space required before the open brace '{'": fix_space_before_open_brace,
-    "else should follow close brace '}'": fix_else_after_close_brace,
-    "Prefer sizeof(*p) over sizeof(struct type)": fix_sizeof_struct,
-    "Consecutive strings are generally better as a single string": fix_consecutive_strings,
-    "Comparison to NULL could be written": fix_comparison_to_null,
-    "Comparisons should place the constant on the right side": fix_constant_comparison,
-}
+    # ("Prefer using", None, fix_func_name_in_string),  # Matches "Prefer using '\"%%s...\", __func__'"
+    ("else is not generally useful after a break or return", "UNNECESSARY_ELSE", fix_else_after_return),
+    ("Prefer __weak over __attribute__((weak))", "PREFER_DEFINED_ATTRIBUTE_MACRO", fix_weak_attribute),
+    ("Possible unnecessary 'out of memory' message", "OOM_MESSAGE", fix_oom_message),
+    ("Use #include <linux/io.h> instead of <asm/io.h>", "INCLUDE_LINUX", fix_asm_includes),
+    ("Use #include <linux/cacheflush.h> instead of <asm/cacheflush.h>", "INCLUDE_LINUX", fix_asm_includes),
+    ("__initdata should be placed after", "MISPLACED_INIT", fix_initdata_placement),
+    ("Missing or malformed SPDX-License-Identifier tag in line 1", "SPDX_LICENSE_TAG", fix_missing_spdx),
+    ("msleep < 20ms can sleep for up to 20ms; see function description of msleep().", "MSLEEP", fix_msleep_too_small),
+    ("kmalloc(x) without GFP flag", None, fix_kmalloc_no_flag),
+    ("Prefer strscpy over strcpy - see: https://github.com/KSPP/linux/issues/88", "STRCPY", fix_strcpy_to_strscpy),
+    ("Prefer using strscpy instead of strncpy", "STRNCPY", fix_strncpy),
+    ("of_property_read without check", None, fix_of_read_no_check),
+    ("switch and case should be at the same indent", "SWITCH_CASE_INDENT_LEVEL", fix_switch_case_indent),
+    ("Avoid logging continuation uses where feasible", "LOGGING_CONTINUATION", fix_logging_continuation),
+    ("It's generally not useful to have the filename in the file", "EMBEDDED_FILENAME", fix_filename_in_file),
+    ("please, no spaces at the start of a line", "LEADING_SPACE", fix_spaces_at_start_of_line),
+    ("__FUNCTION__ is gcc specific, use __func__", "USE_FUNC", fix_function_macro),
+    ("space required before the open brace '{'", "SPACING", fix_space_before_open_brace),
+    ("else should follow close brace '}'", "ELSE_AFTER_BRACE", fix_else_after_close_brace),
+    ("Prefer sizeof(*p) over sizeof(struct type)", "ALLOC_SIZEOF_STRUCT", fix_sizeof_struct),
+    ("Consecutive strings are generally better as a single string", "STRING_FRAGMENTS", fix_consecutive_strings),
+    ("Comparison to NULL could be written", "COMPARISON_TO_NULL", fix_comparison_to_null),
+    ("Comparisons should place the constant on the right side", "CONSTANT_COMPARISON", fix_constant_comparison),
+)
+
+AUTO_FIX_RULES = {key: fixer for key, _, fixer in AUTO_FIX_TABLE}
+
+# Tipo de checkpatch (--show-types) que produce cada regla de AUTO_FIX_RULES.
+# Las reglas sin tipo propio en checkpatch.pl no aparecen.
+AUTO_FIX_RULE_TYPES = {key: rule_type for key, rule_type, _ in AUTO_FIX_TABLE if rule_type}
+
+# Tipos que --fixable-only pide a checkpatch (--types)
+FIXABLE_TYPES = sorted(set(AUTO_FIX_RULE_TYPES.values()))
+
+# Índice de despacho de reglas (se construye una vez al importar):
+# - con type_id (--show-types) primero se comprueban las pocas reglas de ese tipo
+# - sin tipo, o si ninguna regla del tipo coincide (p.ej. otra versión de checkpatch
+#   emite el mensaje con otro tipo), una única expresión regular con la alternancia de
+#   todas las claves localiza la regla en una pasada por el mensaje
+#   (ninguna clave es subcadena de otra, así que no depende del orden de AUTO_FIX_TABLE)
+RULES_BY_TYPE = defaultdict(list)
+for _rule_key, _rule_type, _ in AUTO_FIX_TABLE:
+    if _rule_type:
+        RULES_BY_TYPE[_rule_type].append(_rule_key)
+RULES_BY_TYPE = dict(RULES_BY_TYPE)
+RULE_PATTERN = re.compile("|".join(re.escape(k) for k in sorted(AUTO_FIX_RULES, key=len, reverse=True)))
+
+
+def find_fix_rule(message, type_id=None):
+    """Clave de AUTO_FIX_RULES aplicable a un issue, o None si no hay regla."""
+    for rule_key in RULES_BY_TYPE.get(type_id, ()) if type_id else ():
+        if rule_key in message:
+            return rule_key
+    m = RULE_PATTERN.search(message)
+    return m.group(0) if m else None
+
+
+def _apply_pattern_batches(file_path, batches):
+    """Aplica los lotes regla de patrón -> resultados pendientes, rellena "fixed" y los vacía."""
+    for rule_key, batch in batches.items():
+        pattern, replacement, use_regex, condition = AUTO_FIX_RULES[rule_key]
+        try:
+            fixed = apply_pattern_replace_lines(file_path, [r["line"] for r in batch],
+                                                pattern, replacement, use_regex, condition)
+        except Exception as e:
+            for result in batch:
+                result["message"] = result["rule"] = f"{rule_key} (EXCEPTION: {e})"
+            continue
+        for result, line_fixed in zip(batch, fixed):
+            result["fixed"] = line_fixed
+    batches.clear()
+
 
 def apply_fixes(file_path, issues):
     """
@@ -94,46 +149,55 @@ def apply_fixes(file_path, issues):
        }
     """
 
-    # Unificar backup y lectura
-    res = backup_read(file_path, 1)
-    lines = res[0] if res else []
+    # Backup y una sola lectura; los fixers trabajan sobre las líneas en memoria
+    # y el fichero se escribe una vez (atómicamente) al cerrar la sesión
     results = []
+    # Reglas de patrón (tuplas pattern, replacement, use_regex, condition): sus issues
+    # se acumulan por regla y cada regla se aplica a todas sus líneas en una pasada.
+    # Para respetar el orden de los issues los lotes pendientes se aplican antes de
+    # cada fixer de función (puede fusionar o borrar líneas) y antes de aplicar otra
+    # regla de patrón a una línea que ya tiene una pendiente
+    batches = defaultdict(list)
+    pending_rules = {}  # línea -> regla de patrón pendiente en esa línea
 
-    for issue in issues:
-        line = issue.get("line")
-        msg = issue.get("message")
-        issue_type = issue.get("type", "warning")
-
-        applied_rule = None
-        fixed = False
-
-        # Buscar regla aplicable
-        for rule_key, rule_fn in AUTO_FIX_RULES.items():
-            if rule_key in msg:
-                applied_rule = rule_key
-                try:
-                    # Si es una tupla (pattern, replacement, use_regex, condition), usar helper genérico
-                    if isinstance(rule_fn, tuple):
-                        pattern, replacement, use_regex, condition = rule_fn
-                        fixed = apply_pattern_replace(file_path, line, pattern, replacement, use_regex, condition)
-                    else:
-                        # Si es una función, llamarla directamente
-                        fixed = rule_fn(file_path, line)
-                except Exception as e:
-                    fixed = False
-                    applied_rule = f"{rule_key} (EXCEPTION: {e})"
-                break
-
-        # Resultado estructurado
-        result = {
-            "type": issue_type,
-            "fixed": bool(fixed),
-            "message": applied_rule if applied_rule else "No applicable fix",
-            "line": line,
-            "rule": applied_rule
-        }
+    with FixSession(file_path):
+        for issue in issues:
+            line = issue.get("line")
+            msg = issue.get("message")
+
+            # Buscar regla aplicable
+            rule_key = find_fix_rule(msg, issue.get("type_id"))
 
-        results.append(result)
+            # Resultado estructurado
+            result = {
+                "type": issue.get("type", "warning"),
+                "fixed": False,
+                "message": rule_key if rule_key else "No applicable fix",
+                "line": line,
+                "rule": rule_key
+            }
+            results.append(result)
+            if not rule_key:
+                continue
+
+            rule_fn = AUTO_FIX_RULES[rule_key]
+            if isinstance(rule_fn, tuple):
+                if pending_rules.get(line, rule_key) != rule_key:
+                    _apply_pattern_batches(file_path, batches)
+                    pending_rules.clear()
+                batches[rule_key].append(result)
+                pending_rules[line] = rule_key
+                continue
+            if batches:
+                _apply_pattern_batches(file_path, batches)
+                pending_rules.clear()
+            try:
+                # Si es una función, llamarla directamente
+                result["fixed"] = bool(rule_fn(file_path, line))
+            except Exception as e:
+                result["message"] = result["rule"] = f"{rule_key} (EXCEPTION: {e})"
+
+        _apply_pattern_batches(file_path, batches)
 
     return results
 
@@ -142,96 +206,204 @@ def apply_fixes(file_path, issues):
 # Funciones del Analyzer
 # ============================
 
-from collections import defaultdict, Counter
-from pathlib import Path
-from utils import run_checkpatch, FUNCTIONALITY_MAP
+from collections import defaultdict, Counter, namedtuple
+from utils import run_checkpatch, run_checkpatch_batch, FUNCTIONALITY_MAP
+from occurrences import InternTable, ReasonIndex
+from subsystems import PrefixClassifier
+
+
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"  # checkpatch excedió el tiempo límite también en el reintento
+
+
+class FileResult(namedtuple("FileResult", ["file", "functionality", "errors", "warnings", "output", "status"],
+                            defaults=(STATUS_OK,))):
+    """
+    Resultado inmutable del análisis de un fichero.
+    errors/warnings son tuplas de {"line": N, "message": "...", "type_id": "..."}; output es la salida completa de checkpatch.
+    status es STATUS_OK o STATUS_TIMEOUT (fichero sin analizar: no cuenta como correcto).
+    Se puede enviar entre procesos (pickle) y no toca ningún estado compartido.
+    """
+    __slots__ = ()
+
+    @property
+    def timed_out(self):
+        return self.status == STATUS_TIMEOUT
+
+    @property
+    def is_correct(self):
+        return not self.timed_out and not self.errors and not self.warnings
+
+
+# Clasificador de la ejecución en curso; analyze_mode lo sustituye por uno anclado
+# en el root del kernel (y opcionalmente con las entradas de MAINTAINERS)
+_classifier = PrefixClassifier.from_map(FUNCTIONALITY_MAP)
 
-# Variables globales para el análisis
-summary = defaultdict(lambda: {"correct": [], "warnings": [], "errors": []})
-global_counts = {"correct": 0, "warnings": 0, "errors": 0}
-error_reasons = Counter()
-warning_reasons = Counter()
-error_reason_files = defaultdict(list)
-warning_reason_files = defaultdict(list)
-file_outputs = {}  # Guarda el output completo de checkpatch por fichero
-kernel_dir_path = ""  # Para calcular rutas relativas
+
+def set_classifier(classifier):
+    """Establece el PrefixClassifier que usa classify_functionality (también en los procesos hijo)."""
+    global _classifier
+    _classifier = classifier
+
+
+def get_classifier():
+    return _classifier
 
 
 def classify_functionality(file_path):
-    """Clasifica un archivo según su funcionalidad."""
-    parts = Path(file_path).parts
-    for key, label in FUNCTIONALITY_MAP.items():
-        if key in parts:
-            return label
-    return "Other"
+    """Clasifica un archivo según su funcionalidad (prefijo más largo del clasificador actual)."""
+    return _classifier.classify(file_path)
 
 
-def analyze_file(file_path, checkpatch_script, kernel_dir=None):
+def make_result(file_path, errors, warnings, output):
     """
-    Analiza un archivo con checkpatch y actualiza las estructuras globales.
-    Retorna (errors, warnings, is_correct)
+    Construye el FileResult de un fichero a partir de la salida ya parseada de checkpatch.
+    output None (como lo retornan los runners) indica que checkpatch excedió el tiempo límite.
     """
-    global kernel_dir_path
-    if kernel_dir:
-        kernel_dir_path = kernel_dir
-    
-    errors, warnings, output = run_checkpatch(file_path, checkpatch_script, kernel_dir)
-    
-    functionality = classify_functionality(file_path)
-    file_path_str = str(file_path)
-    
-    # Guardar output completo
-    file_outputs[file_path_str] = output
-    
-    if errors:
-        summary[functionality]["errors"].append(file_path_str)
-        global_counts["errors"] += len(errors)
-        for err in errors:
-            msg = err["message"].replace("ERROR: ", "")
-            error_reasons[msg] += 1
-            error_reason_files[msg].append((file_path_str, err["line"]))
-    
-    if warnings:
-        summary[functionality]["warnings"].append(file_path_str)
-        global_counts["warnings"] += len(warnings)
-        for warn in warnings:
-            msg = warn["message"].replace("WARNING: ", "")
-            warning_reasons[msg] += 1
-            warning_reason_files[msg].append((file_path_str, warn["line"]))
+    if output is None:
+        return FileResult(str(file_path), classify_functionality(file_path), (), (), "", STATUS_TIMEOUT)
+    return FileResult(str(file_path), classify_functionality(file_path), tuple(errors), tuple(warnings), output)
+
+
+def analyze_file(file_path, checkpatch_script, kernel_dir=None, runner=None, cache=None, checkpatch_args=None):
+    """
+    Analiza un archivo con checkpatch. No modifica estado global.
+    runner: función alternativa con la firma de run_checkpatch (p.ej. un pool de workers persistentes,
+            que ya lleva sus propios checkpatch_args)
+    cache: AnalysisCache opcional que se consulta antes de ejecutar checkpatch
+    checkpatch_args: argumentos de checkpatch (default: utils.CHECKPATCH_ARGS)
+    Retorna un FileResult
+    """
+    key, cached = cache.get(file_path) if cache else (None, None)
+    if cached:
+        errors, warnings, output = cached
+    else:
+        if runner:
+            errors, warnings, output = runner(file_path, checkpatch_script, kernel_dir)
+        else:
+            errors, warnings, output = run_checkpatch(file_path, checkpatch_script, kernel_dir, checkpatch_args)
+        if cache and output is not None:
+            cache.put(key, errors, warnings, output)
+    return make_result(file_path, errors, warnings, output)
+
+
+def analyze_batch(file_paths, checkpatch_script, kernel_dir=None, runner=None, cache=None, checkpatch_args=None):
+    """
+    Analiza un lote de archivos con una sola invocación de checkpatch.
+    Los ficheros que ya están en la caché no se incluyen en la invocación.
+    Retorna una lista de FileResult en el orden de file_paths.
+    """
+    if len(file_paths) == 1:
+        return [analyze_file(file_paths[0], checkpatch_script, kernel_dir, runner, cache, checkpatch_args)]
     
-    is_correct = not errors and not warnings
-    if is_correct:
-        summary[functionality]["correct"].append(file_path_str)
-        global_counts["correct"] += 1
+    outcomes = {}
+    keys = {}
+    pending = []
+    for file_path in file_paths:
+        key, cached = cache.get(file_path) if cache else (None, None)
+        if cached:
+            outcomes[file_path] = cached
+        else:
+            keys[file_path] = key
+            pending.append(file_path)
     
-    return errors, warnings, is_correct
-
-
-def get_analysis_summary():
-    """Retorna resumen del análisis."""
-    return {
-        "summary": dict(summary),
-        "global_counts": dict(global_counts),
-        "error_reasons": dict(error_reasons),
-        "warning_reasons": dict(warning_reasons),
-        "error_reason_files": dict(error_reason_files),
-        "warning_reason_files": dict(warning_reason_files),
-        "file_outputs": dict(file_outputs),
-        "kernel_dir": kernel_dir_path,
-    }
-
-
-def reset_analysis():
-    """Resetea las estructuras globales de análisis."""
-    global summary, global_counts, error_reasons, warning_reasons
-    global error_reason_files, warning_reason_files, file_outputs, kernel_dir_path
+    if pending:
+        for file_path, outcome in zip(pending, run_checkpatch_batch(pending, checkpatch_script, kernel_dir, checkpatch_args)):
+            outcomes[file_path] = outcome
+            if cache and outcome[2] is not None:
+                cache.put(keys[file_path], *outcome)
     
-    summary.clear()
-    global_counts = {"correct": 0, "warnings": 0, "errors": 0}
-    error_reasons.clear()
-    warning_reasons.clear()
-    error_reason_files.clear()
-    warning_reason_files.clear()
-    file_outputs.clear()
-    kernel_dir_path = ""
+    return [make_result(file_path, *outcomes[file_path]) for file_path in file_paths]
+
+
+class AnalysisAggregator:
+    """
+    Reúne los FileResult de un análisis en las estructuras que usan los reportes.
+    Solo se usa desde el hilo consumidor (el bucle de analyze_mode), por lo que no
+    necesita locks aunque los resultados vengan de hilos, procesos u otras máquinas.
+    """
+
+    def __init__(self, kernel_dir="", file_outputs=None):
+        self.kernel_dir = kernel_dir
+        self.summary = defaultdict(lambda: {"correct": [], "warnings": [], "errors": []})
+        self.global_counts = {"correct": 0, "warnings": 0, "errors": 0}
+        self.error_reasons = Counter()
+        self.warning_reasons = Counter()
+        # motivo -> ocurrencias (fichero, línea), con las rutas internadas en una tabla común
+        self.files = InternTable()
+        self.error_reason_files = ReasonIndex(self.files)
+        self.warning_reason_files = ReasonIndex(self.files)
+        # Los motivos se agrupan por tipo de checkpatch (--show-types) cuando lo hay;
+        # aquí se guarda un mensaje de ejemplo por tipo para los reportes, por separado
+        # para errores y warnings (un mismo tipo, p.ej. SPACING, puede tener ambos)
+        self.error_reason_messages = {}
+        self.warning_reason_messages = {}
+        # Guarda el output completo de checkpatch por fichero: un dict o un
+        # outputs.OutputStore para mantenerlo en disco en árboles grandes
+        self.file_outputs = {} if file_outputs is None else file_outputs
+        # Ficheros que checkpatch no pudo analizar en el tiempo límite
+        self.timed_out = []
 
+    def add(self, result):
+        """Añade el resultado de un fichero."""
+        file_path_str = result.file
+        functionality = self.summary[result.functionality]
+        
+        # Guardar output completo
+        self.file_outputs[file_path_str] = result.output
+        
+        if result.timed_out:
+            self.timed_out.append(file_path_str)
+            return
+        
+        if result.errors:
+            functionality["errors"].append(file_path_str)
+            self.global_counts["errors"] += len(result.errors)
+            for err in result.errors:
+                reason = self._reason(err, "ERROR: ", self.error_reason_messages)
+                self.error_reasons[reason] += 1
+                self.error_reason_files.add(reason, file_path_str, err["line"])
+        
+        if result.warnings:
+            functionality["warnings"].append(file_path_str)
+            self.global_counts["warnings"] += len(result.warnings)
+            for warn in result.warnings:
+                reason = self._reason(warn, "WARNING: ", self.warning_reason_messages)
+                self.warning_reasons[reason] += 1
+                self.warning_reason_files.add(reason, file_path_str, warn["line"])
+        
+        if result.is_correct:
+            functionality["correct"].append(file_path_str)
+            self.global_counts["correct"] += 1
+
+    def _reason(self, issue, prefix, messages):
+        """
+        Clave de agregación de un issue: su tipo o, sin --show-types, el mensaje.
+        messages: tipo -> mensaje de ejemplo de la severidad del issue.
+        """
+        msg = issue["message"].replace(prefix, "")
+        type_id = issue.get("type_id")
+        if not type_id:
+            return msg
+        if type_id not in messages:
+            messages[type_id] = msg
+        return type_id
+
+    def get_summary(self):
+        """
+        Retorna resumen del análisis en el formato que esperan los generadores de report.py.
+        Los índices de motivos se pasan sin copiar (son de solo lectura).
+        """
+        return {
+            "summary": dict(self.summary),
+            "global_counts": dict(self.global_counts),
+            "error_reasons": dict(self.error_reasons),
+            "warning_reasons": dict(self.warning_reasons),
+            "error_reason_files": self.error_reason_files,
+            "warning_reason_files": self.warning_reason_files,
+            "error_reason_messages": self.error_reason_messages,
+            "warning_reason_messages": self.warning_reason_messages,
+            "file_outputs": self.file_outputs,
+            "kernel_dir": self.kernel_dir,
+            "timed_out": list(self.timed_out),
+        }
@@ -0,0 +1,223 @@
+# linebuffer.py
+"""
+Buffer de líneas con lista de ediciones para las sesiones de fixes
+
+Los fixers reciben números de línea del fichero original (los de checkpatch),
+pero al insertar o borrar líneas las posiciones de las siguientes cambian;
+por eso hasta ahora los issues se aplicaban de abajo hacia arriba y cada
+lines.insert() sobre la lista del fichero costaba O(n).
+
+LineBuffer guarda el fichero como un hueco (slot) por línea original más uno
+final. Cada hueco es una lista corta con las líneas actuales que ocupan el
+lugar de esa línea original (la propia línea, las insertadas delante, o
+ninguna si se borró), y un árbol de Fenwick con el tamaño de cada hueco:
+
+- posición actual de una línea original (o de su hueco): O(log n)
+- acceso, inserción y borrado por posición actual: O(log n)
+- el fichero completo se materializa una sola vez al escribirlo
+
+Se comporta como una lista (MutableSequence) en posiciones actuales, así que
+los callbacks de los fixers funcionan sin cambios. begin()/commit()/rollback()
+permiten descartar las ediciones de un fix que no se aplica.
+"""
+
+from collections.abc import MutableSequence
+from itertools import chain
+
+
+class LineBuffer(MutableSequence):
+    """Líneas de un fichero con sus ediciones indexadas por línea original."""
+
+    def __init__(self, lines):
+        lines = list(lines)
+        self._original_count = len(lines)
+        self._slots = [[line] for line in lines] + [[]]
+        # Posición de la línea original dentro de su hueco (None si se borró)
+        self._orig_pos = [0] * len(lines) + [None]
+        self._tree = [0] * (len(self._slots) + 1)
+        for slot in range(len(lines)):
+            self._tree_add(slot, 1)
+        self._total = len(lines)
+        self._journal = None
+        # Línea original del fix en curso (begin), para decidir a qué hueco van las inserciones
+        self._anchor = None
+
+    # --- Árbol de Fenwick sobre el tamaño de los huecos ---
+
+    def _tree_add(self, slot, delta):
+        i = slot + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, slot):
+        """Número de líneas actuales en los huecos anteriores a slot."""
+        total = 0
+        i = slot
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, index):
+        """(hueco, desplazamiento) de la posición actual index (0 <= index < len)."""
+        slot = 0
+        remaining = index
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = slot + step
+            if nxt < len(self._tree) and self._tree[nxt] <= remaining:
+                slot = nxt
+                remaining -= self._tree[nxt]
+            step >>= 1
+        return slot, remaining
+
+    # --- Journal para descartar un fix ---
+
+    def begin(self, original_index=None):
+        """
+        Empieza a registrar los huecos modificados (para rollback). original_index es la
+        línea original del fix (ver insert()).
+        """
+        self._journal = {}
+        self._anchor = original_index
+
+    def commit(self):
+        self._journal = None
+        self._anchor = None
+
+    def rollback(self):
+        """Deshace las ediciones desde begin()."""
+        for slot, (lines, orig_pos) in self._journal.items():
+            delta = len(lines) - len(self._slots[slot])
+            if delta:
+                self._tree_add(slot, delta)
+                self._total += delta
+            self._slots[slot] = lines
+            self._orig_pos[slot] = orig_pos
+        self._journal = None
+        self._anchor = None
+
+    def _touch(self, slot):
+        if self._journal is not None and slot not in self._journal:
+            self._journal[slot] = (list(self._slots[slot]), self._orig_pos[slot])
+
+    # --- Líneas originales ---
+
+    @property
+    def original_count(self):
+        return self._original_count
+
+    def index_of(self, original_index):
+        """
+        Posición actual donde empieza el hueco de la línea original original_index (0-based):
+        la propia línea, o la primera de las insertadas delante de ella. Es la posición que
+        tendría en una lista editada de abajo hacia arriba, así que los fixers que miran
+        lines[idx - 1] siguen viendo la línea original anterior.
+        Fuera del fichero original se desplaza con el crecimiento neto, como haría una lista.
+        """
+        if original_index < 0:
+            return original_index
+        if original_index >= self._original_count:
+            return self._total + original_index - self._original_count
+        return self._prefix(original_index)
+
+    def get_original(self, original_index):
+        """Texto actual de la línea original (None si no existe o se borró)."""
+        if not 0 <= original_index < self._original_count:
+            return None
+        pos = self._orig_pos[original_index]
+        return None if pos is None else self._slots[original_index][pos]
+
+    def set_original(self, original_index, line):
+        pos = self._orig_pos[original_index]
+        self._touch(original_index)
+        self._slots[original_index][pos] = line
+
+    def lines(self):
+        """Materializa el contenido actual como lista de líneas."""
+        return list(chain.from_iterable(self._slots))
+
+    # --- MutableSequence en posiciones actuales ---
+
+    def __len__(self):
+        return self._total
+
+    def _normalize(self, index):
+        if index < 0:
+            index += self._total
+        if not 0 <= index < self._total:
+            raise IndexError("índice de línea fuera de rango")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._total))]
+        slot, offset = self._locate(self._normalize(index))
+        return self._slots[slot][offset]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._total)
+            if step != 1:
+                raise ValueError("solo se admiten slices contiguos")
+            values = list(value)
+            del self[start:max(start, stop)]
+            for offset, line in enumerate(values):
+                self.insert(start + offset, line)
+            return
+        slot, offset = self._locate(self._normalize(index))
+        self._touch(slot)
+        self._slots[slot][offset] = value
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            for i in sorted(range(*index.indices(self._total)), reverse=True):
+                del self[i]
+            return
+        slot, offset = self._locate(self._normalize(index))
+        self._touch(slot)
+        del self._slots[slot][offset]
+        pos = self._orig_pos[slot]
+        if pos is not None:
+            self._orig_pos[slot] = None if offset == pos else pos - (offset < pos)
+        self._tree_add(slot, -1)
+        self._total -= 1
+
+    def _insert_slot(self, index):
+        """
+        (hueco, desplazamiento) donde insertar en la posición actual index. En la frontera
+        entre dos huecos, durante un fix (begin(original_index)), lo insertado detrás de la
+        línea del fix se queda al final del hueco anterior y lo insertado delante, al principio
+        del hueco de la línea: así index_of() de las líneas siguientes sigue apuntando a ellas.
+        """
+        if index >= self._total:
+            slot, offset = len(self._slots) - 1, len(self._slots[-1])
+        else:
+            slot, offset = self._locate(index)
+        if offset or index == 0 or self._anchor is None or not 0 <= self._anchor < self._original_count:
+            return slot, offset
+        anchor_start = self._prefix(self._anchor)
+        if anchor_start < index:
+            slot, offset = self._locate(index - 1)
+            return slot, offset + 1
+        if anchor_start == index:
+            return self._anchor, 0
+        return slot, offset
+
+    def insert(self, index, value):
+        # Mismos límites que list.insert: fuera de rango se inserta al principio o al final
+        if index < 0:
+            index = max(0, index + self._total)
+        index = min(index, self._total)
+        slot, offset = self._insert_slot(index)
+        self._touch(slot)
+        self._slots[slot].insert(offset, value)
+        pos = self._orig_pos[slot]
+        if pos is not None and offset <= pos:
+            self._orig_pos[slot] = pos + 1
+        self._tree_add(slot, 1)
+        self._total += 1
+
+    def __iter__(self):
+        return chain.from_iterable(self._slots)
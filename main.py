@@ -10,22 +10,24 @@ Compatible con el flujo anterior de checkpatch_analyzer.py y checkpatch_autofix.
 """
 
 import argparse
+import itertools
 import json
+import subprocess
+import time
 import sys
 import logging
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
 
 # Sistema de logging
 import logger
 
 # Módulos unificados
 from engine import (
-    apply_fixes,
-    analyze_file, 
-    get_analysis_summary, 
-    reset_analysis
+    AnalysisAggregator,
+    FIXABLE_TYPES,
+    STATUS_OK,
+    STATUS_TIMEOUT,
+    set_classifier
 )
 from report import (
     generate_html_report, 
@@ -39,7 +41,44 @@ from report import (
     generate_autofix_detail_file_html,
     generate_compile_html
 )
-from utils import find_source_files
+from utils import (
+    iter_source_files,
+    filter_excluded,
+    load_ignore_patterns,
+    DEFAULT_EXCLUDES,
+    chunk_files,
+    git_changed_files,
+    merge_results,
+    default_worker_count,
+    checkpatch_target,
+    CHECKPATCH_ARGS,
+    CHECKPATCH_FORMATS,
+    checkpatch_type_args,
+    NdjsonWriter,
+    is_ndjson,
+    iter_ndjson,
+    FUNCTIONALITY_MAP
+)
+from subsystems import MAINTAINERS_FILE, PrefixClassifier
+from backends import BACKENDS, run_analysis, run_fixes
+from workers import CheckpatchWorkerPool
+from cache import DEFAULT_CACHE_DIR, AnalysisCache
+from outputs import OutputStore
+from checkpoint import RunCheckpoint
+from dedup import Deduplicator
+from sampling import StratifiedEstimator, population_by_stratum, shuffled, stratified_sample
+from shutdown import cancelled, graceful_shutdown
+from scheduler import (
+    DEFAULT_DURATIONS_FILE,
+    SCHEDULES,
+    SLOWEST_FILES,
+    SlowestFiles,
+    order_by_cost,
+    load_durations,
+    save_durations,
+    split_duration,
+    packing_stats,
+)
 from compile import (
     compile_modified_files,
     restore_backups,
@@ -51,29 +90,65 @@ from compile import (
 def analyze_mode(args):
     """Modo análisis: analiza archivos y genera reporte HTML."""
     
-    # Buscar archivos en todos los directorios especificados
-    all_files = []
-    for source_dir in args.source_dirs:
-        files = find_source_files(source_dir, extensions=args.extensions)
-        all_files.extend(files)
-    
-    if not all_files:
-        logger.error(f"[ERROR] No se encontraron archivos con extensiones {args.extensions}")
-        return 1
+    # Exclusiones: por defecto + .checkpatchignore del kernel + --exclude
+    excludes = DEFAULT_EXCLUDES + load_ignore_patterns(args.kernel_root) + (args.exclude or [])
+    
+    removed_files = set()
+    if args.since:
+        # Solo los ficheros cambiados desde la ref indicada (incluye renombrados)
+        try:
+            all_files, removed_files = git_changed_files(
+                args.kernel_root, args.since, args.extensions, args.source_dirs)
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.error(f"[ERROR] No se pudo obtener el diff de git desde {args.since}: {(getattr(e, 'stderr', '') or str(e)).strip()}")
+            return 1
+        all_files = filter_excluded(all_files, args.kernel_root, excludes)
+        logger.info(f"[ANALYZER] {len(all_files)} archivos cambiados desde {args.since} "
+                    f"({len(removed_files)} eliminados o renombrados)")
+    else:
+        # Buscar archivos en todos los directorios especificados, de forma perezosa:
+        # el recorrido del árbol avanza a medida que se envían lotes al análisis
+        all_files = (f for source_dir in args.source_dirs
+                     for f in iter_source_files(source_dir, args.extensions, excludes, args.kernel_root,
+                                                use_git=not args.no_git_ls_files))
     
     checkpatch_script = args.checkpatch
     kernel_root = args.kernel_root
     
-    # Resetear estructuras globales
-    reset_analysis()
+    # Categorías: prefijos de FUNCTIONALITY_MAP relativos al root y, con --maintainers,
+    # las entradas F: de MAINTAINERS (gana el prefijo más largo)
+    classifier = PrefixClassifier.from_map(FUNCTIONALITY_MAP, kernel_root)
+    if args.maintainers:
+        maintainers_path = Path(kernel_root) / MAINTAINERS_FILE
+        try:
+            prefixes = classifier.load_maintainers(maintainers_path)
+        except OSError as e:
+            logger.error(f"[ERROR] No se pudo leer {maintainers_path}: {e}")
+            return 1
+        logger.info(f"[ANALYZER] Clasificación por subsistema: {prefixes} prefijos de {maintainers_path}")
+    set_classifier(classifier)
+    
+    # Agregador de resultados: solo se usa desde este hilo (bucle consumidor)
+    # La salida completa de checkpatch de cada fichero se guarda en disco, no en memoria
+    outputs = OutputStore()
+    aggregator = AnalysisAggregator(kernel_root, outputs)
     
     # Estructura para JSON compatible con autofix
+    # (con --json-stream cada registro se escribe al llegar y no se acumula)
     json_data = []
+    json_stream = NdjsonWriter(args.json_stream) if args.json_stream else None
     
-    # Barra de progreso
-    total = len(all_files)
+    # Barra de progreso: el total solo se conoce cuando termina el descubrimiento
+    discovery = {"found": 0, "done": False}
     completed = 0
-    lock = threading.Lock()
+    
+    def discovered(files):
+        for f in files:
+            if cancelled():
+                return
+            discovery["found"] += 1
+            yield f
+        discovery["done"] = True
     
     def progress_bar(current, total):
         percent = current / total * 100
@@ -82,39 +157,207 @@ def analyze_mode(args):
         bar = '#' * filled + ' ' * (bar_len - filled)
         return f"[{bar}] {percent:.1f}% ({current}/{total})"
     
-    logger.info(f"[ANALYZER] Analizando {total} archivos con {args.workers} workers...")
-    logger.debug(f"[ANALYZER] Archivos a analizar: {[str(f) for f in all_files[:5]]}{'...' if len(all_files) > 5 else ''}")
-    
-    with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        futures = {executor.submit(analyze_file, f, checkpatch_script, kernel_root): f for f in all_files}
+    # Argumentos de checkpatch: --show-types siempre, más el formato de salida elegido
+    # y los filtros de tipos (checkpatch no evalúa las reglas excluidas)
+    only_types = FIXABLE_TYPES if args.fixable_only else args.only_types
+    checkpatch_args = (CHECKPATCH_ARGS + CHECKPATCH_FORMATS[args.checkpatch_format]
+                       + checkpatch_type_args(only_types, args.ignore_types))
+    if only_types or args.ignore_types:
+        logger.info(f"[ANALYZER] Filtro de tipos: {' '.join(checkpatch_args[len(CHECKPATCH_ARGS):])}")
+    
+    # Workers persistentes: un intérprete perl con checkpatch.pl cargado por hilo
+    pool = None
+    if args.persistent_workers:
+        pool = CheckpatchWorkerPool(checkpatch_script, kernel_root, size=args.workers, checkpatch_args=checkpatch_args)
+    runner = pool.run_checkpatch if pool else None
+    
+    # Caché de resultados por contenido
+    cache = None
+    if args.cache:
+        cache = AnalysisCache(args.cache_dir, checkpatch_script, kernel_root, flags=checkpatch_args,
+                              max_bytes=args.cache_max_mb * 1024 * 1024)
+    
+    # Muestreo: hace falta la lista completa (población por categoría) y se envía solo una muestra
+    # aleatoria (--sample) o todo en orden aleatorio hasta agotar el tiempo (--time-budget)
+    estimator = None
+    if args.sample or args.time_budget:
+        all_files = list(itertools.takewhile(lambda f: not cancelled(), all_files))
+        estimator = StratifiedEstimator(population_by_stratum(all_files))
+        population = len(all_files)
+        if args.sample:
+            all_files = stratified_sample(all_files, args.sample, args.sample_seed)
+            logger.info(f"[ANALYZER] Muestra estratificada: {len(all_files)} de {population} archivos")
+        else:
+            all_files = shuffled(all_files, args.sample_seed)
+            logger.info(f"[ANALYZER] {population} archivos en orden aleatorio, presupuesto de {args.time_budget:g}s")
+    
+    # Orden de envío: por ruta (descubrimiento perezoso) o de mayor a menor coste estimado,
+    # lo que obliga a listar todos los ficheros antes de empezar.
+    # Las duraciones se registran en cualquier orden para que la primera ejecución con history ya tenga datos
+    durations = load_durations(args.durations_file) if args.durations_file else None
+    if args.schedule != "path":
+        all_files = order_by_cost(list(itertools.takewhile(lambda f: not cancelled(), all_files)),
+                                  kernel_root, durations if args.schedule == "history" else None)
+        logger.info(f"[ANALYZER] {len(all_files)} archivos ordenados por coste estimado ({args.schedule})")
+    
+    # Directorio de ejecución: cada resultado se guarda en un checkpoint para poder reanudar
+    checkpoint = None
+    if args.run_dir:
+        meta = {
+            "kernel_root": str(kernel_root),
+            "source_dirs": [str(d) for d in args.source_dirs],
+            "extensions": list(args.extensions),
+            "excludes": list(excludes),
+            "checkpatch": str(Path(checkpatch_script).resolve()),
+            "checkpatch_args": checkpatch_args,
+            "since": args.since,
+            "sample": args.sample,
+            "sample_seed": args.sample_seed,
+        }
+        try:
+            checkpoint = RunCheckpoint(args.run_dir, meta, resume=args.resume)
+        except (OSError, ValueError) as e:
+            outputs.close()
+            logger.error(f"[ERROR] No se puede reanudar desde {args.run_dir}: {e}")
+            return 1
+        if args.resume and not checkpoint.resumed:
+            logger.warning(f"[ANALYZER] No hay checkpoint en {args.run_dir}: se empieza desde cero")
+    
+    logger.info(f"[ANALYZER] Analizando archivos con {args.workers} workers (backend {args.backend})...")
+    
+    if args.time_budget:
+        # Se deja de enviar trabajo al agotar el presupuesto; los lotes en vuelo terminan
+        budget_end = time.monotonic() + args.time_budget
+        all_files = itertools.takewhile(lambda f: time.monotonic() < budget_end, all_files)
+    files = discovered(all_files)
+    # Reanudación: los ficheros completados en la ejecución anterior no se vuelven a analizar
+    if checkpoint and checkpoint.resumed:
+        files = (f for f in files if str(f) not in checkpoint.completed)
+    # Deduplicación: solo se analiza el primer fichero de cada contenido
+    dedup = Deduplicator(kernel_root) if args.dedup else None
+    if dedup:
+        files = dedup.filter(files)
+    
+    # Lotes: un checkpatch.pl por cada grupo de ficheros (1 fichero por lote si no se pide batching).
+    # Ambos son generadores: run_analysis solo los consume mientras la ventana de envío tenga hueco
+    if args.batch_size > 1:
+        chunks = chunk_files(files, args.batch_size, args.batch_bytes)
+        logger.info(f"[ANALYZER] Agrupando en lotes de máx {args.batch_size} ficheros")
+    else:
+        chunks = ([f] for f in files)
+    
+    def add_result(result, replayed=False):
+        nonlocal completed
+        aggregator.add(result)
+        if estimator:
+            estimator.add(result)
+        if checkpoint and not replayed:
+            checkpoint.record(result)
         
-        for future in as_completed(futures):
-            file_path = futures[future]
-            try:
-                errors, warnings, is_correct = future.result()
-                
-                # Agregar a JSON si tiene issues
-                if errors or warnings:
-                    json_data.append({
-                        "file": str(file_path),
-                        "error": errors,
-                        "warning": warnings
-                    })
-                
-                # Progreso
-                with lock:
-                    completed += 1
-                    if completed % 10 == 0 or completed == total:
-                        print(f"\r[ANALYZER] Progreso: {progress_bar(completed, total)}", end="")
-                    logger.debug(f"[ANALYZER] Analizado {file_path}: {len(errors)} errores, {len(warnings)} warnings")
-                
-            except Exception as e:
-                logger.error(f"\n[ERROR] {file_path}: {e}")
+        # Agregar a JSON si tiene issues (o si checkpatch excedió el tiempo límite)
+        if not result.is_correct:
+            record = {
+                "file": result.file,
+                "error": list(result.errors),
+                "warning": list(result.warnings)
+            }
+            if result.timed_out:
+                record["status"] = result.status
+            if json_stream:
+                json_stream.write(record)
+            else:
+                json_data.append(record)
+        
+        # Progreso
+        completed += 1
+        if discovery["done"] and (completed % 10 == 0 or completed == discovery["found"]):
+            print(f"\r[ANALYZER] Progreso: {progress_bar(completed, discovery['found'])}", end="")
+        elif completed % 10 == 0:
+            print(f"\r[ANALYZER] Progreso: {completed} analizados ({discovery['found']} encontrados, buscando...)", end="")
+        logger.debug(f"[ANALYZER] Analizado {result.file}: {len(result.errors)} errores, {len(result.warnings)} warnings")
+    
+    if checkpoint and checkpoint.resumed:
+        for result in checkpoint.replay():
+            add_result(result, replayed=True)
+        logger.info(f"[ANALYZER] Reanudando: {len(checkpoint.completed)} ficheros ya completados en {args.run_dir}")
+    
+    slowest = SlowestFiles(args.slowest)
+    start_time = time.perf_counter()
+    task_time = 0.0
+    interrupted = 0
+    failed = 0
+    for chunk, results, error, elapsed in run_analysis(chunks, checkpatch_script, kernel_root, args.backend,
+                                                       args.workers, runner, cache,
+                                                       checkpatch_args=checkpatch_args):
+        task_time += elapsed
+        if error and cancelled():
+            # Lote abandonado por la cancelación: queda fuera del informe parcial
+            interrupted += len(chunk)
+            continue
+        if error:
+            # Los duplicados del lote comparten contenido y resultado: también fallan
+            failed_files = list(chunk)
+            if dedup:
+                failed_files += [dup for f in chunk for dup in dedup.fail(f, error)]
+            failed += len(failed_files)
+            logger.error(f"\n[ERROR] {', '.join(str(f) for f in failed_files)}: {error}")
+            continue
+        if elapsed:
+            # En lotes la duración por fichero es una estimación (reparto por tamaño)
+            for f, seconds in split_duration(chunk, elapsed).items():
+                slowest.add(f, seconds)
+                if durations is not None:
+                    durations[checkpatch_target(f, kernel_root)] = round(seconds, 4)
+        
+        for result in results:
+            add_result(result)
+            if dedup:
+                for dup in dedup.fan_out(result):
+                    add_result(dup)
+    
+    # Duplicados descubiertos después de que su representante terminara
+    if dedup:
+        for dup in dedup.drain(aggregator.file_outputs.__getitem__):
+            add_result(dup)
+        for dup, error in dedup.failed_duplicates():
+            failed += 1
+            logger.error(f"\n[ERROR] {dup}: {error}")
+    
+    makespan = time.perf_counter() - start_time
+    
+    if pool:
+        pool.close()
+    if durations is not None:
+        save_durations(args.durations_file, durations)
+    if json_stream:
+        json_stream.close()
+    partial = cancelled()
+    if checkpoint:
+        checkpoint.close(finished=not partial)
+    
+    if not discovery["found"] and not args.since and not partial:
+        outputs.close()
+        logger.error(f"[ERROR] No se encontraron archivos con extensiones {args.extensions}")
+        return 1
     
     print()  # Nueva línea después de la barra
     
     # Obtener resumen
-    analysis_data = get_analysis_summary()
+    analysis_data = aggregator.get_summary()
+    if dedup:
+        analysis_data["duplicates_skipped"] = dedup.skipped
+    timed_out = set(analysis_data["timed_out"])
+    analysis_data["slowest_files"] = [
+        {"file": f, "seconds": round(seconds, 3), "status": STATUS_TIMEOUT if f in timed_out else STATUS_OK}
+        for f, seconds in slowest.items()
+    ]
+    analysis_data["durations_estimated"] = args.batch_size > 1
+    if estimator:
+        analysis_data["sampling"] = {**estimator.estimate(), "fraction": args.sample,
+                                     "time_budget": args.time_budget, "seed": args.sample_seed}
+    if partial:
+        analysis_data["partial"] = {"analyzed": completed, "found": discovery["found"],
+                                    "discovery_done": discovery["done"]}
     
     # Generar HTML
     html_path = Path(args.html)
@@ -126,16 +369,29 @@ def analyze_mode(args):
     detail_file_path = html_path.parent / "detail-file.html"
     generate_detail_reason_html(analysis_data, detail_reason_path)
     generate_detail_file_html(analysis_data, detail_file_path)
+    outputs.close()
     
     # Generar dashboard
     dashboard_path = html_path.parent / "dashboard.html"
     generate_dashboard_html(dashboard_path)
     
-    # Generar JSON
-    json_path = Path(args.json_out)
-    json_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(json_data, f, indent=2)
+    # Generar JSON (con --json-stream ya está escrito)
+    if json_stream:
+        json_path = json_stream.path
+    else:
+        json_path = Path(args.json_out)
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        if args.since and json_path.exists():
+            # Incremental: sustituir en el JSON anterior solo los ficheros re-analizados o eliminados
+            with open(json_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            # (tras una cancelación, solo los que llegaron a analizarse)
+            analyzed = set(aggregator.file_outputs) if partial else {str(f) for f in all_files}
+            replaced = analyzed | removed_files
+            json_data = merge_results(previous, json_data, replaced)
+            logger.info(f"[ANALYZER] Resultados combinados con {json_path} ({len(replaced)} ficheros actualizados)")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(json_data, f, indent=2)
     
     # Resumen en consola
     gc = analysis_data["global_counts"]
@@ -145,6 +401,42 @@ def analyze_mode(args):
     logger.info(f"[ANALYZER] Errores encontrados: {error_count}")
     logger.info(f"[ANALYZER] Warnings encontrados: {warning_count}")
     logger.info(f"[ANALYZER] Total encontrados: {error_count + warning_count}")
+    if timed_out:
+        logger.warning(f"[ANALYZER] {len(timed_out)} ficheros sin analizar: checkpatch excedió el tiempo límite "
+                       f"también en el reintento (status \"timeout\" en el JSON)")
+    if estimator:
+        sampling = analysis_data["sampling"]
+        logger.info(f"[ANALYZER] Muestreo: {sampling['total']['analyzed']} de {sampling['total']['population']} "
+                    f"archivos analizados; extrapolación al árbol completo ({sampling['confidence']:.0%}):")
+        for metric, label in (("errors", "errores"), ("warnings", "warnings")):
+            m = sampling["total"]["metrics"][metric]
+            if m["estimate"] is None:
+                logger.info(f"[ANALYZER]   {label}: sin datos en todas las categorías")
+            elif m["low"] is None:
+                logger.info(f"[ANALYZER]   {label}: ≈{m['estimate']:.0f}")
+            else:
+                logger.info(f"[ANALYZER]   {label}: ≈{m['estimate']:.0f} [{m['low']:.0f}, {m['high']:.0f}]")
+    for entry in analysis_data["slowest_files"][:3]:
+        logger.info(f"[ANALYZER] Lento: {checkpatch_target(entry['file'], kernel_root)} ({entry['seconds']:.2f}s)")
+    if dedup:
+        logger.info(f"[ANALYZER] Duplicados omitidos: {dedup.skipped} (resultado copiado de un fichero idéntico)")
+    if failed:
+        logger.error(f"[ANALYZER] {failed} ficheros no se pudieron analizar (ver errores arriba)")
+    if cache:
+        cs = cache.stats()
+        logger.info(f"[ANALYZER] Caché: {cs['hits']} aciertos, {cs['misses']} fallos "
+                    f"({cs['hit_rate']:.1f}% aciertos, {cs['evictions']} entradas expulsadas)")
+    ps = packing_stats(makespan, task_time, args.workers)
+    logger.info(f"[ANALYZER] Makespan: {ps['makespan']:.2f}s, suma de tiempos de tarea: {ps['task_time']:.2f}s "
+                f"(ideal con {args.workers} workers: {ps['ideal_makespan']:.2f}s, eficiencia {ps['efficiency']:.1f}%)")
+    if partial:
+        logger.warning(f"[ANALYZER] Análisis cancelado: informes parciales con {completed} ficheros analizados "
+                       f"({interrupted} abandonados en cola o en curso)")
+        if checkpoint:
+            logger.warning(f"[ANALYZER] Para continuar: --run-dir {args.run_dir} --resume")
+        logger.info(f"[ANALYZER] ✔ Informe HTML (parcial) generado: {html_path}")
+        logger.info(f"[ANALYZER] ✔ JSON (parcial) generado: {json_path}")
+        return 130
     logger.info(f"[ANALYZER] ✔ Análisis terminado.")
     logger.info(f"[ANALYZER] ✔ Informe HTML generado: {html_path}")
     logger.info(f"[ANALYZER] ✔ JSON generado: {json_path}")
@@ -160,48 +452,62 @@ def fix_mode(args):
         logger.error(f"[ERROR] No existe el archivo: {json_file}")
         return 1
     
-    with open(json_file, "r") as f:
-        files_data = json.load(f)
+    # NDJSON (--json-stream) se recorre registro a registro
+    if is_ndjson(json_file):
+        files_data = iter_ndjson(json_file)
+    else:
+        with open(json_file, "r") as f:
+            files_data = json.load(f)
     
     # Estructura para report_data
-    from collections import defaultdict
+    from collections import Counter, defaultdict
     report_data = defaultdict(lambda: {"warning": [], "error": []})
     modified_files = set()
+    # Issues sin regla de autofix, por tipo de checkpatch (o mensaje): se resumen al final
+    unmatched = Counter()
     
     file_filter = Path(args.file).resolve() if args.file else None
     
     logger.info("[AUTOFIX] Procesando archivos...")
     logger.debug(f"[AUTOFIX] JSON de entrada: {json_file}, filtro de archivo: {file_filter}")
     
-    for entry in files_data:
-        file_path = Path(entry["file"]).resolve()
-        
-        if file_filter and file_filter != file_path:
-            continue
-        
-        # Reunir issues según tipo
-        issues_to_fix = []
-        if args.type in ("warning", "all"):
-            for w in entry.get("warning", []):
-                issues_to_fix.append({"type": "warning", **w})
-        if args.type in ("error", "all"):
-            for e in entry.get("error", []):
-                issues_to_fix.append({"type": "error", **e})
-        
-        if not issues_to_fix:
-            continue
-        
-        issues_to_fix.sort(key=lambda x: -x["line"])  # de abajo hacia arriba
-        
-        # Aplicar fixes
-        fix_results = apply_fixes(file_path, issues_to_fix)
-        
+    def fix_tasks():
+        for entry in files_data:
+            file_path = Path(entry["file"]).resolve()
+            
+            if file_filter and file_filter != file_path:
+                continue
+            
+            # Reunir issues según tipo
+            issues_to_fix = []
+            if args.type in ("warning", "all"):
+                for w in entry.get("warning", []):
+                    issues_to_fix.append({"type": "warning", **w})
+            if args.type in ("error", "all"):
+                for e in entry.get("error", []):
+                    issues_to_fix.append({"type": "error", **e})
+            
+            if not issues_to_fix:
+                continue
+            
+            # De abajo hacia arriba: los fixes usan líneas originales (LineBuffer), pero uno
+            # que fusiona o borra líneas (p.ej. "else" tras "}") sí depende del orden
+            issues_to_fix.sort(key=lambda x: -x["line"])
+            yield file_path, issues_to_fix
+    
+    # Aplicar fixes: cada fichero es independiente; con varios workers se corrigen en
+    # paralelo y los resultados llegan en el orden del JSON de entrada
+    if args.workers > 1:
+        logger.info(f"[AUTOFIX] Corrigiendo con {args.workers} workers")
+    for file_path, issues_to_fix, fix_results in run_fixes(fix_tasks(), args.workers):
         file_modified = False
         for orig_issue, res in zip(issues_to_fix, fix_results):
             typ = orig_issue["type"]
             line = orig_issue["line"]
             message = orig_issue["message"]
             fixed = res.get("fixed", False)
+            if not res.get("rule"):
+                unmatched[orig_issue.get("type_id") or message.split(": ", 1)[-1]] += 1
             
             report_data[str(file_path)][typ].append({
                 "line": line,
@@ -217,6 +523,12 @@ def fix_mode(args):
             logger.info(f"[AUTOFIX]  - {file_path.relative_to(file_path.parent.parent.parent)}")
             logger.debug(f"[AUTOFIX] Modificado archivo: {file_path}")
     
+    if unmatched:
+        logger.info(f"[AUTOFIX] {sum(unmatched.values())} issues sin regla de autofix "
+                    f"({len(unmatched)} motivos distintos; detalle con --log-level DEBUG)")
+        for reason, count in unmatched.most_common():
+            logger.debug(f"[AUTOFIX]   {count:6d}  {reason}")
+    
     # Calcular estadísticas para resumen
     errors_fixed = sum(1 for issues in report_data.values() for i in issues.get("error", []) if i.get("fixed"))
     warnings_fixed = sum(1 for issues in report_data.values() for i in issues.get("warning", []) if i.get("fixed"))
@@ -276,8 +588,12 @@ def compile_mode(args):
         return 1
     
     # Leer archivos modificados del JSON de autofix
-    with open(json_file, "r") as f:
-        report_data = json.load(f)
+    if is_ndjson(json_file):
+        # NDJSON de checkpatch (--json-stream): un registro {file, error, warning} por línea
+        report_data = iter_ndjson(json_file)
+    else:
+        with open(json_file, "r") as f:
+            report_data = json.load(f)
     
     # Extraer lista de archivos que fueron modificados
     modified_files = []
@@ -294,7 +610,7 @@ def compile_mode(args):
             )
             if has_fixes:
                 modified_files.append(Path(file_path))
-    elif isinstance(report_data, list):
+    else:
         # JSON de checkpatch (formato: [{file: ..., error: [], warning: []}])
         modified_files = [Path(entry["file"]) for entry in report_data]
     
@@ -321,6 +637,10 @@ def compile_mode(args):
         kernel_root, 
         cleanup=not args.no_cleanup
     )
+    partial = ""
+    if cancelled():
+        partial = f"compilación cancelada con {len(results)} de {len(modified_files)} ficheros compilados"
+        logger.warning(f"[COMPILE] Informe parcial: {partial}")
     
     # Restaurar backups después si se solicita
     if args.restore_after:
@@ -330,11 +650,11 @@ def compile_mode(args):
     # Generar reportes
     html_path = Path(args.html)
     html_path.parent.mkdir(parents=True, exist_ok=True)
-    generate_compile_html(results, html_path, kernel_root)
+    generate_compile_html(results, html_path, kernel_root, partial)
     
     # Generar JSON
     json_path = Path(args.json_out)
-    save_json_report(results, json_path)
+    save_json_report(results, json_path, partial=bool(partial))
     
     # Resumen en consola
     print_summary(results)
@@ -342,7 +662,9 @@ def compile_mode(args):
     logger.info(f"\n[COMPILE] ✓ Informe HTML generado: {html_path}")
     logger.info(f"[COMPILE] ✓ JSON generado: {json_path}")
     
-    # Retornar 0 si todos compilaron exitosamente, 1 si hubo fallos
+    # Retornar 0 si todos compilaron exitosamente, 1 si hubo fallos (130 si se canceló)
+    if partial:
+        return 130
     failed_count = sum(1 for r in results if not r.success)
     return 1 if failed_count > 0 else 0
 
@@ -377,12 +699,63 @@ Ejemplos:
                               help="Subdirectorios a analizar (ej: init, kernel). Si se omite, analiza todo")
     analyze_group.add_argument("--extensions", nargs="+", default=[".c", ".h"],
                               help="Extensiones de archivo (default: .c .h)")
-    analyze_group.add_argument("--workers", type=int, default=4,
-                              help="Número de workers paralelos (default: 4)")
+    analyze_group.add_argument("--exclude", nargs="+", metavar="GLOB",
+                              help="Directorios/ficheros a excluir, además de .checkpatchignore (ej: 'drivers/gpu/*' '*.mod.c')")
+    analyze_group.add_argument("--no-git-ls-files", action="store_true",
+                              help="Recorrer el disco aunque el kernel sea un checkout de git (por defecto se usa git ls-files)")
+    analyze_group.add_argument("--backend", choices=BACKENDS, default="thread",
+                              help="Ejecución del análisis: thread, process (parseo en paralelo real) o asyncio (default: thread)")
+    analyze_group.add_argument("--since", metavar="GIT_REF",
+                              help="Analizar solo los ficheros cambiados desde GIT_REF y combinar con el JSON anterior")
+    analyze_group.add_argument("--persistent-workers", action="store_true",
+                              help="Mantener checkpatch.pl cargado en N intérpretes perl (uno por worker)")
+    analyze_group.add_argument("--batch-size", type=int, default=1,
+                              help="Ficheros por invocación de checkpatch.pl (default: 1, sin lotes)")
+    analyze_group.add_argument("--batch-bytes", type=int, default=4 * 1024 * 1024,
+                              help="Tamaño máximo en bytes de cada lote (default: 4 MiB)")
+    analyze_group.add_argument("--run-dir", default=None,
+                              help="Directorio de ejecución: guarda un checkpoint de los ficheros completados")
+    analyze_group.add_argument("--resume", action="store_true",
+                              help="Reanudar la ejecución guardada en --run-dir sin repetir los ficheros completados")
+    analyze_group.add_argument("--slowest", type=int, default=SLOWEST_FILES, metavar="N",
+                              help=f"Ficheros más lentos a mostrar en el informe (default: {SLOWEST_FILES})")
+    analyze_group.add_argument("--sample", type=float, default=None, metavar="FRACCIÓN",
+                              help="Analizar una muestra estratificada por categoría (p.ej. 0.05) y extrapolar")
+    analyze_group.add_argument("--time-budget", type=float, default=None, metavar="SEGUNDOS",
+                              help="Analizar en orden aleatorio hasta agotar el tiempo y extrapolar")
+    analyze_group.add_argument("--sample-seed", type=int, default=0,
+                              help="Semilla del muestreo (default: 0, reproducible)")
+    analyze_group.add_argument("--maintainers", action="store_true",
+                              help="Clasificar los ficheros por subsistema según las entradas F: del MAINTAINERS del kernel")
+    analyze_group.add_argument("--dedup", action="store_true",
+                              help="Analizar una sola vez los ficheros con contenido idéntico y copiar el resultado")
+    analyze_group.add_argument("--cache", action="store_true",
+                              help="Reutilizar resultados de ficheros sin cambios (caché por contenido)")
+    analyze_group.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                              help=f"Directorio de la caché (default: {DEFAULT_CACHE_DIR})")
+    analyze_group.add_argument("--cache-max-mb", type=int, default=512,
+                              help="Tamaño máximo de la caché en MiB (default: 512)")
+    analyze_group.add_argument("--schedule", choices=SCHEDULES, default="path",
+                              help="Orden de análisis: path (por ruta, sin listar antes el árbol), size (mayores primero) "
+                                   "o history (según la duración de ejecuciones anteriores) (default: path)")
+    analyze_group.add_argument("--durations-file", default=DEFAULT_DURATIONS_FILE,
+                              help="Histórico de duraciones por fichero; se actualiza en cada análisis y lo usa "
+                                   f"--schedule history. Vacío para no registrarlas (default: {DEFAULT_DURATIONS_FILE})")
+    analyze_group.add_argument("--checkpatch-format", choices=list(CHECKPATCH_FORMATS), default="default",
+                              help="Formato de salida de checkpatch: default, terse (una línea por issue) o emacs (default: default)")
+    types_group = analyze_group.add_mutually_exclusive_group()
+    types_group.add_argument("--only-types", nargs="+", metavar="TYPE",
+                             help="Evaluar solo estos tipos de checkpatch (--types), ej: TRAILING_WHITESPACE LONG_LINE")
+    types_group.add_argument("--fixable-only", action="store_true",
+                             help="Evaluar solo los tipos que el autofix sabe corregir")
+    analyze_group.add_argument("--ignore-types", nargs="+", metavar="TYPE",
+                              help="No evaluar estos tipos de checkpatch (--ignore)")
+    analyze_group.add_argument("--json-stream", metavar="PATH",
+                              help="Escribir los resultados en NDJSON a medida que llegan (en lugar de --json-out)")
     
     # Argumentos para autofix
     fix_group = parser.add_argument_group("Opciones de autofix")
-    fix_group.add_argument("--json-input", help="JSON de entrada de checkpatch o autofix")
+    fix_group.add_argument("--json-input", help="JSON (o NDJSON de --json-stream) de entrada de checkpatch o autofix")
     fix_group.add_argument("--type", choices=["warning", "error", "all"], default="all",
                           help="Filtrar por tipo (default: all)")
     fix_group.add_argument("--file", help="Procesar solo este fichero específico")
@@ -400,6 +773,9 @@ Ejemplos:
     # Argumentos comunes
     parser.add_argument("--html", help="Archivo HTML de salida (default: html/analyzer.html o html/autofix.html)")
     parser.add_argument("--json-out", help="Archivo JSON de salida (default: json/checkpatch.json o json/fixed.json)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Número de workers paralelos de --analyze y --fix (default: --analyze usa las "
+                             "CPUs disponibles según afinidad y cuota de cgroup, --fix es secuencial)")
     
     # Argumentos de logging
     logging_group = parser.add_argument_group("Opciones de logging")
@@ -425,6 +801,12 @@ Ejemplos:
     logger.debug(f"[MAIN] Argumentos: {vars(args)}")
     logger.debug(f"[MAIN] Nivel de logging: {args.log_level}")
     
+    if args.workers is None:
+        # --fix solo usa un pool de procesos si se pide --workers explícitamente
+        args.workers = 1 if args.fix else default_worker_count()
+    elif args.workers < 1:
+        parser.error("--workers debe ser >= 1")
+    
     # Validar argumentos según modo
     if args.analyze:
         # Configurar rutas automáticamente desde kernel root
@@ -446,13 +828,30 @@ Ejemplos:
         else:
             source_dirs = [kernel_root]
         
+        if args.persistent_workers and args.batch_size > 1:
+            parser.error("--persistent-workers y --batch-size son incompatibles")
+        if args.sample is not None and not 0 < args.sample <= 1:
+            parser.error("--sample debe estar en (0, 1]")
+        if args.time_budget is not None and args.time_budget <= 0:
+            parser.error("--time-budget debe ser > 0")
+        if (args.sample or args.time_budget) and args.since:
+            parser.error("--sample/--time-budget y --since son incompatibles")
+        if args.time_budget and args.schedule != "path":
+            parser.error("--time-budget requiere el orden aleatorio: no se puede combinar con --schedule")
+        if args.resume and not args.run_dir:
+            parser.error("--resume requiere --run-dir")
+        if args.json_stream and args.since:
+            parser.error("--json-stream y --since son incompatibles (--since reescribe el JSON combinado)")
+        if args.persistent_workers and args.backend != "thread":
+            parser.error("--persistent-workers solo está disponible con --backend thread")
         # Defaults para analyze
         args.source_dirs = source_dirs
         args.kernel_root = kernel_root
         args.checkpatch = checkpatch
         args.html = args.html or "html/analyzer.html"
         args.json_out = args.json_out or "json/checkpatch.json"
-        return analyze_mode(args)
+        with graceful_shutdown():
+            return analyze_mode(args)
     
     elif args.fix:
         if not args.json_input:
@@ -470,7 +869,8 @@ Ejemplos:
         # Ajustar defaults para compile
         args.html = args.html or "html/compile.html"
         args.json_out = args.json_out or "json/compile.json"
-        return compile_mode(args)
+        with graceful_shutdown():
+            return compile_mode(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+# occurrences.py
+"""
+Índice compacto motivo -> ocurrencias (fichero, línea)
+
+En un análisis de todo el árbol hay cientos de miles de ocurrencias; guardadas
+como tuplas (ruta, línea) en listas cada una cuesta una tupla y un int de
+Python. Aquí las rutas y los motivos se internan en tablas de ids enteros y
+las ocurrencias de cada motivo se guardan en dos columnas array('I')
+(id de fichero, línea): 8 bytes por ocurrencia.
+
+Los reportes lo usan como un dict de solo lectura motivo -> secuencia de
+tuplas (ruta, línea), igual que antes, y además tienen files(),
+lines_by_file() y counts_by_file() para no reconstruir los conjuntos
+recorriendo las tuplas.
+"""
+
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Mapping, Sequence
+
+
+class InternTable:
+    """Tabla valor <-> id entero (ids consecutivos desde 0 en orden de inserción)."""
+
+    def __init__(self):
+        self._ids = {}
+        self._values = []
+
+    def intern(self, value):
+        """Id de value, asignándole uno nuevo si no estaba."""
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = self._ids[value] = len(self._values)
+            self._values.append(value)
+        return value_id
+
+    def id(self, value):
+        """Id de value o None si no está en la tabla."""
+        return self._ids.get(value)
+
+    def __getitem__(self, value_id):
+        return self._values[value_id]
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, value):
+        return value in self._ids
+
+
+class Occurrences(Sequence):
+    """
+    Ocurrencias de un motivo en columnas array('I') de ids de fichero y líneas.
+    Se ve como una secuencia de tuplas (ruta, línea) en orden de inserción.
+    """
+
+    __slots__ = ("_files", "file_ids", "lines")
+
+    def __init__(self, files):
+        self._files = files
+        self.file_ids = array("I")
+        self.lines = array("I")
+
+    def append(self, file_id, line):
+        self.file_ids.append(file_id)
+        self.lines.append(line)
+
+    def __len__(self):
+        return len(self.file_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._files[self.file_ids[index]], self.lines[index]
+
+    def __iter__(self):
+        files = self._files
+        for file_id, line in zip(self.file_ids, self.lines):
+            yield files[file_id], line
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == tuple(b) for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Occurrences({list(self)!r})"
+
+    def files(self):
+        """Conjunto de rutas con alguna ocurrencia."""
+        files = self._files
+        return {files[file_id] for file_id in set(self.file_ids)}
+
+    def lines_by_file(self):
+        """{ruta: líneas ordenadas y sin repetir}"""
+        by_id = defaultdict(set)
+        for file_id, line in zip(self.file_ids, self.lines):
+            by_id[file_id].add(line)
+        files = self._files
+        return {files[file_id]: sorted(lines) for file_id, lines in by_id.items()}
+
+
+class ReasonIndex(Mapping):
+    """
+    Mapping de solo lectura motivo -> Occurrences. Los motivos se internan en su
+    propia tabla; la tabla de rutas (files) se puede compartir entre índices.
+    """
+
+    def __init__(self, files=None):
+        self.files_table = InternTable() if files is None else files
+        self._reasons = InternTable()
+        self._occurrences = []
+
+    def add(self, reason, file_path, line):
+        reason_id = self._reasons.intern(reason)
+        if reason_id == len(self._occurrences):
+            self._occurrences.append(Occurrences(self.files_table))
+        self._occurrences[reason_id].append(self.files_table.intern(file_path), line)
+
+    def __getitem__(self, reason):
+        reason_id = self._reasons.id(reason)
+        if reason_id is None:
+            raise KeyError(reason)
+        return self._occurrences[reason_id]
+
+    def __iter__(self):
+        return (self._reasons[reason_id] for reason_id in range(len(self._reasons)))
+
+    def __len__(self):
+        return len(self._reasons)
+
+    def __contains__(self, reason):
+        return reason in self._reasons
+
+    def files(self):
+        """Conjunto de rutas con alguna ocurrencia de cualquier motivo."""
+        file_ids = set()
+        for occurrences in self._occurrences:
+            file_ids.update(occurrences.file_ids)
+        return {self.files_table[file_id] for file_id in file_ids}
+
+    def counts_by_file(self):
+        """{ruta: número de ocurrencias de todos los motivos}, contando sobre las columnas de ids."""
+        counts = Counter()
+        for occurrences in self._occurrences:
+            counts.update(occurrences.file_ids)
+        return {self.files_table[file_id]: count for file_id, count in counts.items()}
@@ -0,0 +1,83 @@
+# outputs.py
+"""
+Almacén en disco de la salida completa de checkpatch por fichero
+
+Las salidas se añaden a un único fichero de blobs (solo append) y en memoria
+se guarda únicamente el índice fichero -> (offset, longitud). La lectura se
+hace a través de mmap, de modo que generar detail-file.html no necesita tener
+todas las salidas en memoria a la vez.
+
+Se usa como un dict de solo inserción: AnalysisAggregator hace
+store[file] = output y report.py hace `fp in store` / store[fp].
+"""
+
+import mmap
+import os
+import tempfile
+from collections.abc import Mapping
+from pathlib import Path
+
+
+class OutputStore(Mapping):
+    """Mapping fichero -> salida de checkpatch respaldado por un fichero de blobs."""
+
+    def __init__(self, path=None):
+        self._temporary = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="checkpatch-outputs-", suffix=".blob")
+            os.close(fd)
+        self.path = Path(path)
+        self._f = open(self.path, "wb")
+        self._index = {}
+        self._size = 0
+        self._map = None
+
+    def __setitem__(self, file_path, output):
+        # Si un fichero se re-escribe, el blob anterior queda como espacio muerto
+        data = output.encode("utf-8")
+        if data:
+            self._f.write(data)
+        self._index[file_path] = (self._size, len(data))
+        self._size += len(data)
+
+    def __getitem__(self, file_path):
+        offset, length = self._index[file_path]
+        if not length:
+            return ""
+        if self._map is None or len(self._map) < offset + length:
+            self._remap()
+        return self._map[offset:offset + length].decode("utf-8")
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, file_path):
+        return file_path in self._index
+
+    def _remap(self):
+        self._f.flush()
+        if self._map is not None:
+            self._map.close()
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if not self._f.closed:
+            self._f.close()
+        if self._temporary:
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -18,6 +18,35 @@ def display_fp(fp):
     except Exception:
         return fp
 
+def reason_label(reason, reason_messages):
+    """Texto de un motivo: el tipo de checkpatch con un mensaje de ejemplo, o el mensaje tal cual."""
+    example = reason_messages.get(reason)
+    return f"{reason} — {example}" if example else reason
+
+def partial_notice(message):
+    """Aviso destacado de informe parcial (ejecución cancelada con SIGINT/SIGTERM)."""
+    return (f"<p style='background:#fff3cd;border:1px solid #e0a800;padding:8px 12px;font-weight:bold'>"
+            f"⚠ Informe parcial: {html_module.escape(message)}</p>")
+
+def format_estimate(metric):
+    """Estimación extrapolada con su intervalo de confianza: "120 (95–148)", "120" o "n/d"."""
+    if metric["estimate"] is None:
+        return "n/d"
+    if metric["low"] is None:
+        return f"{metric['estimate']:.0f}"
+    return f"{metric['estimate']:.0f} <span style='color:#777'>({metric['low']:.0f}–{metric['high']:.0f})</span>"
+
+def analysis_partial_message(analysis_data):
+    """Texto del aviso de informe parcial del analyzer, o "" si el análisis terminó."""
+    partial = analysis_data.get("partial")
+    if not partial:
+        return ""
+    message = f"análisis cancelado, {partial['analyzed']} de {partial['found']} ficheros analizados"
+    if not partial["discovery_done"]:
+        message += " (la búsqueda de ficheros no había terminado)"
+    return message
+
+
 def generate_html_report(report_data, html_file, kernel_dir="."):
 
     # ...existing code...
@@ -441,6 +470,8 @@ def generate_analyzer_html(analysis_data, html_file):
     warning_reasons = analysis_data["warning_reasons"]
     error_reason_files = analysis_data["error_reason_files"]
     warning_reason_files = analysis_data["warning_reason_files"]
+    error_reason_messages = analysis_data.get("error_reason_messages", {})
+    warning_reason_messages = analysis_data.get("warning_reason_messages", {})
     file_outputs = analysis_data.get("file_outputs", {})
     kernel_dir = analysis_data.get("kernel_dir", "")
     
@@ -463,6 +494,8 @@ def generate_analyzer_html(analysis_data, html_file):
     append(COMMON_CSS)
     append("</style></head><body>")
     append(f"<h1>Informe Checkpatch Analyzer <span style='font-weight:normal'>{timestamp}</span></h1>")
+    if analysis_data.get("partial"):
+        append(partial_notice(analysis_partial_message(analysis_data)))
     
     # ============================
     # RESUMEN GLOBAL
@@ -528,6 +561,65 @@ def generate_analyzer_html(analysis_data, html_file):
            f"</td></tr>")
     append("</table>")
     
+    # ============================
+    # EXTRAPOLACIÓN (MUESTREO)
+    # ============================
+    sampling = analysis_data.get("sampling")
+    if sampling:
+        total = sampling["total"]
+        if sampling.get("fraction"):
+            mode = f"muestra estratificada del {sampling['fraction']:.1%} por categoría"
+        else:
+            mode = f"orden aleatorio con presupuesto de {sampling['time_budget']:g}s"
+        append("<h2>Estimación para el árbol completo (muestreo)</h2>")
+        append(f"<p>Analizados {total['analyzed']} de {total['population']} ficheros ({mode}, semilla {sampling['seed']}). "
+               f"El resto del informe cuenta solo los ficheros analizados; aquí se extrapola por categoría "
+               f"con intervalos de confianza del {sampling['confidence']:.0%}.</p>")
+        append("<table>")
+        append("<tr><th>Categoría</th><th>Analizados / total</th><th>Ficheros con errores</th>"
+               "<th>Ficheros con warnings</th><th>Errores</th><th>Warnings</th></tr>")
+        rows = [(label, stratum) for label, stratum in sampling["strata"].items()] + [("TOTAL", total)]
+        for label, stratum in rows:
+            metrics = stratum["metrics"]
+            cls = " class='total'" if label == "TOTAL" else ""
+            append(f"<tr><td{cls}>{html_module.escape(label)}</td>"
+                   f"<td class='num'>{stratum['analyzed']} / {stratum['population']}</td>"
+                   + "".join(f"<td class='num'>{format_estimate(metrics[m])}</td>"
+                             for m in ("files_errors", "files_warnings", "errors", "warnings"))
+                   + "</tr>")
+        append("</table>")
+    
+    if "duplicates_skipped" in analysis_data:
+        append(f"<p>Duplicados omitidos (contenido idéntico, resultado copiado): "
+               f"<strong>{analysis_data['duplicates_skipped']}</strong></p>")
+    
+    # ============================
+    # TIMEOUTS Y FICHEROS MÁS LENTOS
+    # ============================
+    timed_out = analysis_data.get("timed_out", [])
+    if timed_out:
+        append(f"<h2 class='errors'>Ficheros sin analizar por timeout ({len(timed_out)})</h2>")
+        append("<p>checkpatch excedió el tiempo límite también en el reintento: "
+               "no constan como correctos ni con issues.</p>")
+        append("<ul>")
+        for fp in sorted(timed_out):
+            append(f"<li>{html_module.escape(get_relative_path(fp))}</li>")
+        append("</ul>")
+    
+    slowest_files = analysis_data.get("slowest_files", [])
+    if slowest_files:
+        estimated = " (estimada: duración del lote repartida por tamaño)" if analysis_data.get("durations_estimated") else ""
+        append("<h2>Ficheros más lentos</h2>")
+        append("<table>")
+        append(f"<tr><th>#</th><th>Fichero</th><th>Duración{estimated}</th><th>Estado</th></tr>")
+        for i, entry in enumerate(slowest_files, 1):
+            status_cls = "errors" if entry["status"] == "timeout" else "correct"
+            append(f"<tr><td class='num'>{i}</td>"
+                   f"<td>{html_module.escape(get_relative_path(entry['file']))}</td>"
+                   f"<td class='num'>{entry['seconds']:.2f}s</td>"
+                   f"<td class='{status_cls}'>{entry['status'].upper()}</td></tr>")
+        append("</table>")
+    
     # ============================
     # RESUMEN POR MOTIVO - ERRORES
     # ============================
@@ -539,16 +631,11 @@ def generate_analyzer_html(analysis_data, html_file):
                f"<th>Casos</th><th style='width:{PCT_CELL_WIDTH}px;'>% de errors</th></tr>")
         
         # Calcular totales para porcentajes
-        all_error_files = set()
-        for fp_list in error_reason_files.values():
-            for fp, _ in fp_list:
-                all_error_files.add(fp)
-        total_error_files = len(all_error_files)
+        total_error_files = len(error_reason_files.files())
         total_error_cases = sum(error_reasons.values())
         
         for reason, count in sorted(error_reasons.items(), key=lambda x: -x[1]):
-            files_for_reason = set(fp for fp, _ in error_reason_files.get(reason, []))
-            num_files = len(files_for_reason)
+            num_files = len(error_reason_files[reason].files()) if reason in error_reason_files else 0
             
             pct_files = percentage(num_files, total_error_files)
             pct_cases = percentage(count, total_error_cases)
@@ -563,7 +650,7 @@ def generate_analyzer_html(analysis_data, html_file):
             
             reason_id = safe_id("ERROR:" + reason)
             
-            append(f"<tr><td>ERROR: {html_module.escape(reason)}</td>"
+            append(f"<tr><td>ERROR: {html_module.escape(reason_label(reason, error_reason_messages))}</td>"
                    f"<td class='num'>{num_files}</td>"
                    f"<td class='num' style='width:{PCT_CELL_WIDTH}px; display:flex; align-items:center; gap:6px;'>"
                    f"<span style='flex:none'>{pct_files}</span>"
@@ -587,16 +674,11 @@ def generate_analyzer_html(analysis_data, html_file):
                f"<th>Casos</th><th style='width:{PCT_CELL_WIDTH}px;'>% de warnings</th></tr>")
         
         # Calcular totales para porcentajes
-        all_warning_files = set()
-        for fp_list in warning_reason_files.values():
-            for fp, _ in fp_list:
-                all_warning_files.add(fp)
-        total_warning_files = len(all_warning_files)
+        total_warning_files = len(warning_reason_files.files())
         total_warning_cases = sum(warning_reasons.values())
         
         for reason, count in sorted(warning_reasons.items(), key=lambda x: -x[1]):
-            files_for_reason = set(fp for fp, _ in warning_reason_files.get(reason, []))
-            num_files = len(files_for_reason)
+            num_files = len(warning_reason_files[reason].files()) if reason in warning_reason_files else 0
             
             pct_files = percentage(num_files, total_warning_files)
             pct_cases = percentage(count, total_warning_cases)
@@ -611,7 +693,7 @@ def generate_analyzer_html(analysis_data, html_file):
             
             reason_id = safe_id("WARNING:" + reason)
             
-            append(f"<tr><td>WARNING: {html_module.escape(reason)}</td>"
+            append(f"<tr><td>WARNING: {html_module.escape(reason_label(reason, warning_reason_messages))}</td>"
                    f"<td class='num'>{num_files}</td>"
                    f"<td class='num' style='width:{PCT_CELL_WIDTH}px; display:flex; align-items:center; gap:6px;'>"
                    f"<span style='flex:none'>{pct_files}</span>"
@@ -643,6 +725,8 @@ def generate_detail_reason_html(analysis_data, html_file):
     warning_reasons = analysis_data["warning_reasons"]
     error_reason_files = analysis_data["error_reason_files"]
     warning_reason_files = analysis_data["warning_reason_files"]
+    error_reason_messages = analysis_data.get("error_reason_messages", {})
+    warning_reason_messages = analysis_data.get("warning_reason_messages", {})
     kernel_dir = analysis_data.get("kernel_dir", "")
     
     def get_relative_path(fp):
@@ -663,6 +747,8 @@ def generate_detail_reason_html(analysis_data, html_file):
     append(COMMON_CSS)
     append("</style></head><body>")
     append(f"<h1>Informe Checkpatch - Detalle por motivo <span style='font-weight:normal'>{timestamp}</span></h1>")
+    if analysis_data.get("partial"):
+        append(partial_notice(analysis_partial_message(analysis_data)))
     
     # ERRORES - Detallado
     if error_reasons:
@@ -670,13 +756,14 @@ def generate_detail_reason_html(analysis_data, html_file):
         for reason in sorted(error_reasons.keys()):
             count = error_reasons[reason]
             reason_id = safe_id("ERROR:" + reason)
-            files_for_reason = sorted(set(fp for fp, _ in error_reason_files.get(reason, [])))
+            lines_by_file = error_reason_files[reason].lines_by_file() if reason in error_reason_files else {}
+            files_for_reason = sorted(lines_by_file)
             
-            append(f"<h4 id='{reason_id}' class='errors'>ERROR: {html_module.escape(reason)}</h4>")
+            append(f"<h4 id='{reason_id}' class='errors'>ERROR: {html_module.escape(reason_label(reason, error_reason_messages))}</h4>")
             append(f"Ficheros afectados: {len(files_for_reason)} | Total casos: {count}")
             append("<ul>")
             for fp in files_for_reason:
-                lines = sorted(set(line for f, line in error_reason_files.get(reason, []) if f == fp))
+                lines = lines_by_file[fp]
                 rel_path = get_relative_path(fp)
                 file_id = safe_id("FILE:" + fp)
                 append(f"<li><a href='detail-file.html#{file_id}'>{rel_path}</a> - líneas {', '.join(map(str, lines))}</li>")
@@ -688,13 +775,14 @@ def generate_detail_reason_html(analysis_data, html_file):
         for reason in sorted(warning_reasons.keys()):
             count = warning_reasons[reason]
             reason_id = safe_id("WARNING:" + reason)
-            files_for_reason = sorted(set(fp for fp, _ in warning_reason_files.get(reason, [])))
+            lines_by_file = warning_reason_files[reason].lines_by_file() if reason in warning_reason_files else {}
+            files_for_reason = sorted(lines_by_file)
             
-            append(f"<h4 id='{reason_id}' class='warnings'>WARNING: {html_module.escape(reason)}</h4>")
+            append(f"<h4 id='{reason_id}' class='warnings'>WARNING: {html_module.escape(reason_label(reason, warning_reason_messages))}</h4>")
             append(f"Ficheros afectados: {len(files_for_reason)} | Total casos: {count}")
             append("<ul>")
             for fp in files_for_reason:
-                lines = sorted(set(line for f, line in warning_reason_files.get(reason, []) if f == fp))
+                lines = lines_by_file[fp]
                 rel_path = get_relative_path(fp)
                 file_id = safe_id("FILE:" + fp)
                 append(f"<li><a href='detail-file.html#{file_id}'>{rel_path}</a> - líneas {', '.join(map(str, lines))}</li>")
@@ -708,6 +796,14 @@ def generate_detail_reason_html(analysis_data, html_file):
 
 def generate_detail_file_html(analysis_data, html_file):
     """Genera detail-file.html con el análisis detallado por fichero."""
+    # Se escribe directamente al fichero: con file_outputs en disco (OutputStore)
+    # solo hay una salida de checkpatch en memoria a la vez
+    with open(html_file, "w", encoding="utf-8") as out:
+        _write_detail_file_html(analysis_data, out)
+
+
+def _write_detail_file_html(analysis_data, out):
+    """Escribe el contenido de detail-file.html en out."""
     import hashlib
     
     def safe_id(text):
@@ -745,8 +841,10 @@ def generate_detail_file_html(analysis_data, html_file):
                 return fp
         return fp
     
-    html_out = []
-    append = html_out.append
+    def append(text):
+        out.write(text)
+        out.write("\n")
+    
     timestamp = datetime.datetime.now().strftime("%H:%M:%S %d/%m/%Y")
     
     # Helper para rutas relativas
@@ -764,6 +862,8 @@ def generate_detail_file_html(analysis_data, html_file):
     append(COMMON_CSS)
     append("</style></head><body>")
     append(f"<h1>Informe Checkpatch - Detalle por fichero <span style='font-weight:normal'>{timestamp}</span></h1>")
+    if analysis_data.get("partial"):
+        append(partial_notice(analysis_partial_message(analysis_data)))
     
     # JavaScript para abrir el desplegable al llegar por ancla
     append("<script>")
@@ -782,39 +882,28 @@ def generate_detail_file_html(analysis_data, html_file):
     # ============================
     # DETALLE POR FICHERO
     # ============================
-    # Agrupar issues por fichero
-    file_issues = {}  # file_path -> [(reason, line, is_error), ...]
-    for reason, issues in error_reason_files.items():
-        for fp, line in issues:
-            if fp not in file_issues:
-                file_issues[fp] = []
-            file_issues[fp].append((reason, line, True))
-    
-    for reason, issues in warning_reason_files.items():
-        for fp, line in issues:
-            if fp not in file_issues:
-                file_issues[fp] = []
-            file_issues[fp].append((reason, line, False))
+    # Issues por fichero, contados sobre las columnas de ids del índice (sin una tupla por ocurrencia)
+    error_counts = error_reason_files.counts_by_file()
+    warning_counts = warning_reason_files.counts_by_file()
     
     append("<h2>Detalle por fichero</h2>")
     
-    for fp in sorted(file_issues.keys()):
+    for fp in sorted(error_counts.keys() | warning_counts.keys()):
         file_id = safe_id("FILE:" + fp)
         rel_path = get_relative_path_helper(fp)
         
-        issues = file_issues[fp]
-        errors = [i for i in issues if i[2]]
-        warnings = [i for i in issues if not i[2]]
+        errors = error_counts.get(fp, 0)
+        warnings = warning_counts.get(fp, 0)
         
         append(f"<details class='file-detail'>")
         append(f"<summary id='{file_id}'>")
         append(f"<strong>{rel_path}</strong>")
         append(f"<span class='stats'>")
         if errors:
-            append(f"<span class='stat-item'><span class='errors'>{len(errors)} errores</span></span>")
+            append(f"<span class='stat-item'><span class='errors'>{errors} errores</span></span>")
         if warnings:
-            append(f"<span class='stat-item'><span class='warnings'>{len(warnings)} warnings</span></span>")
-        append(f"<span class='stat-item'>Total: {len(issues)}</span>")
+            append(f"<span class='stat-item'><span class='warnings'>{warnings} warnings</span></span>")
+        append(f"<span class='stat-item'>Total: {errors + warnings}</span>")
         append(f"</span>")
         append(f"</summary>")
         append(f"<div class='detail-content'>")
@@ -831,9 +920,6 @@ def generate_detail_file_html(analysis_data, html_file):
         append(f"</details>")
     
     append("</body></html>")
-    
-    with open(html_file, "w", encoding="utf-8") as f:
-        f.write("\n".join(html_out))
 
 
 def generate_dashboard_html(html_file):
@@ -1468,7 +1554,7 @@ def generate_autofix_detail_file_html(fixed_data, html_file, kernel_dir="."):
         f.write("\n".join(html_out))
 
 
-def generate_compile_html(results, html_file, kernel_root=None):
+def generate_compile_html(results, html_file, kernel_root=None, partial=""):
     """
     Genera reporte HTML para resultados de compilación.
     
@@ -1476,6 +1562,7 @@ def generate_compile_html(results, html_file, kernel_root=None):
         results: Lista de CompilationResult
         html_file: Ruta del archivo HTML a generar
         kernel_root: Directorio raíz del kernel (para rutas relativas)
+        partial: Mensaje de informe parcial si la compilación se canceló ("" si terminó)
     """
     from pathlib import Path
     
@@ -1594,6 +1681,8 @@ def generate_compile_html(results, html_file, kernel_root=None):
     
     # Header
     append(f"<h1>Informe de Compilación <span style='font-weight:normal'>{timestamp}</span></h1>")
+    if partial:
+        append(partial_notice(partial))
     
     # Executive Summary con cajas de éxito
     append("<div class='stat-grid'>")
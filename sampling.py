@@ -0,0 +1,156 @@
+# sampling.py
+"""
+Análisis por muestreo de árboles grandes
+
+Para un chequeo rápido de la distribución de issues por subsistema no hace
+falta analizar los 60k ficheros del kernel:
+
+- --sample FRACCIÓN: muestra estratificada por categoría de FUNCTIONALITY_MAP
+  (la misma fracción en cada estrato, al menos un fichero por estrato).
+- --time-budget SEGUNDOS: los ficheros se envían en orden aleatorio y se deja
+  de enviar al agotarse el tiempo; cualquier prefijo de ese orden es una
+  muestra aleatoria simple, que se post-estratifica igual.
+
+Los recuentos del árbol completo se extrapolan por estrato (estimador de
+expansión N_h * media_h) con intervalos de confianza normales que incluyen la
+corrección por población finita.
+"""
+
+import math
+import random
+from collections import Counter, defaultdict
+
+from engine import classify_functionality
+
+CONFIDENCE = 0.95
+CONFIDENCE_Z = 1.96  # cuantil normal del intervalo de confianza del 95%
+METRICS = ("files_errors", "files_warnings", "errors", "warnings")
+
+
+def population_by_stratum(files):
+    """Número de ficheros por categoría de FUNCTIONALITY_MAP."""
+    return Counter(classify_functionality(f) for f in files)
+
+
+def stratified_sample(files, fraction, seed=0):
+    """
+    Muestra aleatoria de `fraction` de los ficheros de cada estrato (mínimo uno por estrato),
+    en orden aleatorio para que cualquier prefijo siga siendo representativo.
+    """
+    rng = random.Random(seed)
+    strata = defaultdict(list)
+    for f in files:
+        strata[classify_functionality(f)].append(f)
+    sample = []
+    for label in sorted(strata):
+        members = strata[label]
+        size = min(len(members), max(1, round(len(members) * fraction)))
+        sample.extend(rng.sample(members, size))
+    rng.shuffle(sample)
+    return sample
+
+
+def shuffled(files, seed=0):
+    """Los ficheros en orden aleatorio (reproducible con la misma semilla)."""
+    files = list(files)
+    random.Random(seed).shuffle(files)
+    return files
+
+
+class StratifiedEstimator:
+    """
+    Acumula por estrato suma y suma de cuadrados de cada métrica por fichero
+    y extrapola al total de la población.
+    population: {estrato: número de ficheros en el árbol}
+    """
+
+    def __init__(self, population):
+        self.population = dict(population)
+        self._n = Counter()
+        self._sums = defaultdict(Counter)
+        self._squares = defaultdict(Counter)
+
+    def add(self, result):
+        # Un fichero con timeout no está medido: no entra en la muestra
+        if result.timed_out:
+            return
+        values = {
+            "files_errors": 1 if result.errors else 0,
+            "files_warnings": 1 if result.warnings else 0,
+            "errors": len(result.errors),
+            "warnings": len(result.warnings),
+        }
+        stratum = result.functionality
+        self._n[stratum] += 1
+        for metric, value in values.items():
+            self._sums[stratum][metric] += value
+            self._squares[stratum][metric] += value * value
+
+    def _stratum_estimate(self, stratum, metric):
+        """(estimación, varianza) del total del estrato; varianza None si no se puede estimar."""
+        N = self.population.get(stratum, 0)
+        n = self._n[stratum]
+        if not n:
+            return None, None
+        mean = self._sums[stratum][metric] / n
+        if n >= N:
+            return mean * N, 0.0  # estrato completo: valor exacto
+        if n < 2:
+            return mean * N, None
+        s2 = (self._squares[stratum][metric] - n * mean * mean) / (n - 1)
+        return mean * N, N * N * (1 - n / N) * max(s2, 0.0) / n
+
+    @staticmethod
+    def _interval(estimate, variance):
+        if estimate is None:
+            return {"estimate": None, "low": None, "high": None}
+        if variance is None:
+            return {"estimate": estimate, "low": None, "high": None}
+        margin = CONFIDENCE_Z * math.sqrt(variance)
+        return {"estimate": estimate, "low": max(0.0, estimate - margin), "high": estimate + margin}
+
+    def estimate(self):
+        """
+        {"strata": {estrato: {"population", "analyzed", "metrics"}}, "total": {...}} donde
+        metrics[métrica] = {"estimate", "low", "high"} (None si el estrato no tiene datos suficientes).
+        """
+        strata = {}
+        estimates = Counter()
+        variances = Counter()
+        missing_estimate = set()
+        missing_variance = set()
+        for stratum in sorted(self.population):
+            metrics = {}
+            for metric in METRICS:
+                estimate, variance = self._stratum_estimate(stratum, metric)
+                metrics[metric] = self._interval(estimate, variance)
+                if estimate is None:
+                    missing_estimate.add(metric)
+                else:
+                    estimates[metric] += estimate
+                if variance is None:
+                    missing_variance.add(metric)
+                else:
+                    variances[metric] += variance
+            strata[stratum] = {
+                "population": self.population[stratum],
+                "analyzed": self._n[stratum],
+                "metrics": metrics,
+            }
+        # El total solo se extrapola si todos los estratos tienen estimación (y su intervalo si todos tienen varianza)
+        total_metrics = {}
+        for metric in METRICS:
+            if metric in missing_estimate:
+                total_metrics[metric] = self._interval(None, None)
+            else:
+                total_metrics[metric] = self._interval(
+                    estimates[metric], None if metric in missing_variance else variances[metric])
+        return {
+            "strata": strata,
+            "total": {
+                "population": sum(self.population.values()),
+                "analyzed": sum(self._n.values()),
+                "metrics": total_metrics,
+            },
+            "confidence": CONFIDENCE,
+        }
@@ -0,0 +1,118 @@
+# scheduler.py
+"""
+Planificación del análisis por coste estimado
+
+Con los ficheros en orden de ruta, los más pesados (p.ej. cabeceras de
+registros generadas en drivers/gpu) pueden empezar al final y dejar un único
+worker trabajando mientras el resto espera. Ordenando de mayor a menor coste
+(LPT, longest processing time first) los grandes empiezan primero y los
+pequeños rellenan los huecos.
+
+El coste se estima por tamaño de fichero o por la duración medida en
+ejecuciones anteriores (histórico en JSON, ruta relativa al kernel -> segundos).
+Las mismas duraciones alimentan la tabla de ficheros más lentos del informe.
+"""
+
+import heapq
+import json
+import os
+from pathlib import Path
+
+from utils import checkpatch_target
+
+SCHEDULES = ("path", "size", "history")
+DEFAULT_DURATIONS_FILE = ".cache/checkpatch-durations.json"
+SLOWEST_FILES = 20
+
+
+def _file_size(file_path):
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def load_durations(path):
+    """Lee el histórico de duraciones {ruta relativa: segundos}; {} si no existe o está corrupto."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_durations(path, durations):
+    """Guarda el histórico de forma atómica."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(durations, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def order_by_cost(files, kernel_dir=None, durations=None):
+    """
+    Ordena los ficheros de mayor a menor coste estimado.
+    Sin histórico el coste es el tamaño; con histórico, la duración conocida o,
+    para ficheros nuevos, su tamaño por los segundos/byte medios del histórico.
+    """
+    sizes = {f: _file_size(f) for f in files}
+    if not durations:
+        return sorted(files, key=lambda f: sizes[f], reverse=True)
+
+    known = {}
+    for f in files:
+        seconds = durations.get(checkpatch_target(f, kernel_dir))
+        if seconds is not None:
+            known[f] = seconds
+    known_bytes = sum(sizes[f] for f in known)
+    rate = sum(known.values()) / known_bytes if known_bytes else 0
+    if not rate:
+        return sorted(files, key=lambda f: sizes[f], reverse=True)
+    return sorted(files, key=lambda f: known.get(f, sizes[f] * rate), reverse=True)
+
+
+def split_duration(chunk, elapsed):
+    """Reparte la duración de un lote entre sus ficheros en proporción a su tamaño."""
+    if len(chunk) == 1:
+        return {chunk[0]: elapsed}
+    sizes = [_file_size(f) for f in chunk]
+    total = sum(sizes)
+    if not total:
+        return {f: elapsed / len(chunk) for f in chunk}
+    return {f: elapsed * size / total for f, size in zip(chunk, sizes)}
+
+
+class SlowestFiles:
+    """Los n ficheros más lentos vistos hasta ahora (heap acotado, no guarda el resto)."""
+
+    def __init__(self, n=SLOWEST_FILES):
+        self.n = n
+        self._heap = []
+
+    def add(self, file_path, seconds):
+        item = (seconds, str(file_path))
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, item)
+        elif self._heap and item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+
+    def items(self):
+        """[(fichero, segundos)] de más lento a menos."""
+        return [(file_path, seconds) for seconds, file_path in sorted(self._heap, reverse=True)]
+
+
+def packing_stats(makespan, task_time, workers):
+    """
+    Compara el makespan (tiempo de pared del análisis) con la suma de tiempos de tarea.
+    efficiency = task_time / (workers * makespan): 100% si ningún worker estuvo ocioso.
+    """
+    ideal = task_time / workers if workers else task_time
+    return {
+        "makespan": makespan,
+        "task_time": task_time,
+        "ideal_makespan": ideal,
+        "efficiency": (task_time / (workers * makespan) * 100) if makespan and workers else 0,
+    }
@@ -18,9 +18,12 @@ import json
 import subprocess
 import sys
 import unittest
+from unittest import mock
 import tempfile
 import os
 import re
+import random
+import threading
 from pathlib import Path
 from collections import defaultdict
 import shutil
@@ -76,7 +79,48 @@ from core import (
     fix_constant_comparison,
 )
 
-from engine import AUTO_FIX_RULES
+from engine import AUTO_FIX_RULES, AUTO_FIX_RULE_TYPES, AUTO_FIX_TABLE, RULES_BY_TYPE, FIXABLE_TYPES, AnalysisAggregator, make_result, analyze_file, apply_fixes, \
+    find_fix_rule, get_classifier, set_classifier
+import utils
+from utils import (
+    FixSession,
+    apply_lines_callback,
+    apply_pattern_replace_lines,
+    parse_checkpatch_output,
+    FUNCTIONALITY_MAP,
+    parse_checkpatch_records,
+    CheckpatchIssue,
+    checkpatch_type_args,
+    split_checkpatch_output,
+    chunk_files,
+    run_checkpatch,
+    run_checkpatch_batch,
+    git_changed_files,
+    merge_results,
+    default_worker_count,
+    iter_source_files,
+    find_source_files,
+    load_ignore_patterns,
+    filter_excluded,
+    DEFAULT_EXCLUDES,
+    NdjsonWriter,
+    is_ndjson,
+    iter_ndjson,
+)
+from backends import run_analysis, run_fixes
+from workers import CheckpatchWorker, CheckpatchWorkerPool
+from cache import AnalysisCache
+from outputs import OutputStore
+from occurrences import ReasonIndex
+from constants import SPACE_AFTER_COMMA
+from linebuffer import LineBuffer
+from subsystems import PrefixClassifier
+from scheduler import order_by_cost, split_duration, packing_stats, load_durations, save_durations, SlowestFiles
+from dedup import Deduplicator, dedup_key
+from sampling import StratifiedEstimator, population_by_stratum, stratified_sample
+from checkpoint import RunCheckpoint
+import shutdown
+from report import analysis_partial_message
 
 
 # ============================================================================
@@ -728,6 +772,1073 @@ class TestFixFunctions(unittest.TestCase):
         result = fix_strcpy_to_strscpy(test_file, 1)
         self.assertIsInstance(result, bool)
 
+    
+    def test_fix_session_single_write(self):
+        """Test fixers inside a FixSession share one in-memory buffer and the file is written once."""
+        test_file = self.create_test_file("int a;   \n        int b;\nint c;\n")
+        with mock.patch("utils._write_lines", side_effect=AssertionError("escritura por fix")), \
+                mock.patch("utils._write_lines_atomic", wraps=utils._write_lines_atomic) as write:
+            results = apply_fixes(test_file, [
+                {"type": "warning", "line": 2, "message": "WARNING: code indent should use tabs where possible"},
+                {"type": "error", "line": 1, "message": "ERROR: trailing whitespace"},
+                {"type": "warning", "line": 3, "message": "WARNING: something unknown"},
+            ])
+        self.assertEqual([r["fixed"] for r in results], [True, True, False])
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(self.read_file(test_file), "int a;\n\tint b;\nint c;\n")
+        self.assertEqual(self.read_file(str(test_file) + ".bak"), "int a;   \n        int b;\nint c;\n")
+    
+    def test_fix_session_discards(self):
+        """Test nothing is written without changes or on error, and rejected callback edits are dropped."""
+        test_file = self.create_test_file("int a;\n")
+        
+        def rejected(lines, idx):
+            lines.insert(idx, "/* descartado */\n")
+            return False
+        
+        with mock.patch("utils._write_lines_atomic") as write:
+            with FixSession(test_file) as session:
+                self.assertFalse(apply_lines_callback(test_file, 1, rejected))
+                self.assertFalse(fix_trailing_whitespace(test_file, 1))
+            self.assertEqual(session.lines, ["int a;\n"])
+            write.assert_not_called()
+        with self.assertRaises(RuntimeError):
+            with FixSession(test_file):
+                fix_missing_blank_line(test_file, 1)
+                raise RuntimeError("fallo")
+        self.assertEqual(self.read_file(test_file), "int a;\n")
+
+    
+    def test_line_buffer(self):
+        """Test LineBuffer list operations, original-line mapping and rollback."""
+        buffer = LineBuffer(["a\n", "b\n", "c\n"])
+        buffer.insert(buffer.index_of(1), "x\n")
+        self.assertEqual(buffer.index_of(2), 3)
+        self.assertEqual(buffer.get_original(1), "b\n")
+        del buffer[buffer.index_of(0)]
+        self.assertIsNone(buffer.get_original(0))
+        self.assertEqual(buffer[0:2], ["x\n", "b\n"])
+        buffer.begin()
+        buffer[1:3] = ["B\n"]
+        buffer.insert(len(buffer), "z\n")
+        self.assertEqual(list(buffer), ["x\n", "B\n", "z\n"])
+        buffer.rollback()
+        self.assertEqual(buffer.lines(), ["x\n", "b\n", "c\n"])
+        buffer.set_original(2, "C\n")
+        self.assertEqual(buffer.index_of(5), 5)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.lines(), ["x\n", "b\n", "C\n"])
+    
+    def test_fix_session_any_order(self):
+        """Test fixes that insert lines give the same result in any issue order."""
+        content = "int a;\nfoo();   \nint b;\nbar();   \n}\n"
+        issues = [
+            {"type": "warning", "line": 2, "message": "WARNING: Missing a blank line after declarations"},
+            {"type": "error", "line": 2, "message": "ERROR: trailing whitespace"},
+            {"type": "warning", "line": 4, "message": "WARNING: Missing a blank line after declarations"},
+            {"type": "error", "line": 4, "message": "ERROR: trailing whitespace"},
+        ]
+        outputs = []
+        for ordered in (issues, issues[::-1]):
+            test_file = self.create_test_file(content)
+            results = apply_fixes(test_file, ordered)
+            self.assertTrue(all(r["fixed"] for r in results))
+            outputs.append(self.read_file(test_file))
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0], "int a;\n\nfoo();\nint b;\n\nbar();\n}\n")
+
+    
+    def test_fix_session_insert_after_line(self):
+        """Test a line inserted after a fixed line does not shift the next original line."""
+        issues = [
+            {"type": "warning", "line": 2, "message": "WARNING: Block comments use a trailing */ on a separate line"},
+            {"type": "error", "line": 3, "message": "ERROR: space required before the open brace '{'"},
+        ]
+        for ordered in (issues, issues[::-1]):
+            test_file = self.create_test_file("/*\n * text */\nint f(void){\n")
+            results = apply_fixes(test_file, ordered)
+            self.assertEqual([r["fixed"] for r in results], [True, True])
+            self.assertIn("int f(void) {\n", self.read_file(test_file))
+        buffer = LineBuffer(["a\n", "b\n"])
+        buffer.begin(0)
+        buffer.insert(buffer.index_of(0) + 1, "x\n")
+        buffer.commit()
+        self.assertEqual(buffer[buffer.index_of(1)], "b\n")
+        self.assertEqual(buffer.lines(), ["a\n", "x\n", "b\n"])
+    
+    def test_line_buffer_matches_list(self):
+        """Test LineBuffer inserts and deletes, out-of-range indexes included, behave like a list."""
+        rng = random.Random(7)
+        for _ in range(200):
+            size = rng.randrange(4)
+            lines = [f"{i}\n" for i in range(size)]
+            buffer = LineBuffer(lines)
+            if rng.random() < 0.5 and size:
+                buffer.begin(rng.randrange(size))
+            for step in range(6):
+                if lines and rng.random() < 0.3:
+                    index = rng.randrange(-len(lines), len(lines))
+                    del lines[index]
+                    del buffer[index]
+                else:
+                    index = rng.randrange(-3, len(lines) + 4)
+                    lines.insert(index, f"n{step}\n")
+                    buffer.insert(index, f"n{step}\n")
+                self.assertEqual(list(buffer), lines)
+                self.assertEqual(len(buffer), len(lines))
+
+    
+    def test_pattern_rule_batch(self):
+        """Test a pattern rule is applied to all its lines in one pass with per-line results."""
+        test_file = self.create_test_file("f(a,b);\nint x;\ng(c,d);\n")
+        with mock.patch("utils._write_lines", wraps=utils._write_lines) as write:
+            fixed = apply_pattern_replace_lines(test_file, [3, 2, 1, 3, 9], *SPACE_AFTER_COMMA)
+        self.assertEqual(fixed, [True, False, True, False, False])
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(self.read_file(test_file), "f(a, b);\nint x;\ng(c, d);\n")
+        # En apply_fixes los resultados siguen el orden de los issues aunque las reglas se agrupen
+        test_file = self.create_test_file("unsigned a,b; \tx;\nunsigned c;   \n")
+        results = apply_fixes(test_file, [
+            {"type": "warning", "line": 2, "message": "WARNING: Prefer 'unsigned int' to bare use of 'unsigned'"},
+            {"type": "error", "line": 2, "message": "ERROR: trailing whitespace"},
+            {"type": "warning", "line": 1, "message": "WARNING: space before tabs"},
+            {"type": "error", "line": 1, "message": "ERROR: space required after that ','"},
+            {"type": "warning", "line": 1, "message": "WARNING: Prefer 'unsigned int' to bare use of 'unsigned'"},
+        ])
+        self.assertEqual([(r["line"], r["fixed"]) for r in results], [(2, True), (2, True), (1, True), (1, True), (1, True)])
+        self.assertEqual(self.read_file(test_file), "unsigned int a, b;\tx;\nunsigned int c;\n")
+        # Un fixer de función que fusiona la línea va después de la regla de patrón anterior
+        test_file = self.create_test_file("if (x) {\n\ty();\n}\nelse {z(a,b);\n")
+        results = apply_fixes(test_file, [
+            {"type": "error", "line": 4, "message": "ERROR: space required after that ','"},
+            {"type": "error", "line": 4, "message": "ERROR: else should follow close brace '}'"},
+        ])
+        self.assertEqual([(r["line"], r["fixed"]) for r in results], [(4, True), (4, True)])
+        self.assertEqual(self.read_file(test_file), "if (x) {\n\ty();\n} else {z(a, b);\n")
+    
+    def test_rule_dispatch(self):
+        """Test rule lookup by type ID or a single regex pass agrees with scanning every rule key."""
+        for rule_key in AUTO_FIX_RULES:
+            message = f"WARNING: {rule_key} (ctx:VxV)"
+            self.assertEqual(find_fix_rule(message), rule_key)
+            self.assertEqual(find_fix_rule(message, AUTO_FIX_RULE_TYPES.get(rule_key, "NO_SUCH_TYPE")), rule_key)
+        self.assertIsNone(find_fix_rule("WARNING: braces {} should be used on all arms of this statement", "BRACES"))
+        self.assertIsNone(find_fix_rule("WARNING: line length of 101 exceeds 100 columns"))
+        # La ruta del mensaje de SPDX varía por fichero
+        spdx = "ERROR: Improper SPDX comment style for 'drivers/net/foo.c', please use '/*' instead"
+        self.assertIs(AUTO_FIX_RULES[find_fix_rule(spdx, "SPDX_LICENSE_TAG")], fix_spdx_comment)
+        self.assertIs(AUTO_FIX_RULES[find_fix_rule(spdx)], fix_spdx_comment)
+        test_file = self.create_test_file("// SPDX-License-Identifier: GPL-2.0\n")
+        results = apply_fixes(test_file, [{"type": "error", "line": 1, "message": spdx, "type_id": "SPDX_LICENSE_TAG"}])
+        self.assertTrue(results[0]["fixed"])
+        self.assertEqual(self.read_file(test_file), "/* SPDX-License-Identifier: GPL-2.0 */\n")
+        # Si ninguna regla del tipo coincide se busca por el mensaje (tipo distinto en otra versión)
+        self.assertEqual(find_fix_rule("ERROR: trailing whitespace", "SPACING"), "trailing whitespace")
+        self.assertEqual(find_fix_rule("ERROR: trailing whitespace", "NO_SUCH_TYPE"), "trailing whitespace")
+    
+    def test_rule_table(self):
+        """Test every autofix rule with a type is reachable through the type index alone."""
+        self.assertEqual(list(AUTO_FIX_RULES), [key for key, _, _ in AUTO_FIX_TABLE])
+        for rule_key, rule_type, fixer in AUTO_FIX_TABLE:
+            self.assertIs(AUTO_FIX_RULES[rule_key], fixer)
+            if rule_type:
+                self.assertIn(rule_key, RULES_BY_TYPE[rule_type])
+                self.assertEqual(AUTO_FIX_RULE_TYPES[rule_key], rule_type)
+
+    
+    def test_parallel_fixes_in_order(self):
+        """Test fixing files in worker processes yields the sequential results in input order."""
+        issue = {"type": "error", "line": 1, "message": "ERROR: trailing whitespace"}
+        tasks = []
+        for i in range(6):
+            path = Path(self.test_dir) / f"f{i}.c"
+            path.write_text("int x;   \n" if i % 2 else "int y;\n")
+            tasks.append((path, [issue]))
+        # El mismo fichero dos veces: la segunda pasada ya no tiene nada que corregir
+        tasks.append((tasks[1][0], [issue]))
+        results = list(run_fixes(iter(tasks), workers=2, max_in_flight=3))
+        self.assertEqual([(path, issues) for path, issues, _ in results], tasks)
+        self.assertEqual([r[0]["fixed"] for _, _, r in results], [False, True, False, True, False, True, False])
+        self.assertEqual((Path(self.test_dir) / "f1.c").read_text(), "int x;\n")
+
+
+# checkpatch.pl mínimo con la misma forma de CLI y de salida que el real
+FAKE_CHECKPATCH = r'''
+use strict;
+use warnings;
+use Getopt::Long;
+my ($file, $tree, $quiet, $show_types, $terse, $emacs) = (0, 1, 0, 0, 0, 0);
+GetOptions('file!' => \$file, 'tree!' => \$tree, 'q|quiet+' => \$quiet, 'show-types!' => \$show_types,
+	'terse!' => \$terse, 'emacs!' => \$emacs) or exit;
+$emacs = 1 if $terse;
+my @rawlines = ();
+sub process {
+	my $filename = shift;
+	my ($linenr, $errs) = (0, 0);
+	for my $l (@rawlines) {
+		$linenr++;
+		next unless $l =~ /\s+$/;
+		my $type = $show_types ? "TRAILING_WHITESPACE:" : "";
+		if ($terse) {
+			print "$filename:$linenr: ERROR:$type trailing whitespace\n";
+		} elsif ($emacs) {
+			print "$filename:$linenr: ERROR:$type trailing whitespace\n+$l\n\n";
+		} else {
+			print "ERROR:$type trailing whitespace\n#" . ($linenr + 3) . ": FILE: $filename:$linenr:\n+$l\n\n";
+		}
+		$errs++;
+	}
+	print "total: $errs errors, 0 warnings, $linenr lines checked\n";
+	return !$errs;
+}
+for my $filename (@ARGV) {
+	open(my $FILE, '<', $filename) or die "$filename: $!\n";
+	while (<$FILE>) { chomp; push(@rawlines, $_); }
+	close($FILE);
+	if ($#ARGV > 0 && $quiet == 0) {
+		print '-' x length($filename) . "\n$filename\n" . '-' x length($filename) . "\n";
+	}
+	process($filename);
+	@rawlines = ();
+}
+'''
+
+
+class TestAnalyzer(unittest.TestCase):
+    """Tests for checkpatch execution and output parsing."""
+    
+    def setUp(self):
+        """Create a fake kernel tree with a fake checkpatch.pl."""
+        self.test_dir = Path(tempfile.mkdtemp())
+        (self.test_dir / "scripts").mkdir()
+        self.checkpatch = self.test_dir / "scripts" / "checkpatch.pl"
+        self.checkpatch.write_text(FAKE_CHECKPATCH)
+        self.dirty = self.test_dir / "dirty.c"
+        self.dirty.write_text("int x;\nint y; \n")
+        self.clean = self.test_dir / "clean.c"
+        self.clean.write_text("int z;\n")
+    
+    def tearDown(self):
+        """Clean up temporary test directory."""
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def test_parse_checkpatch_output(self):
+        """Test parsing errors and warnings with their line numbers."""
+        output = ("WARNING: Missing a blank line after declarations\n"
+                  "#12: FILE: init/main.c:9:\n+\tint x;\n\n"
+                  "ERROR: trailing whitespace\n"
+                  "#20: FILE: init/main.c:17:\n+foo(); \n\n"
+                  "total: 1 errors, 1 warnings, 40 lines checked\n")
+        errors, warnings = parse_checkpatch_output(output)
+        self.assertEqual(errors, [{"line": 17, "message": "ERROR: trailing whitespace"}])
+        self.assertEqual(warnings, [{"line": 9, "message": "WARNING: Missing a blank line after declarations"}])
+    
+    def test_parse_show_types_records(self):
+        """Test typed records are parsed in default, emacs and terse layouts."""
+        default = ("WARNING:LONG_LINE: line length of 101 exceeds 100 columns\n"
+                   "#12: FILE: init/main.c:9:\n+\tfoo(a: b);\n\n"
+                   "CHECK:BRACES: braces {} should be used on all arms\n"
+                   "#30: FILE: init/main.c:27:\n+\tif (x)\n\n"
+                   "ERROR:SPDX_LICENSE_TAG: Improper SPDX comment style for 'init/main.c', please use '/*' instead\n"
+                   "#1: FILE: init/main.c:1:\n+// SPDX\n\n")
+        self.assertEqual(parse_checkpatch_records(default), [
+            CheckpatchIssue("LONG_LINE", "WARNING", 9, "line length of 101 exceeds 100 columns"),
+            CheckpatchIssue("BRACES", "CHECK", 27, "braces {} should be used on all arms"),
+            CheckpatchIssue("SPDX_LICENSE_TAG", "ERROR", 1,
+                            "Improper SPDX comment style for 'init/main.c', please use '/*' instead"),
+        ])
+        terse = ("init/main.c:9: WARNING:LONG_LINE: line length of 101 exceeds 100 columns\n"
+                 "init/main.c:17: ERROR:TRAILING_WHITESPACE: trailing whitespace\n"
+                 "total: 1 errors, 1 warnings, 40 lines checked\n")
+        errors, warnings = parse_checkpatch_output(terse)
+        self.assertEqual(errors, [{"line": 17, "message": "ERROR: trailing whitespace", "type_id": "TRAILING_WHITESPACE"}])
+        self.assertEqual(warnings, [{"line": 9, "message": "WARNING: line length of 101 exceeds 100 columns",
+                                     "type_id": "LONG_LINE"}])
+    
+    def test_type_filter_args(self):
+        """Test type filters become checkpatch --types/--ignore and fixable types map to real rules."""
+        self.assertEqual(checkpatch_type_args(["long_line", "SPACING"], ["SPACING"]),
+                         ["--types", "LONG_LINE,SPACING", "--ignore", "SPACING"])
+        self.assertEqual(checkpatch_type_args(), [])
+        self.assertTrue(set(AUTO_FIX_RULE_TYPES) <= set(AUTO_FIX_RULES))
+        self.assertIn("TRAILING_WHITESPACE", FIXABLE_TYPES)
+    
+    @unittest.skipUnless(shutil.which("perl"), "perl not available")
+    def test_terse_batch_split(self):
+        """Test batched terse output is split per file."""
+        args = ["--no-tree", "--file", "--show-types", "--terse"]
+        results = run_checkpatch_batch([self.clean, self.dirty], self.checkpatch, self.test_dir, args)
+        self.assertEqual(results[0][0], [])
+        self.assertEqual(results[1][0], [{"line": 2, "message": "ERROR: trailing whitespace",
+                                          "type_id": "TRAILING_WHITESPACE"}])
+    
+    @unittest.skipUnless(shutil.which("perl"), "perl not available")
+    def test_persistent_worker_reuses_process(self):
+        """Test a persistent worker checks several files with one perl process."""
+        worker = CheckpatchWorker(self.checkpatch, self.test_dir)
+        try:
+            output = worker.check(self.dirty)
+            pid = worker.proc.pid
+            self.assertIn("dirty.c:2:", output)
+            self.assertIn("total: 0 errors", worker.check(self.clean))
+            self.assertEqual(pid, worker.proc.pid)
+        finally:
+            worker.close()
+    
+    @unittest.skipUnless(shutil.which("perl"), "perl not available")
+    def test_worker_pool_matches_run_checkpatch(self):
+        """Test the worker pool returns the same parsed result as a one-shot run."""
+        with CheckpatchWorkerPool(self.checkpatch, self.test_dir, size=2) as pool:
+            errors, warnings, _ = pool.run_checkpatch(self.dirty)
+        self.assertEqual(errors, [{"line": 2, "message": "ERROR: trailing whitespace", "type_id": "TRAILING_WHITESPACE"}])
+        self.assertEqual(warnings, [])
+    
+    def test_split_checkpatch_output(self):
+        """Test demultiplexing a multi-file run by headers and FILE: markers."""
+        output = ("-----\na/x.c\n-----\n"
+                  "ERROR: trailing whitespace\n#4: FILE: a/x.c:1:\n+x; \n\n"
+                  "total: 1 errors, 0 warnings, 1 lines checked\n"
+                  "-----\na/y.c\n-----\n"
+                  "total: 0 errors, 0 warnings, 3 lines checked\n")
+        outputs = split_checkpatch_output(output, ["a/x.c", "a/y.c"])
+        self.assertIn("a/x.c:1:", outputs["a/x.c"])
+        self.assertNotIn("a/x.c", outputs["a/y.c"])
+        self.assertIn("3 lines checked", outputs["a/y.c"])
+        
+        # --quiet: sin cabeceras, solo los marcadores FILE:
+        quiet = ("WARNING: foo\n#4: FILE: a/y.c:1:\n+y\n\n"
+                 "ERROR: bar\n#5: FILE: a/x.c:2:\n+x\n\n")
+        outputs = split_checkpatch_output(quiet, ["a/x.c", "a/y.c"])
+        self.assertEqual(parse_checkpatch_output(outputs["a/y.c"])[1], [{"line": 1, "message": "WARNING: foo"}])
+        self.assertEqual(parse_checkpatch_output(outputs["a/x.c"])[0], [{"line": 2, "message": "ERROR: bar"}])
+    
+    def test_chunk_files(self):
+        """Test chunks are bounded by file count and total bytes."""
+        files = [self.dirty, self.clean, self.dirty, self.clean, self.dirty]
+        self.assertEqual([len(c) for c in chunk_files(files, max_files=2)], [2, 2, 1])
+        self.assertEqual([len(c) for c in chunk_files(files, max_files=10, max_bytes=25)], [2, 2, 1])
+    
+    @unittest.skipUnless(shutil.which("perl"), "perl not available")
+    def test_run_checkpatch_batch(self):
+        """Test one checkpatch run over several files yields per-file results."""
+        results = run_checkpatch_batch([self.clean, self.dirty], self.checkpatch, self.test_dir)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0], [])
+        self.assertEqual(results[1][0], [{"line": 2, "message": "ERROR: trailing whitespace", "type_id": "TRAILING_WHITESPACE"}])
+        self.assertNotIn("dirty.c", results[0][2])
+    
+    def test_backends_match(self):
+        """Test process and asyncio backends produce the same results as threads."""
+        chunks = [[self.clean, self.dirty], [self.dirty]]
+        expected = None
+        for backend in ("thread", "process", "asyncio"):
+            results = []
+            for chunk, chunk_results, error, elapsed in run_analysis(chunks, self.checkpatch, self.test_dir, backend, 2):
+                self.assertIsNone(error)
+                results.extend(chunk_results)
+            results.sort()
+            if expected is None:
+                expected = results
+            self.assertEqual(results, expected, backend)
+        self.assertEqual(len(expected), 3)
+    
+    def test_process_backend_uses_cache_in_parent(self):
+        """Test the process backend serves hits and stores misses in the parent cache."""
+        cache = AnalysisCache(self.test_dir / "cache", self.checkpatch, self.test_dir)
+        for _ in range(2):
+            list(run_analysis([[self.dirty]], self.checkpatch, self.test_dir, "process", 1, cache=cache))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+    
+    def test_bounded_in_flight_window(self):
+        """Test lazy chunk iterators are consumed only as far as the in-flight window allows."""
+        for backend in ("thread", "asyncio"):
+            pulled = []
+            
+            def chunks():
+                for i in range(6):
+                    pulled.append(i)
+                    yield [self.dirty if i % 2 else self.clean]
+            
+            seen = 0
+            for chunk, results, error, elapsed in run_analysis(chunks(), self.checkpatch, self.test_dir, backend, 1,
+                                                      max_in_flight=2):
+                seen += 1
+                # Nunca hay más de 2 lotes pedidos al iterador sin haberse entregado
+                self.assertLessEqual(len(pulled) - seen, 1, backend)
+            self.assertEqual((seen, len(pulled)), (6, 6))
+    
+    def test_consumer_stops_early(self):
+        """Test breaking out of the results loop stops pulling chunks and ends the asyncio thread."""
+        for backend in ("thread", "asyncio"):
+            pulled = []
+            
+            def chunks():
+                for i in range(20):
+                    pulled.append(i)
+                    yield [self.dirty]
+            
+            # Los hilos de espera de subprocesos de asyncio terminan por su cuenta: no cuentan
+            def own_threads():
+                return [t for t in threading.enumerate() if not t.name.startswith("asyncio-waitpid")]
+            
+            threads = own_threads()
+            results = run_analysis(chunks(), self.checkpatch, self.test_dir, backend, 1, max_in_flight=2)
+            for _ in results:
+                break
+            results.close()
+            self.assertLess(len(pulled), 20, backend)
+            self.assertEqual(own_threads(), threads, backend)
+    
+    def test_timeout_retry_and_status(self):
+        """Test a slow file passes on the longer retry and a stalled one is reported as timed out, not clean."""
+        self.checkpatch.write_text(
+            "my @f = grep { !/^--/ } @ARGV;\n"
+            "sleep 5 if grep { /stall/ } @f;\n"
+            "select(undef, undef, undef, 0.4) if grep { /slow/ } @f;\n"
+            "print \"WARNING:TRAILING_WHITESPACE: trailing whitespace\\n#1: FILE: $_:1:\\n\\n\" for @f;\n")
+        (self.test_dir / "slow.c").write_text("int s; \n")
+        (self.test_dir / "stall.c").write_text("int t; \n")
+        cache = AnalysisCache(self.test_dir / "cache", self.checkpatch, self.test_dir)
+        with mock.patch.object(utils, "CHECKPATCH_TIMEOUT", 0.2):
+            errors, warnings, output = run_checkpatch(self.test_dir / "slow.c", self.checkpatch, self.test_dir)
+            self.assertEqual(len(warnings), 1)
+            result = analyze_file(self.test_dir / "stall.c", self.checkpatch, self.test_dir, cache=cache)
+        self.assertTrue(result.timed_out)
+        self.assertFalse(result.is_correct)
+        self.assertEqual(cache.get(self.test_dir / "stall.c")[1], None)
+        
+        aggregator = AnalysisAggregator(str(self.test_dir))
+        aggregator.add(result)
+        summary = aggregator.get_summary()
+        self.assertEqual(summary["timed_out"], [str(self.test_dir / "stall.c")])
+        self.assertEqual(summary["global_counts"]["correct"], 0)
+    
+    def test_timeout_scales_with_size(self):
+        """Test the per-invocation timeout grows with file size and file count."""
+        (self.test_dir / "big.h").write_bytes(b"x" * 2 * 1024 * 1024)
+        base = utils.checkpatch_timeout([self.clean])
+        self.assertAlmostEqual(utils.checkpatch_timeout([self.test_dir / "big.h"]) - base,
+                               2 * utils.CHECKPATCH_TIMEOUT_PER_MB, places=0)
+        self.assertAlmostEqual(utils.checkpatch_timeout([self.clean, self.dirty]), 2 * base, places=2)
+    
+    def test_cancel_stops_submitting(self):
+        """Test no more chunks are pulled after a cancellation and in-flight ones fail with Cancelled."""
+        for backend in ("thread", "asyncio"):
+            pulled = []
+            
+            def chunks():
+                for i in range(6):
+                    pulled.append(i)
+                    yield [self.dirty]
+            
+            try:
+                outcomes = []
+                for chunk, results, error, elapsed in run_analysis(chunks(), self.checkpatch, self.test_dir, backend, 1,
+                                                                   max_in_flight=2):
+                    outcomes.append(error)
+                    shutdown.cancel()
+                self.assertLessEqual(len(pulled), 3, backend)
+                self.assertIsNone(outcomes[0])
+                for error in outcomes[1:]:
+                    self.assertIsInstance(error, (type(None), shutdown.Cancelled), backend)
+            finally:
+                shutdown.reset()
+    
+    def test_iter_source_files(self):
+        """Test the lazy walker yields the same files as find_source_files."""
+        (self.test_dir / "sub").mkdir()
+        (self.test_dir / "sub" / "a.h").write_text("")
+        (self.test_dir / "sub" / "notes.txt").write_text("")
+        walked = iter_source_files(self.test_dir)
+        self.assertEqual(next(walked), self.test_dir / "clean.c")
+        self.assertEqual(sorted([self.test_dir / "clean.c", *walked]),
+                         sorted([self.clean, self.dirty, self.test_dir / "sub" / "a.h"]))
+    
+    def test_default_worker_count(self):
+        """Test the default worker count is positive and within the CPU affinity."""
+        count = default_worker_count()
+        self.assertGreaterEqual(count, 1)
+        if hasattr(os, "sched_getaffinity"):
+            self.assertLessEqual(count, len(os.sched_getaffinity(0)))
+
+
+class TestAnalysisAggregator(unittest.TestCase):
+    """Tests for per-file results and their aggregation."""
+    
+    def test_aggregate_results(self):
+        """Test results are merged into the report structures."""
+        aggregator = AnalysisAggregator("/k")
+        aggregator.add(make_result("/k/drivers/a.c",
+                                   [{"line": 3, "message": "ERROR: trailing whitespace"}],
+                                   [{"line": 5, "message": "WARNING: Missing a blank line after declarations"}],
+                                   "out-a"))
+        aggregator.add(make_result("/k/drivers/b.c", [{"line": 1, "message": "ERROR: trailing whitespace"}], [], "out-b"))
+        aggregator.add(make_result("/k/fs/c.c", [], [], "out-c"))
+        
+        data = aggregator.get_summary()
+        self.assertEqual(data["global_counts"], {"correct": 1, "warnings": 1, "errors": 2})
+        self.assertEqual(data["error_reasons"], {"trailing whitespace": 2})
+        self.assertEqual(data["error_reason_files"]["trailing whitespace"], [("/k/drivers/a.c", 3), ("/k/drivers/b.c", 1)])
+        self.assertEqual(data["summary"]["Drivers"]["errors"], ["/k/drivers/a.c", "/k/drivers/b.c"])
+        self.assertEqual(data["summary"]["Filesystems"]["correct"], ["/k/fs/c.c"])
+        self.assertEqual(data["file_outputs"]["/k/fs/c.c"], "out-c")
+    
+    def test_aggregate_by_type(self):
+        """Test issues are grouped on their type ID regardless of file-specific message text."""
+        aggregator = AnalysisAggregator("/k")
+        for name in ("a", "b"):
+            aggregator.add(make_result(f"/k/init/{name}.c", [{
+                "line": 1, "type_id": "SPDX_LICENSE_TAG",
+                "message": f"ERROR: Improper SPDX comment style for 'init/{name}.c', please use '/*' instead"}], [], "out"))
+        data = aggregator.get_summary()
+        self.assertEqual(data["error_reasons"], {"SPDX_LICENSE_TAG": 2})
+        self.assertEqual(data["error_reason_messages"]["SPDX_LICENSE_TAG"],
+                         "Improper SPDX comment style for 'init/a.c', please use '/*' instead")
+    
+    def test_type_with_both_severities(self):
+        """Test a type reported as ERROR and as WARNING keeps a label per severity."""
+        aggregator = AnalysisAggregator("/k")
+        aggregator.add(make_result("/k/init/a.c",
+                                   [{"line": 1, "type_id": "SPACING", "message": "ERROR: space required after that ','"}],
+                                   [{"line": 2, "type_id": "SPACING", "message": "WARNING: space before tabs"}], "out"))
+        data = aggregator.get_summary()
+        self.assertEqual(data["error_reasons"], {"SPACING": 1})
+        self.assertEqual(data["warning_reasons"], {"SPACING": 1})
+        self.assertEqual(data["error_reason_messages"], {"SPACING": "space required after that ','"})
+        self.assertEqual(data["warning_reason_messages"], {"SPACING": "space before tabs"})
+    
+    def test_reason_index_views(self):
+        """Test interned reason occurrences are exposed as (path, line) sequences with per-file views."""
+        index = ReasonIndex()
+        index.add("TRAILING_WHITESPACE", "/k/a.c", 7)
+        index.add("TRAILING_WHITESPACE", "/k/b.c", 2)
+        index.add("TRAILING_WHITESPACE", "/k/a.c", 3)
+        index.add("TRAILING_WHITESPACE", "/k/a.c", 3)
+        index.add("SPACING", "/k/c.c", 1)
+        self.assertEqual(list(index), ["TRAILING_WHITESPACE", "SPACING"])
+        occurrences = index["TRAILING_WHITESPACE"]
+        self.assertEqual(occurrences.file_ids.typecode, "I")
+        self.assertEqual(occurrences[1], ("/k/b.c", 2))
+        self.assertEqual(occurrences, [("/k/a.c", 7), ("/k/b.c", 2), ("/k/a.c", 3), ("/k/a.c", 3)])
+        self.assertEqual(occurrences.lines_by_file(), {"/k/a.c": [3, 7], "/k/b.c": [2]})
+        self.assertEqual(index.files(), {"/k/a.c", "/k/b.c", "/k/c.c"})
+        self.assertEqual(len(index.files_table), 3)
+        self.assertEqual(index.counts_by_file(), {"/k/a.c": 3, "/k/b.c": 1, "/k/c.c": 1})
+        self.assertNotIn("LONG_LINE", index)
+        with self.assertRaises(KeyError):
+            index["LONG_LINE"]
+    
+    def test_outputs_spilled_to_store(self):
+        """Test outputs kept in an OutputStore are read back through mmap and the store cleans up."""
+        store = OutputStore()
+        aggregator = AnalysisAggregator("/k", store)
+        aggregator.add(make_result("/k/a.c", [{"line": 1, "message": "ERROR: trailing whitespace"}], [], "salida á\n"))
+        aggregator.add(make_result("/k/b.c", [], [], ""))
+        data = aggregator.get_summary()
+        self.assertEqual(data["file_outputs"]["/k/a.c"], "salida á\n")
+        self.assertEqual(data["file_outputs"]["/k/b.c"], "")
+        aggregator.add(make_result("/k/c.c", [], [], "otra"))
+        self.assertEqual(store["/k/c.c"], "otra")
+        self.assertNotIn("/k/d.c", store)
+        self.assertEqual(sorted(store), ["/k/a.c", "/k/b.c", "/k/c.c"])
+        store.close()
+        self.assertFalse(store.path.exists())
+    
+    def test_file_result_is_immutable(self):
+        """Test a FileResult cannot be modified after creation."""
+        result = make_result("/k/fs/c.c", [], [], "")
+        self.assertTrue(result.is_correct)
+        with self.assertRaises(AttributeError):
+            result.errors = ()
+
+
+class TestSourceWalker(unittest.TestCase):
+    """Tests for source file discovery with pruning."""
+    
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        for rel in ("init/main.c", "init/main.h", "init/notes.txt", "Documentation/ex.c",
+                    "build/gen.c", "drivers/gpu/regs.h", "drivers/net/eth.c", "drivers/net/eth.mod.c"):
+            (self.test_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+            (self.test_dir / rel).write_text("int x;\n")
+        (self.test_dir / ".checkpatchignore").write_text("# generado\nbuild/\ndrivers/gpu\n*.mod.c\n")
+        self.excludes = DEFAULT_EXCLUDES + load_ignore_patterns(self.test_dir)
+        self.expected = [self.test_dir / rel for rel in ("drivers/net/eth.c", "init/main.c", "init/main.h")]
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def test_walk_prunes_excludes(self):
+        """Test default excludes and .checkpatchignore globs are pruned in one pass."""
+        self.assertEqual(load_ignore_patterns(self.test_dir), ["build/", "drivers/gpu", "*.mod.c"])
+        files = list(iter_source_files(self.test_dir, [".c", ".h"], self.excludes, use_git=False))
+        self.assertEqual(sorted(files), self.expected)
+        self.assertIn(self.test_dir / "Documentation" / "ex.c", find_source_files(self.test_dir, excludes=[]))
+    
+    def test_patterns_relative_to_root(self):
+        """Test path globs are matched relative to the kernel root when walking a subdirectory."""
+        files = list(iter_source_files(self.test_dir / "drivers", [".c", ".h"], self.excludes,
+                                       root=self.test_dir, use_git=False))
+        self.assertEqual(files, [self.test_dir / "drivers/net/eth.c"])
+        self.assertEqual(filter_excluded([self.test_dir / "drivers/gpu/regs.h", self.test_dir / "init/main.c"],
+                                         self.test_dir, self.excludes),
+                         [self.test_dir / "init/main.c"])
+    
+    @unittest.skipUnless(shutil.which("git"), "git not available")
+    def test_git_ls_files_fast_path(self):
+        """Test the git ls-files path finds the same files and honours .gitignore."""
+        (self.test_dir / ".gitignore").write_text("*.o.c\n")
+        (self.test_dir / "init/ignored.o.c").write_text("")
+        subprocess.run(["git", "-C", str(self.test_dir), "init", "-q"], check=True)
+        subprocess.run(["git", "-C", str(self.test_dir), "add", "init/main.c"], check=True)
+        files = list(iter_source_files(self.test_dir, [".c", ".h"], self.excludes))
+        self.assertEqual(files, self.expected)
+
+
+class TestScheduler(unittest.TestCase):
+    """Tests for cost-ordered scheduling."""
+    
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.files = []
+        for name, size in (("a.c", 10), ("big.h", 1000), ("mid.c", 100), ("new.c", 500)):
+            (self.test_dir / name).write_text("x" * size)
+            self.files.append(self.test_dir / name)
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def test_largest_first(self):
+        """Test files are ordered by size, largest first, without history."""
+        self.assertEqual([f.name for f in order_by_cost(self.files)], ["big.h", "new.c", "mid.c", "a.c"])
+    
+    def test_history_order(self):
+        """Test known durations win and unknown files are estimated from the average rate."""
+        path = self.test_dir / "d" / "durations.json"
+        save_durations(path, {"a.c": 2.0, "big.h": 0.5, "mid.c": 0.1})
+        # 2.6s / 1110 bytes -> new.c (500 bytes) ~ 1.17s
+        order = order_by_cost(self.files, self.test_dir, load_durations(path))
+        self.assertEqual([f.name for f in order], ["a.c", "new.c", "big.h", "mid.c"])
+        self.assertEqual(load_durations(self.test_dir / "missing.json"), {})
+    
+    def test_split_duration_and_packing(self):
+        """Test batch time is split by size and packing efficiency is computed."""
+        shares = split_duration([self.files[0], self.files[2]], 1.1)
+        self.assertAlmostEqual(shares[self.files[0]], 0.1)
+        self.assertAlmostEqual(shares[self.files[2]], 1.0)
+        stats = packing_stats(makespan=5.0, task_time=16.0, workers=4)
+        self.assertEqual(stats["ideal_makespan"], 4.0)
+        self.assertAlmostEqual(stats["efficiency"], 80.0)
+    
+    def test_slowest_files(self):
+        """Test only the N slowest files are kept, slowest first."""
+        slowest = SlowestFiles(2)
+        for name, seconds in (("a.c", 0.1), ("b.c", 3.0), ("c.c", 0.5), ("d.c", 1.0)):
+            slowest.add(name, seconds)
+        self.assertEqual(slowest.items(), [("b.c", 3.0), ("d.c", 1.0)])
+
+
+class TestSampling(unittest.TestCase):
+    """Tests for stratified sampling and extrapolation."""
+    
+    def setUp(self):
+        self.files = ([f"/k/drivers/d{i}.c" for i in range(100)] + [f"/k/net/n{i}.c" for i in range(20)]
+                      + ["/k/lib/only.c"])
+    
+    def test_stratified_sample(self):
+        """Test each stratum gets the same fraction (at least one file) and the sample is reproducible."""
+        sample = stratified_sample(self.files, 0.1, seed=3)
+        counts = population_by_stratum(sample)
+        self.assertEqual((counts["Drivers"], counts["Networking"], counts["Libraries"]), (10, 2, 1))
+        self.assertEqual(sample, stratified_sample(self.files, 0.1, seed=3))
+    
+    def test_full_sample_is_exact(self):
+        """Test analyzing every file gives the exact counts with a zero-width interval."""
+        estimator = StratifiedEstimator(population_by_stratum(self.files[100:]))
+        for i, f in enumerate(self.files[100:]):
+            estimator.add(make_result(f, [{"line": 1, "message": "ERROR: e"}] * (i % 3), [], ""))
+        total = estimator.estimate()["total"]["metrics"]["errors"]
+        self.assertEqual((total["estimate"], total["low"], total["high"]), (21.0, 21.0, 21.0))
+    
+    def test_extrapolation_interval(self):
+        """Test sampled strata are scaled up with an interval, and missing data is reported as unknown."""
+        estimator = StratifiedEstimator(population_by_stratum(self.files))
+        for i, f in enumerate(self.files[:10]):
+            estimator.add(make_result(f, [{"line": 1, "message": "ERROR: e"}] if i % 2 else [], [], ""))
+        drivers = estimator.estimate()["strata"]["Drivers"]["metrics"]["files_errors"]
+        self.assertEqual(drivers["estimate"], 50.0)
+        self.assertLess(drivers["low"], 50.0)
+        self.assertGreater(drivers["high"], 50.0)
+        # Networking y Libraries sin ficheros analizados: no hay total extrapolable
+        self.assertIsNone(estimator.estimate()["total"]["metrics"]["files_errors"]["estimate"])
+        estimator.add(make_result(self.files[100], [], [], None))  # timeout: no cuenta
+        self.assertEqual(estimator.estimate()["strata"]["Networking"]["analyzed"], 0)
+
+
+class TestSubsystems(unittest.TestCase):
+    """Tests for the path-prefix subsystem classifier."""
+    
+    def test_longest_prefix_from_root(self):
+        """Test files are classified by the longest prefix relative to the kernel root only."""
+        classifier = PrefixClassifier.from_map({**FUNCTIONALITY_MAP, "drivers/net": "Networking"}, "/src/kernel/linux")
+        self.assertEqual(classifier.classify("/src/kernel/linux/drivers/net/phy/a.c"), "Networking")
+        self.assertEqual(classifier.classify("/src/kernel/linux/drivers/gpu/b.c"), "Drivers")
+        self.assertEqual(classifier.classify("/src/kernel/linux/arch/x86/kernel/c.c"), "Architecture")
+        self.assertEqual(classifier.classify("/src/kernel/linux/mm/d.c"), "Other")
+        self.assertEqual(classifier.classify("/src/kernel/linux/Makefile"), "Other")
+    
+    def test_without_root(self):
+        """Test paths outside the root are anchored at the first known top-level component."""
+        classifier = PrefixClassifier.from_map(FUNCTIONALITY_MAP)
+        self.assertEqual(classifier.classify("/k/fs/ext4/a.c"), "Filesystems")
+        self.assertEqual(classifier.classify("/k/init/main.c"), "Other")
+        self.assertEqual(make_result("/k/net/ipv4/tcp.c", [], [], "").functionality, "Networking")
+    
+    def test_maintainers_entries(self):
+        """Test MAINTAINERS F: entries are loaded per section, skipping wildcards, with exact-file entries."""
+        with tempfile.TemporaryDirectory() as tmp:
+            maintainers = Path(tmp) / "MAINTAINERS"
+            maintainers.write_text(
+                "List of maintainers\n\n\tF: *Files* and directories\n\n"
+                "NETWORKING DRIVERS\nS:\tMaintained\nF:\tdrivers/net/\nF:\tinclude/linux/netdevice.h\n\n"
+                "INTEL ETHERNET DRIVERS\nF:\tdrivers/net/ethernet/intel/\n\n"
+                "ARM SUB-ARCHITECTURES\nF:\tarch/arm/mach-*/\n\n"
+                "THE REST\nF:\t*\nF:\t*/\n")
+            classifier = PrefixClassifier.from_map(FUNCTIONALITY_MAP, "/k")
+            self.assertEqual(classifier.load_maintainers(maintainers), 3)
+        self.assertEqual(classifier.classify("/k/drivers/net/ethernet/intel/e1000/a.c"), "INTEL ETHERNET DRIVERS")
+        self.assertEqual(classifier.classify("/k/drivers/net/ethernet/intel/e1000/b.c"), "INTEL ETHERNET DRIVERS")
+        self.assertEqual(classifier.classify("/k/drivers/net/ethernet/realtek/c.c"), "NETWORKING DRIVERS")
+        self.assertEqual(classifier.classify("/k/include/linux/netdevice.h"), "NETWORKING DRIVERS")
+        self.assertEqual(classifier.classify("/k/include/linux/skbuff.h"), "Headers")
+        self.assertEqual(classifier.classify("/k/arch/arm/mach-omap2/d.c"), "Architecture")
+    
+    def test_set_classifier(self):
+        """Test classify_functionality uses the classifier set for the run."""
+        previous = get_classifier()
+        try:
+            set_classifier(PrefixClassifier.from_map({"mm": "Memory"}, "/k"))
+            self.assertEqual(make_result("/k/mm/slab.c", [], [], "").functionality, "Memory")
+            self.assertEqual(make_result("/k/drivers/a.c", [], [], "").functionality, "Other")
+        finally:
+            set_classifier(previous)
+
+
+class TestDedup(unittest.TestCase):
+    """Tests for identical-content deduplication."""
+    
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        for rel in ("arch/x86/a.h", "arch/arm/a.h", "arch/arm/b.h", "net/a.h"):
+            (self.test_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+            (self.test_dir / rel).write_text("int x;\n")
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def test_key_includes_path_parts(self):
+        """Test the key separates files whose checkpatch rules depend on name or directory."""
+        key = lambda rel: dedup_key(self.test_dir / rel, self.test_dir)
+        self.assertEqual(key("arch/x86/a.h"), key("arch/arm/a.h"))
+        self.assertNotEqual(key("arch/arm/a.h"), key("arch/arm/b.h"))
+        self.assertNotEqual(key("arch/x86/a.h"), key("net/a.h"))
+        # Mismo primer nivel, pero uapi y staging tienen reglas propias
+        for rel in ("include/uapi/linux/a.h", "include/linux/a.h", "arch/x86/include/uapi/asm/a.h",
+                    "arch/arm/include/uapi/asm/a.h", "drivers/staging/foo/a.h", "drivers/foo/a.h"):
+            (self.test_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+            (self.test_dir / rel).write_text("int x;\n")
+        self.assertNotEqual(key("include/uapi/linux/a.h"), key("include/linux/a.h"))
+        self.assertEqual(key("arch/x86/include/uapi/asm/a.h"), key("arch/arm/include/uapi/asm/a.h"))
+        self.assertNotEqual(key("drivers/staging/foo/a.h"), key("drivers/foo/a.h"))
+    
+    def test_filter_and_fan_out(self):
+        """Test duplicates are skipped and get the representative's result with their own path."""
+        files = [str(self.test_dir / rel) for rel in ("arch/x86/a.h", "arch/arm/a.h", "net/a.h")]
+        dedup = Deduplicator(str(self.test_dir))
+        unique = list(dedup.filter(files))
+        self.assertEqual(unique, [files[0], files[2]])
+        self.assertEqual(dedup.skipped, 1)
+        
+        issue = {"line": 1, "message": "WARNING: bad in arch/x86/a.h", "type_id": "X"}
+        copies = dedup.fan_out(make_result(files[0], [], [issue], "#1: FILE: arch/x86/a.h:1:\n"))
+        self.assertEqual(len(copies), 1)
+        self.assertEqual(copies[0].file, files[1])
+        self.assertEqual(copies[0].warnings[0]["message"], "WARNING: bad in arch/arm/a.h")
+        self.assertEqual(copies[0].output, "#1: FILE: arch/arm/a.h:1:\n")
+        self.assertEqual(dedup.fan_out(make_result(files[2], [], [], "")), [])
+    
+    def test_drain_late_duplicates(self):
+        """Test duplicates discovered after the representative finished are produced by drain."""
+        first, late = str(self.test_dir / "arch/x86/a.h"), str(self.test_dir / "arch/arm/a.h")
+        dedup = Deduplicator(str(self.test_dir))
+        files = iter([first, late])
+        self.assertEqual(next(dedup.filter(files)), first)
+        dedup.fan_out(make_result(first, [{"line": 2, "message": "ERROR: e"}], [], "out arch/x86/a.h"))
+        self.assertEqual(list(dedup.filter(files)), [])
+        copies = list(dedup.drain({first: "out arch/x86/a.h"}.__getitem__))
+        self.assertEqual([(c.file, c.output, len(c.errors)) for c in copies], [(late, "out arch/arm/a.h", 1)])
+    
+    def test_failed_representative(self):
+        """Test duplicates of a representative whose analysis failed are reported with its error."""
+        (self.test_dir / "arch/mips").mkdir()
+        (self.test_dir / "arch/mips/a.h").write_text("int x;\n")
+        first, early, late = (str(self.test_dir / f"arch/{a}/a.h") for a in ("x86", "arm", "mips"))
+        dedup = Deduplicator(str(self.test_dir))
+        self.assertEqual(list(dedup.filter(iter([first, early]))), [first])
+        self.assertEqual(dedup.fail(first, "perl murió"), [early])
+        self.assertEqual(list(dedup.filter(iter([late]))), [])
+        self.assertEqual(list(dedup.drain({}.__getitem__)), [])
+        self.assertEqual(list(dedup.failed_duplicates()), [(late, "perl murió")])
+
+
+class TestCheckpoint(unittest.TestCase):
+    """Tests for resumable run directories."""
+    
+    def setUp(self):
+        self.run_dir = Path(tempfile.mkdtemp())
+        self.meta = {"kernel_root": "/k", "checkpatch_args": ["--no-tree"]}
+    
+    def tearDown(self):
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+    
+    def test_resume_replays_completed(self):
+        """Test completed results are replayed and new ones are appended after a truncated line."""
+        checkpoint = RunCheckpoint(self.run_dir, self.meta)
+        checkpoint.record(make_result("/k/a.c", [{"line": 1, "message": "ERROR: e"}], [], "out a"))
+        checkpoint.record(make_result("/k/b.c", [], [], "out b"))
+        checkpoint.close()
+        with open(checkpoint.path, "a", encoding="utf-8") as f:
+            f.write('{"file": "/k/c.c", "err')  # escritura interrumpida
+        
+        resumed = RunCheckpoint(self.run_dir, self.meta, resume=True)
+        results = list(resumed.replay())
+        self.assertEqual([r.file for r in results], ["/k/a.c", "/k/b.c"])
+        self.assertEqual(results[0].errors[0]["message"], "ERROR: e")
+        self.assertEqual(results[1].output, "out b")
+        self.assertEqual(resumed.completed, {"/k/a.c", "/k/b.c"})
+        resumed.record(make_result("/k/c.c", [], [], ""))
+        resumed.close(finished=True)
+        self.assertEqual([r["file"] for r in iter_ndjson(resumed.path)], ["/k/a.c", "/k/b.c", "/k/c.c"])
+        self.assertTrue(json.loads(resumed.meta_path.read_text())["finished"])
+    
+    def test_resume_rejects_different_parameters(self):
+        """Test a run with different parameters cannot resume the saved one."""
+        RunCheckpoint(self.run_dir, self.meta).close()
+        with self.assertRaises(ValueError):
+            RunCheckpoint(self.run_dir, {**self.meta, "checkpatch_args": ["--terse"]}, resume=True)
+    
+    def test_without_resume_starts_over(self):
+        """Test a new run without --resume discards the previous checkpoint."""
+        checkpoint = RunCheckpoint(self.run_dir, self.meta)
+        checkpoint.record(make_result("/k/a.c", [], [], ""))
+        checkpoint.close()
+        fresh = RunCheckpoint(self.run_dir, self.meta)
+        self.assertFalse(fresh.resumed)
+        self.assertEqual(list(fresh.replay()), [])
+        fresh.close()
+        self.assertEqual(list(iter_ndjson(fresh.path)), [])
+    
+    def test_new_run_clears_checkpoint_before_meta(self):
+        """Test a new run that dies before its first record cannot resume the previous results."""
+        meta = {**self.meta, "excludes": [".git"]}
+        checkpoint = RunCheckpoint(self.run_dir, meta)
+        checkpoint.record(make_result("/k/a.c", [], [], ""))
+        checkpoint.close()
+        # Nueva ejecución con otras exclusiones que se interrumpe sin escribir nada ni cerrar
+        other = {**meta, "excludes": [".git", "drivers/*"]}
+        RunCheckpoint(self.run_dir, other)
+        resumed = RunCheckpoint(self.run_dir, other, resume=True)
+        self.assertEqual(list(resumed.replay()), [])
+        with self.assertRaises(ValueError):
+            RunCheckpoint(self.run_dir, meta, resume=True)
+
+
+class TestShutdown(unittest.TestCase):
+    """Tests for graceful cancellation of child processes."""
+    
+    def tearDown(self):
+        shutdown.reset()
+    
+    def test_run_child(self):
+        """Test run_child returns the output, and raises Cancelled once the run is cancelled."""
+        self.assertEqual(shutdown.run_child([sys.executable, "-c", "print('ok')"], timeout=10), (0, "ok\n", ""))
+        shutdown.cancel()
+        with self.assertRaises(shutdown.Cancelled):
+            shutdown.run_child([sys.executable, "-c", "print('ok')"], timeout=10)
+    
+    def test_killed_child_is_not_a_result(self):
+        """Test a child terminated by a signal raises Cancelled instead of returning empty output."""
+        with self.assertRaises(shutdown.Cancelled):
+            shutdown.run_child([sys.executable, "-c", "import os, signal; os.kill(os.getpid(), signal.SIGTERM)"],
+                               timeout=10)
+    
+    def test_cancel_terminates_tracked_children(self):
+        """Test cancel() terminates registered children and sets the shutdown deadline."""
+        proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        with shutdown.track(proc):
+            shutdown.cancel()
+            self.assertLess(proc.wait(timeout=5), 0)
+        self.assertTrue(shutdown.cancelled())
+        self.assertLessEqual(shutdown.remaining(), shutdown.SHUTDOWN_TIMEOUT)
+    
+    def test_partial_message(self):
+        """Test the partial-report notice reflects analyzed and discovered counts."""
+        self.assertEqual(analysis_partial_message({}), "")
+        message = analysis_partial_message({"partial": {"analyzed": 3, "found": 10, "discovery_done": False}})
+        self.assertIn("3 de 10", message)
+        self.assertIn("no había terminado", message)
+
+
+class TestIncremental(unittest.TestCase):
+    """Tests for git-incremental analysis (--since)."""
+    
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def git(self, *args):
+        subprocess.run(["git", "-C", str(self.test_dir), "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                       check=True, capture_output=True)
+    
+    @unittest.skipUnless(shutil.which("git"), "git not available")
+    def test_git_changed_files(self):
+        """Test modified, added, untracked, renamed and deleted files are detected."""
+        (self.test_dir / "init").mkdir()
+        for name in ("main.c", "old.h", "gone.c", "same.c", "notes.txt"):
+            (self.test_dir / "init" / name).write_text(f"/* {name} */\nint x;\n")
+        self.git("init", "-q")
+        self.git("add", "-A")
+        self.git("commit", "-qm", "base")
+        
+        (self.test_dir / "init" / "main.c").write_text("int y;\n")
+        (self.test_dir / "init" / "new.c").write_text("int z;\n")
+        (self.test_dir / "notes.txt").write_text("changed\n")
+        self.git("mv", "init/old.h", "init/renamed.h")
+        self.git("rm", "-q", "init/gone.c")
+        self.git("add", "-A")
+        # Nuevos sin añadir al índice: se analizan salvo los ignorados
+        (self.test_dir / ".gitignore").write_text("*.mod.c\n")
+        (self.test_dir / "init" / "untracked.c").write_text("int w;\n")
+        (self.test_dir / "init" / "gen.mod.c").write_text("int v;\n")
+        
+        changed, removed = git_changed_files(self.test_dir, "HEAD")
+        self.assertEqual([p.name for p in changed], ["main.c", "new.c", "renamed.h", "untracked.c"])
+        self.assertEqual(removed, {str(self.test_dir / "init" / "old.h"), str(self.test_dir / "init" / "gone.c")})
+    
+    def test_merge_results(self):
+        """Test fresh results replace re-analyzed and removed files only."""
+        previous = [{"file": "/k/a.c", "error": [1], "warning": []},
+                    {"file": "/k/b.c", "error": [], "warning": [1]},
+                    {"file": "/k/c.c", "error": [1], "warning": []}]
+        fresh = [{"file": "/k/d.c", "error": [], "warning": [2]}]
+        merged = merge_results(previous, fresh, {"/k/a.c", "/k/c.c", "/k/d.c"})
+        self.assertEqual([e["file"] for e in merged], ["/k/b.c", "/k/d.c"])
+
+
+class TestJsonStream(unittest.TestCase):
+    """Tests for NDJSON streaming of analysis results."""
+    
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.path = self.test_dir / "checkpatch.ndjson"
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def test_write_and_read_back(self):
+        """Test records are flushed in batches and read back one by one."""
+        records = [{"file": f"f{i}.c", "error": [], "warning": [{"line": i, "message": "WARNING: x"}]} for i in range(5)]
+        writer = NdjsonWriter(self.path, flush_every=2)
+        for record in records[:3]:
+            writer.write(record)
+        # Los dos primeros registros ya están en disco antes de cerrar
+        self.assertEqual(len(self.path.read_text().splitlines()), 2)
+        for record in records[3:]:
+            writer.write(record)
+        writer.close()
+        self.assertTrue(is_ndjson(self.path))
+        self.assertEqual(list(iter_ndjson(self.path)), records)
+    
+    def test_truncated_last_line_is_ignored(self):
+        """Test a partially written last record is skipped but corruption elsewhere is not."""
+        self.path.write_text('{"file": "a.c"}\n{"file": "b')
+        self.assertEqual(list(iter_ndjson(self.path)), [{"file": "a.c"}])
+        self.path.write_text('{"file": "a.c"}\n{"file": "b\n{"file": "c.c"}\n')
+        with self.assertRaises(ValueError):
+            list(iter_ndjson(self.path))
+    
+    def test_indented_json_is_not_ndjson(self):
+        """Test regular indented JSON is detected as such."""
+        json_path = self.test_dir / "checkpatch.json"
+        json_path.write_text(json.dumps([{"file": "a.c"}], indent=2))
+        self.assertFalse(is_ndjson(json_path))
+        json_path.write_text(json.dumps({"a.c": {"error": []}}, indent=2))
+        self.assertFalse(is_ndjson(json_path))
+        # Minificado en una sola línea: la primera línea es un JSON completo pero no un registro
+        json_path.write_text(json.dumps({"a.c": {"error": []}}))
+        self.assertFalse(is_ndjson(json_path))
+        json_path.write_text(json.dumps([{"file": "a.c"}]))
+        self.assertFalse(is_ndjson(json_path))
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """Tests for the content-addressed analysis cache."""
+    
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.checkpatch = self.test_dir / "checkpatch.pl"
+        self.checkpatch.write_text("# v1\n")
+        self.source = self.test_dir / "a.c"
+        self.source.write_text("int x; \n")
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+    
+    def test_hit_after_put_and_miss_after_change(self):
+        """Test a stored result is reused until the file content changes."""
+        cache = AnalysisCache(self.test_dir / "cache", self.checkpatch)
+        key, cached = cache.get(self.source)
+        self.assertIsNone(cached)
+        cache.put(key, [{"line": 1, "message": "ERROR: trailing whitespace"}], [], "ERROR: trailing whitespace\n")
+        self.assertEqual(cache.get(self.source)[1][0][0]["line"], 1)
+        
+        self.source.write_text("int x;\n")
+        self.assertIsNone(cache.get(self.source)[1])
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        
+        # Un fichero que no se puede leer no tiene clave pero también es un fallo
+        self.assertEqual(cache.get(self.test_dir / "missing.c"), (None, None))
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+    
+    def test_key_depends_on_checkpatch_and_flags(self):
+        """Test the key changes with checkpatch.pl contents and flags."""
+        key = AnalysisCache(self.test_dir / "cache", self.checkpatch).key(self.source)
+        other_flags = AnalysisCache(self.test_dir / "cache", self.checkpatch, flags=["--file", "--strict"])
+        self.assertNotEqual(key, other_flags.key(self.source))
+        self.checkpatch.write_text("# v2\n")
+        self.assertNotEqual(key, AnalysisCache(self.test_dir / "cache", self.checkpatch).key(self.source))
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entries are evicted over the size cap."""
+        cache = AnalysisCache(self.test_dir / "cache", self.checkpatch, max_bytes=250)
+        for i in range(5):
+            cache.put(f"{i:02d}" * 32, [], [], "x" * 60)
+        self.assertGreater(cache.evictions, 0)
+        self.assertLessEqual(cache._bytes, 250)
+        remaining = sorted(p.stem for p in (self.test_dir / "cache").glob("*/*.json"))
+        self.assertIn("04" * 32, remaining)
+        self.assertNotIn("00" * 32, remaining)
+    
+    def test_overwrite_keeps_size(self):
+        """Test overwriting an entry does not grow the tracked size nor evict."""
+        cache = AnalysisCache(self.test_dir / "cache", self.checkpatch, max_bytes=250)
+        for _ in range(10):
+            cache.put("00" * 32, [], [], "x" * 60)
+        self.assertEqual(cache._bytes, sum(p.stat().st_size for p in (self.test_dir / "cache").glob("*/*.json")))
+        self.assertEqual(cache.evictions, 0)
+
 
 def run_command(cmd, cwd=None):
     """Execute command and return result."""
@@ -841,6 +1952,18 @@ def run_tests():
     
     suite.addTests(loader.loadTestsFromTestCase(TestCompilation))
     suite.addTests(loader.loadTestsFromTestCase(TestFixFunctions))
+    suite.addTests(loader.loadTestsFromTestCase(TestAnalyzer))
+    suite.addTests(loader.loadTestsFromTestCase(TestAnalysisAggregator))
+    suite.addTests(loader.loadTestsFromTestCase(TestSourceWalker))
+    suite.addTests(loader.loadTestsFromTestCase(TestScheduler))
+    suite.addTests(loader.loadTestsFromTestCase(TestSampling))
+    suite.addTests(loader.loadTestsFromTestCase(TestSubsystems))
+    suite.addTests(loader.loadTestsFromTestCase(TestDedup))
+    suite.addTests(loader.loadTestsFromTestCase(TestCheckpoint))
+    suite.addTests(loader.loadTestsFromTestCase(TestShutdown))
+    suite.addTests(loader.loadTestsFromTestCase(TestIncremental))
+    suite.addTests(loader.loadTestsFromTestCase(TestJsonStream))
+    suite.addTests(loader.loadTestsFromTestCase(TestAnalysisCache))
     suite.addTests(loader.loadTestsFromTestCase(TestIntegration))
     
     runner = unittest.TextTestRunner(verbosity=2)
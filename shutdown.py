@@ -0,0 +1,180 @@
+# shutdown.py
+"""
+Cancelación ordenada con SIGINT/SIGTERM
+
+La primera señal solo marca la ejecución como cancelada: los backends dejan
+de enviar lotes, los procesos hijo en curso (checkpatch, make) reciben SIGTERM
+y el modo correspondiente genera los informes de lo que ya terminó, marcados
+como parciales. Si a los SHUTDOWN_TIMEOUT segundos quedan hijos vivos se
+matan con SIGKILL. Una segunda señal interrumpe inmediatamente
+(KeyboardInterrupt).
+
+Los procesos hijo se lanzan con run_child() o se registran con track() para
+poder terminarlos desde el manejador de la señal.
+"""
+
+import multiprocessing
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+import logger
+
+SHUTDOWN_TIMEOUT = 10  # segundos desde la señal hasta matar a los hijos que sigan vivos
+POLL_INTERVAL = 0.5    # las esperas bloqueantes se hacen por tramos para vigilar el plazo
+SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+_cancelled = threading.Event()
+_children = set()
+_lock = threading.Lock()
+_deadline = None
+
+
+class Cancelled(Exception):
+    """El trabajo se abandonó porque la ejecución fue cancelada."""
+
+
+def cancelled():
+    return _cancelled.is_set()
+
+
+def cancel():
+    """Marca la ejecución como cancelada y termina los procesos hijo en curso."""
+    global _deadline
+    if not _cancelled.is_set():
+        _deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        _cancelled.set()
+    terminate_children()
+
+
+def reset():
+    """Vuelve al estado inicial (nueva ejecución en el mismo proceso, tests)."""
+    global _deadline
+    _cancelled.clear()
+    _deadline = None
+
+
+def remaining():
+    """Segundos que quedan del plazo de cierre (None si no se ha cancelado)."""
+    if _deadline is None:
+        return None
+    return max(0.0, _deadline - time.monotonic())
+
+
+def enforce_deadline():
+    """Mata a los hijos que sigan vivos si se agotó el plazo de cierre (llamar entre tramos de espera)."""
+    if remaining() == 0:
+        terminate_children(kill=True)
+
+
+def terminate_children(kill=False):
+    """
+    SIGTERM (o SIGKILL) a los hijos registrados. Los procesos de multiprocessing
+    (ProcessPoolExecutor) solo reciben SIGTERM: con él cancelan y vigilan el plazo
+    de sus propios hijos, que quedarían huérfanos si se les matara antes.
+    """
+    with _lock:
+        children = list(_children)
+    if not kill:
+        children += multiprocessing.active_children()
+    for proc in children:
+        try:
+            proc.kill() if kill else proc.terminate()
+        except (OSError, ValueError):
+            pass  # ya terminado
+
+
+def register(proc):
+    """Registra un proceso hijo (cualquier objeto con terminate/kill) para la cancelación."""
+    with _lock:
+        _children.add(proc)
+    if cancelled():
+        proc.terminate()
+
+
+def unregister(proc):
+    with _lock:
+        _children.discard(proc)
+
+
+@contextmanager
+def track(proc):
+    """Registra un proceso hijo mientras dure el bloque."""
+    register(proc)
+    try:
+        yield proc
+    finally:
+        unregister(proc)
+
+
+def check_exit(returncode):
+    """Lanza Cancelled si el hijo murió por una señal o la ejecución está cancelada: su salida no vale."""
+    if returncode is not None and returncode < 0:
+        raise Cancelled(f"proceso terminado por la señal {-returncode}")
+    if cancelled():
+        raise Cancelled("ejecución cancelada")
+
+
+def run_child(cmd, timeout, cwd=None):
+    """
+    Como subprocess.run(cmd, capture_output=True, text=True, timeout=...) pero
+    registrando el hijo para la cancelación. Retorna (returncode, stdout, stderr).
+    Lanza subprocess.TimeoutExpired y Cancelled.
+    """
+    if cancelled():
+        raise Cancelled("ejecución cancelada")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=cwd)
+    deadline = time.monotonic() + timeout
+    with track(proc):
+        try:
+            while True:
+                try:
+                    stdout, stderr = proc.communicate(timeout=min(POLL_INTERVAL, max(0, deadline - time.monotonic())))
+                    break
+                except subprocess.TimeoutExpired:
+                    enforce_deadline()
+                    if time.monotonic() >= deadline:
+                        raise
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            check_exit(None)
+            raise
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+    check_exit(proc.returncode)
+    return proc.returncode, stdout, stderr
+
+
+def _handle_signal(signum, frame):
+    if cancelled():
+        terminate_children(kill=True)
+        raise KeyboardInterrupt
+    logger.warning(f"\n[SHUTDOWN] {signal.Signals(signum).name} recibida: cancelando y generando informes parciales "
+                   f"(repetir para salir inmediatamente)")
+    cancel()
+
+
+@contextmanager
+def graceful_shutdown():
+    """Instala los manejadores de SIGINT/SIGTERM durante el bloque (solo desde el hilo principal)."""
+    reset()
+    previous = {sig: signal.signal(sig, _handle_signal) for sig in SIGNALS}
+    try:
+        yield
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+
+
+def init_worker_process():
+    """
+    Initializer de los procesos de ProcessPoolExecutor: ignoran Ctrl-C (lo gestiona
+    el proceso principal) y con SIGTERM terminan sus propios hijos de checkpatch.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: cancel())
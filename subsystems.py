@@ -0,0 +1,130 @@
+# subsystems.py
+"""
+Clasificación de ficheros por subsistema con un trie de prefijos de ruta
+
+Cada prefijo (relativo al root del kernel, p.ej. "drivers/net/" o un fichero
+concreto "include/linux/netdevice.h") lleva una etiqueta y un fichero se
+clasifica por el prefijo más largo que lo contiene, recorriendo el trie
+componente a componente: O(profundidad de la ruta) e independiente del
+número de prefijos. El resultado se cachea por directorio.
+
+Por defecto los prefijos son los de FUNCTIONALITY_MAP; con --maintainers se
+añaden las entradas F: del fichero MAINTAINERS del kernel, etiquetadas con
+el nombre de la sección.
+"""
+
+import os
+import re
+
+DEFAULT_LABEL = "Other"
+MAINTAINERS_FILE = "MAINTAINERS"
+# Entradas de MAINTAINERS con comodines: no son prefijos literales y se omiten
+GLOB_CHARS = re.compile(r"[*?\[]")
+MAINTAINERS_TAG = re.compile(r"^([A-Z]):\s*(.*)$")
+
+
+class _Node:
+    __slots__ = ("children", "label")
+
+    def __init__(self):
+        self.children = {}
+        self.label = None
+
+
+class PrefixClassifier:
+    """
+    Trie de prefijos de ruta -> etiqueta con coincidencia del prefijo más largo.
+    root: directorio del kernel al que son relativos los prefijos. Sin root (o para
+    rutas fuera de él) el prefijo se ancla en el primer componente de la ruta que
+    empieza alguno de los prefijos conocidos.
+    """
+
+    def __init__(self, root=None, default=DEFAULT_LABEL):
+        self.root = str(root).rstrip(os.sep) if root else None
+        self.default = default
+        self._trie = _Node()
+        self._dirs = {}
+
+    @classmethod
+    def from_map(cls, mapping, root=None):
+        """Clasificador con los prefijos de un dict prefijo -> etiqueta (p.ej. FUNCTIONALITY_MAP)."""
+        classifier = cls(root)
+        for prefix, label in mapping.items():
+            classifier.add(prefix, label)
+        return classifier
+
+    def add(self, prefix, label):
+        """Asocia label al prefijo (directorio o fichero). Si ya tenía etiqueta se conserva la primera."""
+        node = self._trie
+        for part in prefix.strip("/").split("/"):
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _Node()
+            node = child
+        if node.label is None:
+            node.label = label
+        self._dirs.clear()
+
+    def load_maintainers(self, path):
+        """
+        Añade las entradas F: de un fichero MAINTAINERS con el nombre de su sección como etiqueta.
+        Retorna el número de prefijos añadidos.
+        """
+        added = 0
+        section = None
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line.strip():
+                    continue
+                m = MAINTAINERS_TAG.match(line)
+                if not m:
+                    if not line[0].isspace():
+                        section = line.strip()
+                    continue
+                tag, value = m.groups()
+                if tag == "F" and section and value and not GLOB_CHARS.search(value):
+                    self.add(value, section)
+                    added += 1
+        return added
+
+    def classify(self, file_path):
+        """Etiqueta del prefijo más largo que contiene a file_path (default si ninguno)."""
+        directory, _, name = str(file_path).rpartition(os.sep)
+        cached = self._dirs.get(directory)
+        if cached is None:
+            cached = self._dirs[directory] = self._classify_dir(directory)
+        label, node = cached
+        # Entradas de fichero concreto (F: include/linux/netdevice.h)
+        if node is not None:
+            child = node.children.get(name)
+            if child is not None and child.label is not None:
+                return child.label
+        return label
+
+    def _relative_parts(self, directory):
+        if self.root is not None:
+            if directory == self.root:
+                return []
+            if directory.startswith(self.root + os.sep):
+                return directory[len(self.root) + 1:].split(os.sep)
+        parts = directory.split(os.sep)
+        for i, part in enumerate(parts):
+            if part in self._trie.children:
+                return parts[i:]
+        return None
+
+    def _classify_dir(self, directory):
+        """(etiqueta del prefijo más largo del directorio, nodo del directorio o None si el trie acaba antes)"""
+        parts = self._relative_parts(directory)
+        if parts is None:
+            return self.default, None
+        label = self.default
+        node = self._trie
+        for part in parts:
+            node = node.children.get(part)
+            if node is None:
+                return label, None
+            if node.label is not None:
+                label = node.label
+        return label, node
@@ -4,11 +4,20 @@ Funciones helper para lectura/escritura de archivos,
 utilidades de checkpatch y constantes comunes
 """
 
+from collections import namedtuple
 from pathlib import Path
 import shutil
 import subprocess
+import fnmatch
+import json
+import math
 import os
 import re
+import tempfile
+import threading
+
+from linebuffer import LineBuffer
+from shutdown import Cancelled, run_child
 
 # ============================
 # Mapeos y configuración
@@ -26,6 +35,43 @@ FUNCTIONALITY_MAP = {
 EXTENSIONS = [".c", ".h"]
 MAX_WORKERS = 4
 
+
+def _cgroup_cpu_limit():
+    """Límite de CPUs impuesto por la cuota de cgroups (v2 o v1), o None si no hay cuota."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def default_worker_count():
+    """
+    Número de workers por defecto: CPUs disponibles para este proceso
+    (afinidad de CPU), limitado por la cuota de CPU del cgroup si existe.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or MAX_WORKERS
+    limit = _cgroup_cpu_limit()
+    if limit:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return max(1, cpus)
+
+
 # ============================
 # CSS común para HTML
 # ============================
@@ -80,25 +126,115 @@ def _write_lines(file_path, lines):
     with open(file_path, "w") as f:
         f.writelines(lines)
 
-def backup_read(file_path, line_number):
-    """
-    Hace backup del archivo y lee todas las líneas. Devuelve (lines, idx, line) para la línea solicitada.
-    """
+def _write_lines_atomic(file_path, lines):
+    """Escribe en un temporal del mismo directorio y lo renombra sobre file_path (conserva los permisos)."""
+    file_path = Path(file_path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{file_path.name}.", suffix=".tmp", dir=file_path.parent)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.writelines(lines)
+        shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _backup(file_path):
     file_path = Path(file_path)
     backup_path = file_path.with_suffix(file_path.suffix + ".bak")
     if not backup_path.exists():
         shutil.copy2(file_path, backup_path)
+
+def backup_read(file_path, line_number):
+    """
+    Hace backup del archivo y lee todas las líneas. Devuelve (lines, idx, line) para la línea solicitada.
+    """
+    _backup(file_path)
     lines, idx = _read_lines_and_idx(file_path, line_number)
     if idx < 0 or idx >= len(lines):
         return False
     line = lines[idx]
     return lines, idx, line
 
+
+# Sesión de fixes activa en este hilo (ver FixSession)
+_fix_session = threading.local()
+
+
+class FixSession:
+    """
+    Sesión de fixes sobre un fichero: se hace el backup y se lee una sola vez, los
+    fixers (apply_line_transform / apply_lines_callback sobre el mismo file_path)
+    trabajan sobre un LineBuffer en memoria y al salir del bloque se escribe el
+    fichero una única vez de forma atómica, solo si algo cambió. Si el bloque
+    termina con una excepción no se escribe nada.
+
+    Dentro de la sesión los números de línea son siempre los del fichero original,
+    aunque fixes anteriores hayan insertado o borrado líneas: los issues se pueden
+    aplicar en cualquier orden.
+
+        with FixSession(file_path):
+            fix_trailing_whitespace(file_path, 10)
+            fix_indent_tabs(file_path, 12)
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.key = os.fspath(file_path)
+        _backup(file_path)
+        with open(file_path, "r") as f:
+            self.buffer = LineBuffer(f.readlines())
+        self.changed = False
+
+    @property
+    def lines(self):
+        """Contenido actual (materializado)."""
+        return self.buffer.lines()
+
+    def __enter__(self):
+        if getattr(_fix_session, "current", None) is not None:
+            raise RuntimeError("ya hay una sesión de fixes activa en este hilo")
+        _fix_session.current = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _fix_session.current = None
+        if exc_type is None:
+            self.commit()
+
+    def commit(self):
+        """Escribe el fichero si hubo cambios. Retorna True si se escribió."""
+        if not self.changed:
+            return False
+        _write_lines_atomic(self.file_path, self.buffer.lines())
+        self.changed = False
+        return True
+
+
+def _active_session(file_path):
+    session = getattr(_fix_session, "current", None)
+    if session is not None and session.key == os.fspath(file_path):
+        return session
+    return None
+
 def apply_line_transform(file_path, line_number, transform_fn):
     """Read its lines, call transform_fn(line) which should
     return a new line (string) or None if no change should be made. If the
     returned line is different, write back and return True. Otherwise return False.
+    Inside a FixSession for file_path, line_number refers to the original file and
+    the session's buffer is updated instead of writing.
     """
+    session = _active_session(file_path)
+    if session is not None:
+        line = session.buffer.get_original(line_number - 1)
+        if line is None:
+            return False
+        new_line = transform_fn(line)
+        if new_line is None or new_line == line:
+            return False
+        session.buffer.set_original(line_number - 1, new_line)
+        session.changed = True
+        return True
     lines, idx = _read_lines_and_idx(file_path, line_number)
     if idx < 0 or idx >= len(lines):
         return False
@@ -118,7 +254,26 @@ def apply_lines_callback(file_path, line_number, callback_fn):
     The callback should perform any in-memory modifications to `lines` and
     return True if the file should be written back, or False otherwise.
     Returns True if changes were written, False otherwise.
+    Inside a FixSession the callback gets the session's LineBuffer (a list-like
+    view in current positions) with idx mapped from the original line number
+    (LineBuffer.index_of); its edits are rolled back unless it returns True.
     """
+    session = _active_session(file_path)
+    if session is not None:
+        buffer = session.buffer
+        idx = buffer.index_of(line_number - 1)
+        buffer.begin(line_number - 1)
+        try:
+            changed = callback_fn(buffer, idx)
+        except BaseException:
+            buffer.rollback()
+            raise
+        if changed:
+            buffer.commit()
+            session.changed = True
+            return True
+        buffer.rollback()
+        return False
     lines, idx = _read_lines_and_idx(file_path, line_number)
     changed = callback_fn(lines, idx)
     if changed:
@@ -126,6 +281,59 @@ def apply_lines_callback(file_path, line_number, callback_fn):
         return True
     return False
 
+def apply_lines_transform(file_path, line_numbers, transform_fn):
+    """
+    Versión por lotes de apply_line_transform: aplica transform_fn a todas las líneas
+    de line_numbers con una sola lectura y una sola escritura del fichero (dentro de
+    una FixSession, sobre su buffer y con números de línea originales).
+    Retorna una lista de bool (corregida o no) en el orden de line_numbers; una línea
+    repetida solo cuenta como corregida la primera vez.
+    """
+    session = _active_session(file_path)
+    if session is not None:
+        get_line, set_line = session.buffer.get_original, session.buffer.set_original
+    else:
+        with open(file_path, "r") as f:
+            lines = f.readlines()
+
+        def get_line(idx):
+            return lines[idx] if 0 <= idx < len(lines) else None
+        set_line = lines.__setitem__
+    fixed = []
+    for line_number in line_numbers:
+        idx = line_number - 1
+        line = get_line(idx)
+        new_line = None if line is None else transform_fn(line)
+        if new_line is None or new_line == line:
+            fixed.append(False)
+            continue
+        set_line(idx, new_line)
+        fixed.append(True)
+    if any(fixed):
+        if session is not None:
+            session.changed = True
+        else:
+            _write_lines(file_path, lines)
+    return fixed
+
+def _pattern_transform(pattern, replacement, use_regex=False, condition=None):
+    """transform(line) de una regla de patrón (el regex se compila una vez)."""
+    if use_regex:
+        regex = re.compile(pattern)
+
+        def replace(line):
+            return regex.sub(replacement, line)
+    else:
+        def replace(line):
+            return line.replace(pattern, replacement)
+
+    def transform(line):
+        if condition and not condition(line):
+            return None
+        new_line = replace(line)
+        return new_line if new_line != line else None
+    return transform
+
 def apply_pattern_replace(file_path, line_number, pattern, replacement, use_regex=False, condition=None):
     """
     Aplica un reemplazo de patrón genérico.
@@ -134,110 +342,545 @@ def apply_pattern_replace(file_path, line_number, pattern, replacement, use_rege
     - use_regex: si True, usa re.sub; si False, usa str.replace
     - condition: función opcional que verifica si debe aplicarse (recibe la línea)
     """
-    import re as regex_module
-    def transform(line):
-        if condition and not condition(line):
-            return None
-        if use_regex:
-            new_line = regex_module.sub(pattern, replacement, line)
-        else:
-            new_line = line.replace(pattern, replacement)
-        return new_line if new_line != line else None
-    return apply_line_transform(file_path, line_number, transform)
+    return apply_line_transform(file_path, line_number,
+                                _pattern_transform(pattern, replacement, use_regex, condition))
+
+def apply_pattern_replace_lines(file_path, line_numbers, pattern, replacement, use_regex=False, condition=None):
+    """
+    apply_pattern_replace sobre todas las líneas de line_numbers en una pasada.
+    Retorna una lista de bool por línea (ver apply_lines_transform).
+    """
+    return apply_lines_transform(file_path, line_numbers,
+                                 _pattern_transform(pattern, replacement, use_regex, condition))
 
 # ============================
 # Funciones comunes checkpatch
 # ============================
 
-def run_checkpatch(file_path, checkpatch_script, kernel_dir=None):
+# --show-types: cada issue lleva su tipo (p.ej. "WARNING:LONG_LINE: ..."), que es
+# estable entre ficheros a diferencia del mensaje
+CHECKPATCH_ARGS = ["--no-tree", "--file", "--show-types"]
+CHECKPATCH_FORMATS = {
+    "default": [],
+    "terse": ["--terse"],   # una línea por issue, sin el código
+    "emacs": ["--emacs"],   # "fichero:línea: " delante de cada issue
+}
+# Tiempo límite por fichero: base + proporcional al tamaño (las cabeceras generadas
+# de varios MiB tardan minutos). Tras un timeout se reintenta una vez con más margen
+CHECKPATCH_TIMEOUT = 30  # segundos por fichero
+CHECKPATCH_TIMEOUT_PER_MB = 60  # segundos extra por MiB
+CHECKPATCH_RETRY_FACTOR = 4  # el reintento dispone de 4 veces el tiempo límite
+FILE_MARKER_PATTERN = re.compile(r"^#\d+: FILE: (.+):\d+:")
+EMACS_MARKER_PATTERN = re.compile(r"^(\S+?):\d+: (?:ERROR|WARNING|CHECK):")
+
+# Un issue en cualquiera de los formatos de salida:
+#   WARNING:TYPE: mensaje            (por defecto, seguido de "#N: FILE: ruta:línea:")
+#   ruta:línea: WARNING:TYPE: mensaje (--emacs / --terse)
+# El tipo es opcional (sin --show-types).
+ISSUE_PATTERN = re.compile(
+    r"^(?:\S+?:(?P<prefix_line>\d+): )?"
+    r"(?P<severity>ERROR|WARNING|CHECK):(?:(?P<type>[A-Z0-9_]+):)? (?P<message>[^\n]*)"
+    r"(?:\n#\d+: FILE: [^\n]*:(?P<line>\d+):)?",
+    re.M
+)
+
+CheckpatchIssue = namedtuple("CheckpatchIssue", ["type", "severity", "line", "message"])
+
+
+def checkpatch_type_args(only_types=None, ignore_types=None):
+    """
+    Argumentos para que checkpatch.pl solo evalúe (--types) o se salte (--ignore) ciertos tipos.
+    Los tipos se ordenan para que la clave de la caché no dependa del orden en la línea de comandos.
+    """
+    args = []
+    if only_types:
+        args += ["--types", ",".join(sorted({t.upper() for t in only_types}))]
+    if ignore_types:
+        args += ["--ignore", ",".join(sorted({t.upper() for t in ignore_types}))]
+    return args
+
+
+def checkpatch_timeout(file_paths):
+    """Tiempo límite (s) de una invocación de checkpatch sobre file_paths según su tamaño."""
+    timeout = 0
+    for file_path in file_paths:
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0
+        timeout += CHECKPATCH_TIMEOUT + CHECKPATCH_TIMEOUT_PER_MB * size / (1024 * 1024)
+    return timeout
+
+
+def checkpatch_target(file_path, kernel_dir=None):
+    """
+    Ruta con la que se pasa un fichero a checkpatch.pl.
+    Si tenemos kernel_dir, se usa la ruta relativa para que checkpatch la muestre correctamente.
+    """
+    if kernel_dir:
+        return os.path.relpath(file_path, kernel_dir)
+    return str(file_path)
+
+
+def parse_checkpatch_records(output):
+    """
+    Extrae los issues de la salida de checkpatch.pl en una sola pasada de ISSUE_PATTERN.
+    Retorna una lista de CheckpatchIssue(type, severity, line, message); type es None
+    si checkpatch no se ejecutó con --show-types y line es 0 si no aparece.
+    """
+    records = []
+    for m in ISSUE_PATTERN.finditer(output):
+        line = m.group("line") or m.group("prefix_line")
+        records.append(CheckpatchIssue(m.group("type"), m.group("severity"),
+                                       int(line) if line else 0, m.group("message").rstrip()))
+    return records
+
+
+def parse_checkpatch_output(output):
+    """
+    Extrae errores y warnings de la salida de checkpatch.pl.
+    Retorna (error_list, warning_list) donde cada item es {"line": N, "message": "...", "type_id": "..."}
+    ("message" conserva el prefijo "ERROR: "/"WARNING: "; "type_id" solo está con --show-types)
+    """
+    errors = []
+    warnings = []
+    for issue in parse_checkpatch_records(output):
+        if issue.severity == "CHECK":
+            continue
+        item = {"line": issue.line, "message": f"{issue.severity}: {issue.message}"}
+        if issue.type:
+            item["type_id"] = issue.type
+        (errors if issue.severity == "ERROR" else warnings).append(item)
+    return errors, warnings
+
+
+def run_checkpatch(file_path, checkpatch_script, kernel_dir=None, checkpatch_args=None):
     """
     Ejecuta checkpatch.pl sobre un archivo y retorna errors, warnings y output completo.
+    checkpatch_args: argumentos de checkpatch (default: CHECKPATCH_ARGS)
     Retorna (error_list, warning_list, full_output) donde cada item es {"line": N, "message": "..."}
+    Si checkpatch excede el tiempo límite se reintenta una vez con CHECKPATCH_RETRY_FACTOR veces
+    más tiempo; si vuelve a excederlo full_output es None (fichero sin analizar, no "limpio").
     """
-    try:
-        # Si tenemos kernel_dir, usar ruta relativa para que checkpatch la muestre correctamente
-        if kernel_dir:
-            rel_path = os.path.relpath(file_path, kernel_dir)
-            result = subprocess.run(
-                ["perl", checkpatch_script, "--no-tree", "--file", rel_path],
-                capture_output=True,
-                text=True,
-                timeout=30,
-                cwd=str(kernel_dir)
+    timeout = checkpatch_timeout([file_path])
+    for attempt in range(2):
+        try:
+            _, full_output, _ = run_child(
+                ["perl", str(checkpatch_script), *(checkpatch_args or CHECKPATCH_ARGS), checkpatch_target(file_path, kernel_dir)],
+                timeout=timeout,
+                cwd=str(kernel_dir) if kernel_dir else None
             )
-        else:
-            result = subprocess.run(
-                ["perl", checkpatch_script, "--no-tree", "--file", str(file_path)],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-        
-        full_output = result.stdout
-        errors = []
-        warnings = []
-        
-        lines_list = result.stdout.split("\n")
-        i = 0
-        while i < len(lines_list):
-            line = lines_list[i].strip()
-            
-            # Formato sin --terse:
-            # WARNING: message
-            # #line: FILE: path:line:
-            # + code
-            
-            if line.startswith("ERROR: "):
-                message = line
-                line_num = 0
-                # Buscar siguiente línea con #N: FILE:
-                if i + 1 < len(lines_list):
-                    next_line = lines_list[i + 1].strip()
-                    if next_line.startswith("#") and "FILE:" in next_line:
-                        try:
-                            # Extraer número de línea de FILE: path:NUM:
-                            file_part = next_line.split("FILE:")[1].strip()
-                            line_num = int(file_part.split(":")[-2])
-                        except (IndexError, ValueError):
-                            pass
-                errors.append({"line": line_num, "message": message})
-                i += 1
-                
-            elif line.startswith("WARNING: "):
-                message = line
-                line_num = 0
-                # Buscar siguiente línea con #N: FILE:
-                if i + 1 < len(lines_list):
-                    next_line = lines_list[i + 1].strip()
-                    if next_line.startswith("#") and "FILE:" in next_line:
-                        try:
-                            # Extraer número de línea de FILE: path:NUM:
-                            file_part = next_line.split("FILE:")[1].strip()
-                            line_num = int(file_part.split(":")[-2])
-                        except (IndexError, ValueError):
-                            pass
-                warnings.append({"line": line_num, "message": message})
-                i += 1
-                
-            else:
-                i += 1
+        except Cancelled:
+            raise
+        except subprocess.TimeoutExpired:
+            timeout *= CHECKPATCH_RETRY_FACTOR
+            continue
+        except Exception:
+            return [], [], ""
         
+        errors, warnings = parse_checkpatch_output(full_output)
         return errors, warnings, full_output
+    return [], [], None
+
+
+def chunk_files(files, max_files=32, max_bytes=4 * 1024 * 1024):
+    """
+    Agrupa ficheros en lotes de como mucho max_files ficheros y max_bytes bytes.
+    Un fichero que por sí solo supera max_bytes va en su propio lote.
+    """
+    chunk = []
+    chunk_bytes = 0
+    for f in files:
+        try:
+            size = os.path.getsize(f)
+        except OSError:
+            size = 0
+        if chunk and (len(chunk) >= max_files or chunk_bytes + size > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(f)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+def split_checkpatch_output(output, targets):
+    """
+    Separa la salida combinada de checkpatch.pl con varios --file en la salida de cada fichero.
     
+    Con más de un fichero checkpatch imprime una cabecera por fichero:
+        -----------
+        init/main.c
+        -----------
+    Además cada issue lleva su marcador "#N: FILE: path:line:" (o el prefijo "path:line: "
+    con --emacs/--terse), que es el que decide a qué fichero pertenece el bloque (también funciona con --quiet, sin cabeceras).
+    Retorna {target: output} con las rutas tal y como se pasaron a checkpatch.
+    """
+    known = set(targets)
+    outputs = {t: [] for t in targets}
+    current = targets[0] if targets else None
+    block = []
+    
+    def flush():
+        owner = current
+        for block_line in block:
+            m = FILE_MARKER_PATTERN.match(block_line.strip()) or EMACS_MARKER_PATTERN.match(block_line)
+            if m and m.group(1) in known:
+                owner = m.group(1)
+                break
+        if owner is not None:
+            outputs[owner].extend(block)
+        block.clear()
+    
+    lines = output.split("\n")
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        # Cabecera de fichero: guiones / ruta / guiones
+        if (line and line == "-" * len(line) and i + 2 < len(lines)
+                and lines[i + 1] in known and lines[i + 2] == line and len(line) == len(lines[i + 1])):
+            flush()
+            current = lines[i + 1]
+            i += 3
+            continue
+        block.append(line)
+        if not line.strip():
+            flush()
+        i += 1
+    flush()
+    
+    return {t: "\n".join(v) for t, v in outputs.items()}
+
+
+def run_checkpatch_batch(file_paths, checkpatch_script, kernel_dir=None, checkpatch_args=None):
+    """
+    Ejecuta un único checkpatch.pl sobre varios ficheros y reparte la salida por fichero.
+    Retorna una lista de (error_list, warning_list, full_output) en el orden de file_paths.
+    Si el lote excede el timeout se reintenta fichero a fichero (con el reintento de run_checkpatch).
+    """
+    if len(file_paths) == 1:
+        return [run_checkpatch(file_paths[0], checkpatch_script, kernel_dir, checkpatch_args)]
+    
+    targets = [checkpatch_target(f, kernel_dir) for f in file_paths]
+    try:
+        _, stdout, _ = run_child(
+            ["perl", str(checkpatch_script), *(checkpatch_args or CHECKPATCH_ARGS), *targets],
+            timeout=checkpatch_timeout(file_paths),
+            cwd=str(kernel_dir) if kernel_dir else None
+        )
+    except Cancelled:
+        raise
     except subprocess.TimeoutExpired:
-        return [], [], ""
+        return [run_checkpatch(f, checkpatch_script, kernel_dir, checkpatch_args) for f in file_paths]
     except Exception:
-        return [], [], ""
+        return [([], [], "") for _ in file_paths]
+    
+    outputs = split_checkpatch_output(stdout, targets)
+    results = []
+    for target in targets:
+        errors, warnings = parse_checkpatch_output(outputs[target])
+        results.append((errors, warnings, outputs[target]))
+    return results
 
 
-def find_source_files(directory, extensions=[".c", ".h"]):
+# Directorios que nunca contienen código a analizar
+DEFAULT_EXCLUDES = [".git", ".hg", ".svn", ".cache", "Documentation"]
+IGNORE_FILE = ".checkpatchignore"
+
+
+def load_ignore_patterns(root):
+    """
+    Lee los patrones de <root>/.checkpatchignore (uno por línea, # para comentarios).
+    Retorna [] si el fichero no existe.
+    """
+    try:
+        with open(Path(root) / IGNORE_FILE, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except OSError:
+        return []
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def compile_excludes(patterns):
+    """
+    Compila patrones glob de exclusión en una función is_excluded(rel_path, is_dir).
+    - Sin "/": se compara con el nombre (p.ej. "*.mod.c", "Documentation")
+    - Con "/": se compara con la ruta relativa a la raíz (p.ej. "drivers/gpu/*")
+    - Terminado en "/": solo aplica a directorios (p.ej. "build/")
+    """
+    name_pats = {False: [], True: []}
+    path_pats = {False: [], True: []}
+    for pattern in patterns:
+        dir_only = pattern.endswith("/")
+        pattern = pattern.strip("/")
+        if not pattern:
+            continue
+        target = path_pats if "/" in pattern else name_pats
+        target[True].append(fnmatch.translate(pattern))
+        if not dir_only:
+            target[False].append(fnmatch.translate(pattern))
+
+    def union(pats):
+        return re.compile("|".join(pats)).match if pats else (lambda _: None)
+
+    name_match = {k: union(v) for k, v in name_pats.items()}
+    path_match = {k: union(v) for k, v in path_pats.items()}
+
+    def is_excluded(rel_path, is_dir=False):
+        name = rel_path.rsplit("/", 1)[-1]
+        return bool(name_match[is_dir](name) or path_match[is_dir](rel_path))
+
+    return is_excluded
+
+
+def filter_excluded(files, root, excludes):
+    """Descarta de files (rutas bajo root) las excluidas por sí mismas o por alguno de sus directorios."""
+    is_excluded = compile_excludes(excludes)
+    kept = []
+    for f in files:
+        parts = os.path.relpath(f, root).replace(os.sep, "/").split("/")
+        if any(is_excluded("/".join(parts[:depth]), True) for depth in range(1, len(parts))):
+            continue
+        if not is_excluded("/".join(parts)):
+            kept.append(f)
+    return kept
+
+
+def _git_ls_files(directory):
+    """Rutas (relativas a directory) de ficheros versionados y no ignorados, o None si no es un checkout de git."""
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(directory), "ls-files", "-z", "--cached", "--others", "--exclude-standard", "--", "."],
+            capture_output=True,
+            check=True
+        )
+    except (subprocess.CalledProcessError, OSError):
+        return None
+    return sorted({os.fsdecode(p) for p in result.stdout.split(b"\0") if p})
+
+
+def iter_source_files(directory, extensions=[".c", ".h"], excludes=None, root=None, use_git=True):
+    """
+    Recorre el árbol una sola vez y produce los ficheros con alguna de las extensiones
+    a medida que los encuentra (directorio a directorio, en orden), sin construir la lista.
+
+    excludes: patrones glob de directorios/ficheros a podar (default: DEFAULT_EXCLUDES)
+    root: raíz respecto a la que se evalúan los patrones con "/" (default: directory)
+    use_git: si directory es un checkout de git, usar `git ls-files` en lugar de recorrer
+             el disco (respeta además .gitignore, p.ej. la salida de compilación)
+    """
+    directory = Path(directory)
+    root = Path(root) if root else directory
+    extensions = tuple(extensions)
+    is_excluded = compile_excludes(DEFAULT_EXCLUDES if excludes is None else excludes)
+    prefix = os.path.relpath(directory, root).replace(os.sep, "/")
+    prefix = "" if prefix == "." else prefix + "/"
+
+    listed = _git_ls_files(directory) if use_git else None
+    if listed is not None:
+        pruned = set()
+        for rel in listed:
+            if not rel.endswith(extensions):
+                continue
+            parts = rel.split("/")
+            # Comprobar cada directorio de la ruta una única vez
+            excluded = False
+            for depth in range(1, len(parts)):
+                dir_rel = prefix + "/".join(parts[:depth])
+                if dir_rel in pruned:
+                    excluded = True
+                    break
+                if is_excluded(dir_rel, True):
+                    pruned.add(dir_rel)
+                    excluded = True
+                    break
+            if excluded or is_excluded(prefix + rel):
+                continue
+            path = directory / rel
+            if path.is_file():
+                yield path
+        return
+
+    stack = [(str(directory), prefix)]
+    while stack:
+        path, rel = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            entry_rel = rel + entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not is_excluded(entry_rel, True):
+                        subdirs.append((entry.path, entry_rel + "/"))
+                elif entry.name.endswith(extensions) and entry.is_file() and not is_excluded(entry_rel):
+                    yield Path(entry.path)
+            except OSError:
+                continue
+        # Pila: los subdirectorios se apilan en orden inverso para visitarlos en orden
+        stack.extend(reversed(subdirs))
+
+
+def find_source_files(directory, extensions=[".c", ".h"], excludes=None):
     """
     Encuentra todos los archivos de código fuente en un directorio.
     """
+    return sorted(iter_source_files(directory, extensions, excludes))
+
+
+def git_changed_files(repo_root, since_ref, extensions=[".c", ".h"], source_dirs=None):
+    """
+    Ficheros de código cambiados desde since_ref según git (incluye el árbol de trabajo
+    y los ficheros nuevos sin seguimiento que no estén ignorados). Los renombrados cuentan como cambio en la ruta nueva y borrado de la antigua.
+    Retorna (changed, removed): lista ordenada de Paths a analizar y set de rutas (str) que ya no existen.
+    Lanza subprocess.CalledProcessError si git falla (ref inexistente, no es un repo...).
+    """
+    repo_root = Path(repo_root)
+    result = subprocess.run(
+        ["git", "-C", str(repo_root), "diff", "--name-status", "-M", "-z", since_ref, "--"],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    
+    fields = result.stdout.split("\0")
+    changed = set()
+    removed = set()
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i]
+        if status[0] in ("R", "C"):
+            old_path, new_path = fields[i + 1], fields[i + 2]
+            if status[0] == "R":
+                removed.add(str(repo_root / old_path))
+            changed.add(new_path)
+            i += 3
+            continue
+        if status[0] == "D":
+            removed.add(str(repo_root / fields[i + 1]))
+        else:
+            changed.add(fields[i + 1])
+        i += 2
+    
+    # git diff no ve los ficheros nuevos que aún no se han añadido al índice
+    untracked = subprocess.run(
+        ["git", "-C", str(repo_root), "ls-files", "--others", "--exclude-standard", "-z"],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    changed.update(path for path in untracked.stdout.split("\0") if path)
+    
+    roots = [Path(d).resolve() for d in source_dirs] if source_dirs else None
     files = []
-    for ext in extensions:
-        files.extend(Path(directory).rglob(f"*{ext}"))
-    return sorted(files)
+    for rel_path in changed:
+        full_path = repo_root / rel_path
+        if Path(rel_path).suffix not in extensions or not full_path.is_file():
+            continue
+        if roots and not any(full_path == r or r in full_path.parents for r in roots):
+            continue
+        files.append(full_path)
+    return sorted(files), removed
+
+
+def merge_results(previous, fresh, replaced):
+    """
+    Combina resultados de un análisis incremental con los de un análisis anterior.
+    previous/fresh: listas [{file, error, warning}] en formato checkpatch.json
+    replaced: rutas (str) re-analizadas o eliminadas, cuyas entradas anteriores se descartan
+    """
+    merged = [entry for entry in previous if entry["file"] not in replaced]
+    merged.extend(fresh)
+    merged.sort(key=lambda entry: entry["file"])
+    return merged
+
+
+# ============================
+# Resultados en NDJSON
+# ============================
+
+JSON_STREAM_FLUSH_EVERY = 50  # registros entre flush
+
+
+class NdjsonWriter:
+    """
+    Escribe un registro JSON por línea a medida que llegan los resultados.
+    Se vuelca a disco cada `flush_every` registros, de modo que si el análisis
+    se interrumpe el fichero contiene todos los lotes ya volcados.
+    """
+
+    def __init__(self, path, flush_every=JSON_STREAM_FLUSH_EVERY, append=False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self.count = 0
+        self._pending = 0
+        self._f = open(self.path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, record):
+        self._f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.count += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._f.flush()
+        self._pending = 0
+
+    def close(self):
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_ndjson(path):
+    """
+    True si el fichero es NDJSON: la primera línea no vacía es un registro completo
+    {file, error, warning}. Un JSON minificado en una sola línea (lista de ficheros o
+    reporte {ruta: {...}}) no tiene la clave "file" en el primer nivel.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return False
+            return isinstance(record, dict) and "file" in record
+    return False
+
+
+def iter_ndjson(path):
+    """
+    Lee un NDJSON registro a registro sin cargar el fichero entero.
+    Una última línea incompleta (análisis interrumpido a mitad de escritura) se ignora.
+    """
+    bad_line = None
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            if bad_line:
+                raise ValueError(f"{path}:{bad_line}: línea JSON inválida")
+            try:
+                record = json.loads(line)
+            except ValueError:
+                bad_line = number
+                continue
+            yield record
 
 
 def display_path(file_path, base_dir=None):
@@ -0,0 +1,218 @@
+# workers.py
+"""
+Workers persistentes de checkpatch.pl
+
+Cada worker es un único proceso perl que compila checkpatch.pl una sola vez
+y recibe rutas de fichero por stdin, devolviendo la salida de cada fichero
+delimitada por un marcador. Así se evita pagar el arranque de perl y la
+compilación de checkpatch.pl (~6k líneas) por cada fichero analizado.
+"""
+
+import os
+import queue
+import select
+import subprocess
+import threading
+import time
+
+import logger
+from shutdown import Cancelled, cancelled, register, unregister
+from utils import (
+    CHECKPATCH_ARGS,
+    CHECKPATCH_RETRY_FACTOR,
+    checkpatch_target,
+    checkpatch_timeout,
+    parse_checkpatch_output,
+    run_checkpatch,
+)
+
+WORKER_MARKER = b"\0__CHECKPATCH_WORKER_EOF__\n"
+
+# Driver perl: carga checkpatch.pl una vez y sustituye su bucle principal
+# "for my $filename (@ARGV)" por uno que lee rutas de stdin bajo demanda.
+# checkpatch ya resetea su estado por fichero al final de cada iteración
+# (igual que cuando recibe varios ficheros en la línea de comandos).
+WORKER_DRIVER = r'''
+use strict;
+use warnings;
+
+my $script = shift @ARGV;
+open(my $fh, '<', $script) or die "$script: $!\n";
+my $src = do { local $/; <$fh> };
+close($fh);
+
+my $replaced = ($src =~ s/\bfor\s+my\s+\$filename\s+\(\@ARGV\)\s*\{/while (defined(my \$filename = __checkpatch_worker_next())) {/);
+die "checkpatch worker: main loop not found in $script\n" unless $replaced;
+
+$| = 1;
+my $first = 1;
+
+sub __checkpatch_worker_next {
+	print "\0__CHECKPATCH_WORKER_EOF__\n" unless $first;
+	$first = 0;
+	my $path = <STDIN>;
+	return undef unless defined $path;
+	chomp $path;
+	return $path;
+}
+
+$0 = $script;
+eval "package main;\n#line 1 \"$script\"\n" . $src;
+die $@ if $@;
+'''
+
+
+class WorkerError(Exception):
+    """El proceso worker terminó o no pudo arrancar."""
+
+
+class CheckpatchWorker:
+    """Proceso perl persistente con checkpatch.pl ya compilado."""
+
+    def __init__(self, checkpatch_script, kernel_dir=None, checkpatch_args=None):
+        self.checkpatch_script = str(checkpatch_script)
+        self.kernel_dir = kernel_dir
+        self.checkpatch_args = checkpatch_args or CHECKPATCH_ARGS
+        self.proc = None
+        self.files_done = 0
+
+    def start(self):
+        # /dev/null es un placeholder: checkpatch sale si no recibe ficheros,
+        # pero el bucle principal ya no itera sobre @ARGV
+        self.proc = subprocess.Popen(
+            ["perl", "-e", WORKER_DRIVER, "--", self.checkpatch_script, *self.checkpatch_args, os.devnull],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+            cwd=str(self.kernel_dir) if self.kernel_dir else None
+        )
+        register(self.proc)
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def check(self, file_path, timeout=30):
+        """
+        Analiza un fichero y retorna la salida completa de checkpatch.
+        Lanza TimeoutError si el fichero excede el timeout y WorkerError si el proceso muere.
+        """
+        if cancelled():
+            raise Cancelled("ejecución cancelada")
+        if not self.alive():
+            self.start()
+        target = checkpatch_target(file_path, self.kernel_dir)
+        try:
+            self.proc.stdin.write(os.fsencode(target) + b"\n")
+        except (BrokenPipeError, OSError) as e:
+            self.close()
+            raise WorkerError(f"worker terminado: {e}")
+        output = self._read_output(timeout).decode("utf-8", errors="replace")
+        self.files_done += 1
+        return output
+
+    def _read_output(self, timeout):
+        fd = self.proc.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        buf = bytearray()
+        while not buf.endswith(WORKER_MARKER):
+            remaining = deadline - time.monotonic()
+            ready = select.select([fd], [], [], remaining)[0] if remaining > 0 else []
+            if not ready:
+                self.close(kill=True)
+                raise TimeoutError(f"checkpatch excedió {timeout}s")
+            data = os.read(fd, 65536)
+            if not data:
+                self.close()
+                raise WorkerError("worker terminado sin completar el fichero")
+            buf += data
+        return bytes(buf[:-len(WORKER_MARKER)])
+
+    def close(self, kill=False):
+        if self.proc is None:
+            return
+        if kill:
+            self.proc.kill()
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        unregister(self.proc)
+        self.proc = None
+
+
+class CheckpatchWorkerPool:
+    """
+    Pool de N workers persistentes compartido por los hilos del executor.
+    run_checkpatch() tiene la misma firma y resultado que utils.run_checkpatch.
+    """
+
+    def __init__(self, checkpatch_script, kernel_dir=None, size=4, checkpatch_args=None):
+        self.checkpatch_script = checkpatch_script
+        self.kernel_dir = kernel_dir
+        self.checkpatch_args = checkpatch_args
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._fallback = False
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return CheckpatchWorker(self.checkpatch_script, self.kernel_dir, self.checkpatch_args)
+        return self._idle.get()
+
+    def run_checkpatch(self, file_path, checkpatch_script=None, kernel_dir=None):
+        if self._fallback:
+            return run_checkpatch(file_path, self.checkpatch_script, self.kernel_dir, self.checkpatch_args)
+
+        worker = self._acquire()
+        timeout = checkpatch_timeout([file_path])
+        try:
+            for attempt in range(2):
+                try:
+                    output = worker.check(file_path, timeout)
+                    errors, warnings = parse_checkpatch_output(output)
+                    return errors, warnings, output
+                except TimeoutError:
+                    # El worker se mata al exceder el tiempo: reintento (con otro proceso) con más margen
+                    if attempt:
+                        return [], [], None
+                    timeout *= CHECKPATCH_RETRY_FACTOR
+                except WorkerError:
+                    if cancelled():
+                        raise Cancelled("ejecución cancelada")
+                    if attempt:
+                        break
+            # El worker nunca llegó a arrancar (p.ej. checkpatch.pl con otro bucle
+            # principal): volver al modo de un proceso por fichero para todo el pool
+            if not self._fallback and not worker.files_done:
+                self._fallback = True
+                logger.warning("[ANALYZER] Workers persistentes no disponibles, usando un proceso por fichero")
+            return run_checkpatch(file_path, self.checkpatch_script, self.kernel_dir, self.checkpatch_args)
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()